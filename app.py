@@ -1,43 +1,77 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify, Response, stream_with_context
 from datetime import datetime
+import hmac
+import io
 import os
 import sys
+import time
 
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from models import db, User, LoanApplication, init_db
+from models import db, User, LoanApplication, init_db, init_sqlite, decision_details
+from auth import login_required, admin_required, admin_page_required
+from governance import summary as governance_summary
+from pagecache import render_page, loans_changed_at
+import archive
+import assets
+import counterfactual
+import metrics
+import passwords
+import review
+import writebehind
+from sqlalchemy import and_, or_
+from policy import POLICY, FEATURES as POLICY_FEATURES
 
 # Try to import ML module, but don't fail if it's not available
 try:
-    from ml import load_model, predict_single
+    from ml import get_model, predict_batch
     ML_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: ML module not available: {e}")
     ML_AVAILABLE = False
-    def load_model():
-        return None
-    def predict_single(model, features):
-        # Fallback decision logic
-        if features.get('credit_score', 0) >= 650 and features.get('debt_to_income', 1) < 0.4:
-            return 'APPROVE', 0.75, [0.25, 0.75], {}
-        return 'REJECT', 0.65, [0.65, 0.35], {}
+    def get_model():
+        return None, None
 
 app = Flask(__name__)
 
 # --- Security: load secret key from environment (required in production) ---
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
+# --- Decision API: internal callers authenticate with an X-API-Key header ---
+DECISION_API_KEY = os.environ.get('DECISION_API_KEY')
+API_MAX_BATCH = int(os.environ.get('API_MAX_BATCH', '10000'))
+
+# --- Page sizes for per-user loan lists ---
+DASHBOARD_RECENT_LOANS = 5
+LOAN_HISTORY_PAGE_SIZE = 20
+
 # --- Database configuration ---
 # On Render with a persistent disk, set DATABASE_PATH=/var/data/app.sqlite
 # Locally it falls back to <project>/instance/app.sqlite
+# SQLITE_PRODUCTION=1 (set in the Procfile) enables WAL + tuned pragmas so several
+# gunicorn workers can share the file; see models.init_sqlite.
 _default_db = os.path.join(app.instance_path, 'app.sqlite')
 db_file = os.environ.get('DATABASE_PATH', _default_db)
 os.makedirs(os.path.dirname(db_file), exist_ok=True)
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_file}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+init_sqlite(app, db_file,
+            production=os.environ.get('SQLITE_PRODUCTION', '0') == '1',
+            pool_size=int(os.environ.get('SQLITE_POOL_SIZE', '5')))
+
+# Per-route latency, SQL/model/render split and decision counters, served at /metrics
+metrics.init_app(app)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# WRITE_BEHIND=1: loan_form appends decisions to a local log and a background
+# thread group-commits them; see writebehind.py
+writebehind.init_app(app)
+
+# Old, closed loans live in columnar files under ARCHIVE_DIR (`python archive.py`);
+# the per-user pages merge them back in, see _user_loan_page
+archive.init_app(app)
 
-db.init_app(app)
+# url_for('static') -> fingerprinted, precompressed files built by `python assets.py`
+assets.init_app(app)
 
 # Initialize database on startup
 try:
@@ -47,6 +81,61 @@ try:
 except Exception as e:
     print(f"[WARNING] Database initialization warning: {e}")
 
+def score_applicants(columns):
+    """
+    Decide a batch of applicants: model scores (if available) gated by the loan policy.
+    columns: mapping of feature name to scalar or (N,) array
+    returns: (PolicyResult, contributions (N, 5) or None, model version or None)
+    """
+    model_decisions = model_confidences = contributions = model_version = None
+    if ML_AVAILABLE:
+        try:
+            started = time.perf_counter()
+            model, model_version = get_model()
+            model_decisions, model_confidences, _, contributions = predict_batch(model, columns)
+            metrics.observe_model(time.perf_counter() - started)
+        except Exception as e:
+            # Fall back to the rules and approval tiers alone
+            print(f"ML prediction error: {e}")
+            model_decisions = model_confidences = contributions = model_version = None
+    result = POLICY.evaluate(columns, model_decisions, model_confidences)
+    if model_decisions is None:
+        metrics.count_fallback('error' if ML_AVAILABLE else 'unavailable', len(result))
+    metrics.count_decisions(result.decisions)
+    return result, contributions, model_version
+
+def _flush_own_writes():
+    """Read-your-writes: store this session's latest write-behind decision before listing its loans."""
+    position = session.get('write_behind_at')
+    if position and writebehind.flush_through(position):
+        session.pop('write_behind_at')
+
+def _user_loans(user_id):
+    """A user's loans, newest first (id breaks ties), ordered to match the composite index."""
+    return LoanApplication.query.filter_by(user_id=user_id).order_by(
+        LoanApplication.submitted_at.desc(), LoanApplication.id.desc())
+
+def _user_loan_page(user_id, limit, before_ts=None, before_id=None):
+    """
+    Up to limit of a user's loans, newest first, from loan_application and the archive.
+    before_ts / before_id: keyset of the last loan on the previous page
+    """
+    query = _user_loans(user_id)
+    before = None
+    if before_ts is not None:
+        before = (before_ts, before_id)
+        query = query.filter(or_(
+            LoanApplication.submitted_at < before_ts,
+            and_(LoanApplication.submitted_at == before_ts, LoanApplication.id < before_id)
+        ))
+    loans = query.limit(limit).all()
+    # A full page of hot loans only needs archived ones at least as new as its last
+    floor = (loans[-1].submitted_at, loans[-1].id) if len(loans) == limit and loans[-1].submitted_at else None
+    archived = archive.user_loans(user_id, limit, before, floor)
+    if not archived:
+        return loans
+    return sorted(loans + archived, key=lambda loan: (loan.submitted_at or datetime.min, loan.id), reverse=True)[:limit]
+
 # Helper filters
 @app.template_filter('initials')
 def initials_filter(name):
@@ -64,6 +153,28 @@ def currency_filter(value):
     except (ValueError, TypeError):
         return value
 
+@app.template_filter('pct')
+def pct_filter(value):
+    if value is None:
+        return '—'
+    return f"{value * 100:.1f}%"
+
+@app.after_request
+def add_model_version_header(response):
+    # Report which model version scored this request (set by loan_form)
+    model_version = g.get('model_version')
+    if model_version:
+        response.headers['X-Model-Version'] = model_version
+    return response
+
+# ---------------- METRICS ---------------- 
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus scrape target; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # ---------------- LOGIN ---------------- 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -79,6 +190,10 @@ def login():
             user = User.query.filter_by(email=email).first()
             if user:
                 if user.check_password(password):
+                    if passwords.needs_rehash(user.password_hash):
+                        # Upgrade hashes made under older settings while we have the plaintext
+                        user.set_password(password)
+                        db.session.commit()
                     session['user_id'] = user.id
                     session['user'] = {
                         'id': user.id,
@@ -94,6 +209,9 @@ def login():
             else:
                 flash('No account found. Please sign up.', 'info')
                 return redirect(url_for('signup', email=email))
+        except passwords.HashingBusy:
+            flash('Too many sign-ins right now. Please try again in a moment.', 'danger')
+            return render_template('login.html', email=email), 503
         except Exception as e:
             flash(f'An error occurred: {str(e)}', 'danger')
             print(f"Login error: {e}")
@@ -147,6 +265,10 @@ def signup():
             flash(f'Account created successfully! Welcome {user.name}!', 'success')
             return redirect(url_for('dashboard'))
             
+        except passwords.HashingBusy:
+            db.session.rollback()
+            flash('Too many sign-ups right now. Please try again in a moment.', 'danger')
+            return render_template('signup.html', email=email, name=name), 503
         except Exception as e:
             db.session.rollback()
             flash(f'Error creating account: {str(e)}', 'danger')
@@ -157,17 +279,15 @@ def signup():
 
 # ---------------- DASHBOARD ---------------- 
 @app.route('/dashboard')
+@login_required
 def dashboard():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    user = User.query.get(session['user_id'])
-    if not user:
-        session.pop('user_id', None)
-        return redirect(url_for('login'))
-    
-    # Get all loans for the user
-    loans = LoanApplication.query.filter_by(user_id=user.id).order_by(LoanApplication.submitted_at.desc()).all()
+    user = g.user
+    _flush_own_writes()
+    return render_page('dashboard.html', loans_changed_at(user.id), lambda: _dashboard_context(user))
+
+def _dashboard_context(user):
+    # Only the most recent few loans; served from the (user_id, submitted_at) index
+    loans = _user_loan_page(user.id, DASHBOARD_RECENT_LOANS)
     latest_loan = loans[0] if loans else None
     
     # Calculate AI Risk Score
@@ -187,23 +307,18 @@ def dashboard():
     # Get spending data from the user object (defaults to 0.0)
     spending = user.spending if (hasattr(user, 'spending') and user.spending is not None) else 0.0
     
-    return render_template('dashboard.html', 
-                         user=user, 
-                         loans=loans, 
-                         latest_loan=latest_loan,
-                         risk_score=risk_score,
-                         ai_score=ai_score,
-                         spending=spending)
+    return dict(user=user, 
+                loans=loans, 
+                latest_loan=latest_loan,
+                risk_score=risk_score,
+                ai_score=ai_score,
+                spending=spending)
 
 # ---------------- LOAN FORM ---------------- 
 @app.route('/loan-form', methods=['GET', 'POST'])
+@login_required
 def loan_form():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    user = User.query.get(session['user_id'])
-    if not user:
-        return redirect(url_for('login'))
+    user = g.user
 
     if request.method == 'POST':
         try:
@@ -213,129 +328,22 @@ def loan_form():
             employment_years = float(request.form.get('employment_years'))
             debt_to_income = float(request.form.get('debt_to_income'))
             
-            if amount < 1000:
-                flash('Minimum loan amount is ₹1,000', 'danger')
+            if amount < POLICY.min_amount:
+                flash(f'Minimum loan amount is ₹{POLICY.min_amount:,.0f}', 'danger')
                 return render_template('loan_form.html', user=user)
 
-            # Enhanced loan approval logic
-            decision = 'REJECT'
-            confidence = 0.0
-            rejection_reasons = []
-            
-            # Rule 1: Credit Score Check (must be at least 300)
-            if credit_score < 300:
-                rejection_reasons.append(f"Credit score too low ({credit_score}). Minimum required: 300")
-            elif credit_score < 500:
-                rejection_reasons.append(f"Credit score is borderline ({credit_score}). Recommended: 500+")
-            
-            # Rule 2: Debt-to-Income Ratio (should be below 0.43)
-            if debt_to_income >= 0.43:
-                rejection_reasons.append(f"Debt-to-income ratio too high ({debt_to_income*100:.1f}%). Maximum allowed: 43%")
-            elif debt_to_income >= 0.36:
-                rejection_reasons.append(f"Debt-to-income ratio is high ({debt_to_income*100:.1f}%). Recommended: below 36%")
-            
-            # Rule 3: Loan-to-Income Ratio (loan shouldn't exceed 3x annual income)
-            loan_to_income = amount / income if income > 0 else float('inf')
-            if loan_to_income > 3.0:
-                rejection_reasons.append(f"Loan amount too high relative to income (₹{amount:,.0f} vs ₹{income:,.0f} annual income)")
-            
-            # Rule 4: Employment Stability (should have at least 1 year)
-            if employment_years < 1:
-                rejection_reasons.append(f"Insufficient employment history ({employment_years} years). Minimum: 1 year")
-            elif employment_years < 2:
-                rejection_reasons.append(f"Limited employment history ({employment_years} years). Recommended: 2+ years")
-            
-            # Rule 5: Minimum Income Check (should be at least $25,000)
-            if income < 25000:
-                rejection_reasons.append(f"Income too low (₹{income:,.0f}). Minimum required: ₹25,000")
-            
-            # Use ML model if available, otherwise use rule-based
-            try:
-                if ML_AVAILABLE:
-                    model = load_model()
-                    feature_dict = {
-                        'income': income,
-                        'credit_score': credit_score,
-                        'employment_years': employment_years,
-                        'debt_to_income': debt_to_income,
-                        'amount': amount
-                    }
-                    ml_decision, ml_confidence, probs, contributions = predict_single(model, feature_dict)
-                    
-                    # Combine ML prediction with rule-based checks
-                    # Only approve if ML says approve AND all critical rules pass
-                    critical_rules_pass = (
-                        credit_score >= 300 and
-                        debt_to_income < 0.43 and
-                        loan_to_income <= 3.0 and
-                        employment_years >= 1 and
-                        income >= 25000
-                    )
-                    
-                    if ml_decision == 'APPROVE' and critical_rules_pass:
-                        # Additional check: credit score should be good for approval
-                        # RELAXED: Trust ML model more, but ensure basic sanity
-                        if credit_score >= 300:
-                            decision = 'APPROVE'
-                            confidence = min(ml_confidence, 0.95)
-                        else:
-                            decision = 'REJECT'
-                            confidence = 1.0 - ml_confidence
-                            rejection_reasons.append("Credit score below absolute minimum (300)")
-                    else:
-                        decision = 'REJECT'
-                        confidence = 1.0 - ml_confidence
-                        if not critical_rules_pass:
-                            rejection_reasons.append("Failed critical eligibility checks")
-            except Exception as e:
-                print(f"ML prediction error: {e}")
-                # Fall back to rule-based decision
-            
-            # Rule-based decision (if ML not used or failed)
-            if decision == 'REJECT' and not rejection_reasons:
-                # Strict approval criteria
-                if (credit_score >= 650 and 
-                    debt_to_income < 0.36 and 
-                    loan_to_income <= 2.5 and
-                    employment_years >= 2 and
-                    income >= 30000):
-                    decision = 'APPROVE'
-                    confidence = 0.85
-                elif (credit_score >= 700 and 
-                      debt_to_income < 0.30 and 
-                      loan_to_income <= 3.0 and
-                      employment_years >= 1 and
-                      income >= 25000):
-                    decision = 'APPROVE'
-                    confidence = 0.80
-                elif (credit_score >= 300 and 
-                      debt_to_income < 0.40 and 
-                      loan_to_income <= 2.0 and
-                      employment_years >= 1 and
-                      income >= 25000):
-                    # Tier 3: Modest Approval
-                    decision = 'APPROVE'
-                    confidence = 0.75
-                else:
-                    decision = 'REJECT'
-                    confidence = 0.70
-                    if credit_score < 500:
-                        rejection_reasons.append(f"Credit score {credit_score} below minimum threshold (500)")
-                    if debt_to_income >= 0.36:
-                        rejection_reasons.append(f"Debt-to-income ratio {debt_to_income*100:.1f}% too high (max 36%)")
-                    if loan_to_income > 2.5:
-                        rejection_reasons.append(f"Loan amount too high relative to income")
-                    if employment_years < 2:
-                        rejection_reasons.append(f"Employment history too short ({employment_years} years)")
-                    if income < 30000:
-                        rejection_reasons.append(f"Income too low (₹{income:,.0f})")
-
-            # Store rejection reasons in explanation field
-            explanation = None
-            if rejection_reasons and decision == 'REJECT':
-                explanation = "Reasons: " + "; ".join(rejection_reasons[:3])  # Limit to 3 reasons
-            
-            loan = LoanApplication(
+            result, contributions, g.model_version = score_applicants({
+                'income': income,
+                'credit_score': credit_score,
+                'employment_years': employment_years,
+                'debt_to_income': debt_to_income,
+                'amount': amount
+            })
+            decision = str(result.decisions[0])
+            confidence = float(result.confidences[0])
+            explanation = result.explanation(0)
+
+            loan = dict(
                 user_id=user.id,
                 amount=amount,
                 income=income,
@@ -345,10 +353,23 @@ def loan_form():
                 model_decision=decision,
                 model_confidence=confidence,
                 explanation=explanation,
-                submitted_at=datetime.utcnow()
+                submitted_at=datetime.utcnow(),
+                **decision_details(result.reason_codes(0),
+                                   contributions[0] if contributions is not None else None,
+                                   g.model_version)
             )
-            db.session.add(loan)
-            db.session.commit()
+            needs_review, priority, review_reason = review.review_flags(result)
+            if writebehind.ENABLED:
+                if needs_review[0]:
+                    session['write_behind_at'] = writebehind.append(loan, priority[0], review_reason[0])
+                else:
+                    session['write_behind_at'] = writebehind.append(loan)
+            else:
+                loan = LoanApplication(**loan)
+                db.session.add(loan)
+                if needs_review[0]:
+                    review.enqueue(loan, priority[0], review_reason[0])
+                db.session.commit()
             
             if decision == 'APPROVE':
                 flash(f'Loan approved! ₹{amount:,.0f} approved with {confidence*100:.0f}% confidence.', 'success')
@@ -374,60 +395,291 @@ def logout():
 
 # ---------------- LOAN HISTORY ---------------- 
 @app.route('/loan-history')
+@login_required
 def loan_history():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    user = User.query.get(session['user_id'])
-    if not user:
-        return redirect(url_for('login'))
+    user = g.user
+    _flush_own_writes()
     
-    loans = LoanApplication.query.filter_by(user_id=user.id).order_by(LoanApplication.submitted_at.desc()).all()
-    return render_template('loan_history.html', user=user, loans=loans)
+    # Keyset pagination: ?before=<submitted_at>&before_id=<id> of the last row on the previous page
+    before = request.args.get('before')
+    before_id = request.args.get('before_id', type=int)
+    before_ts = None
+    if before and before_id is not None:
+        try:
+            before_ts = datetime.fromisoformat(before)
+        except ValueError:
+            return redirect(url_for('loan_history'))
+    return render_page('loan_history.html', loans_changed_at(user.id),
+                       lambda: _loan_history_context(user, before_ts, before_id))
+
+def _loan_history_context(user, before_ts, before_id):
+    loans = _user_loan_page(user.id, LOAN_HISTORY_PAGE_SIZE + 1, before_ts, before_id)
+    next_page = None
+    if len(loans) > LOAN_HISTORY_PAGE_SIZE:
+        loans = loans[:LOAN_HISTORY_PAGE_SIZE]
+        next_page = {'before': loans[-1].submitted_at.isoformat(), 'before_id': loans[-1].id}
+    return dict(user=user, loans=loans, next_page=next_page, first_page=before_ts is None)
 
 # ---------------- LOAN EXPLANATION ---------------- 
 @app.route('/loan-explanation')
+@login_required
 def loan_explanation():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
+    user = g.user
+    _flush_own_writes()
     
-    user = User.query.get(session['user_id'])
-    if not user:
-        return redirect(url_for('login'))
-    
-    loan_id = request.args.get('loan_id')
+    loan = None
+    loan_id = request.args.get('loan_id', type=int)
     if loan_id:
         loan = LoanApplication.query.get(loan_id)
-        if loan and loan.user_id == user.id:
-            return render_template('loan_explanation.html', user=user, loan=loan)
-    
-    latest_loan = LoanApplication.query.filter_by(user_id=user.id).order_by(LoanApplication.submitted_at.desc()).first()
-    return render_template('loan_explanation.html', user=user, loan=latest_loan)
+        if loan and loan.user_id != user.id:
+            loan = None
+        if loan is None:
+            loan = archive.find_loan(user.id, loan_id)
+    if loan is None:
+        loans = _user_loan_page(user.id, 1)
+        loan = loans[0] if loans else None
+    return render_template('loan_explanation.html', user=user, loan=loan, suggestions=_suggestions(loan))
+
+def _suggestions(loan):
+    """Counterfactual changes that would have approved a rejected loan, or None when they don't apply."""
+    if loan is None or loan.model_decision != 'REJECT' or loan.human_override:
+        return None
+    model = None
+    if ML_AVAILABLE:
+        try:
+            model = get_model()[0]
+        except Exception as e:
+            print(f"ML prediction error: {e}")
+    return counterfactual.suggest({name: getattr(loan, name) for name in POLICY_FEATURES}, model)
 
 # ---------------- CONSENT ---------------- 
 @app.route('/consent')
+@login_required
 def consent():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    user = User.query.get(session['user_id'])
-    if not user:
-        return redirect(url_for('login'))
-    
+    user = g.user
     return render_template('consent.html', user=user)
 
 # ---------------- PROFILE ---------------- 
 @app.route('/profile')
+@login_required
 def profile():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    user = User.query.get(session['user_id'])
-    if not user:
-        return redirect(url_for('login'))
-    
+    user = g.user
     return render_template('profile.html', user=user)
 
+# ---------------- GOVERNANCE ---------------- 
+@app.route('/governance')
+@admin_page_required
+def governance():
+    user = g.user
+    return render_template('governance.html', user=user, stats=governance_summary(),
+                           pending_reviews=review.pending_count())
+
+# ---------------- HUMAN REVIEW ---------------- 
+@app.route('/human-review')
+@admin_page_required
+def human_review():
+    user = g.user
+    case = None
+    case_id = request.args.get('case', type=int)
+    if case_id:
+        case = db.session.get(review.ReviewCase, case_id)
+        if case and (case.status != 'OPEN' or case.claimed_by != user.id):
+            case = None
+    return render_template('human_review.html', user=user, cases=review.list_open(),
+                           pending=review.pending_count(), case=case, now=datetime.utcnow())
+
+@app.route('/human-review/claim', methods=['POST'])
+@admin_page_required
+def human_review_claim_next():
+    case_id = review.claim_next(g.user.id)
+    if case_id is None:
+        flash('No cases are waiting for review.', 'info')
+        return redirect(url_for('human_review'))
+    return redirect(url_for('human_review', case=case_id))
+
+@app.route('/human-review/<int:case_id>/claim', methods=['POST'])
+@admin_page_required
+def human_review_claim(case_id):
+    if not review.claim(case_id, g.user.id):
+        flash(f'Case #{case_id} is already being reviewed or has been resolved.', 'danger')
+        return redirect(url_for('human_review'))
+    return redirect(url_for('human_review', case=case_id))
+
+@app.route('/human-review/<int:case_id>/release', methods=['POST'])
+@admin_page_required
+def human_review_release(case_id):
+    review.release(case_id, g.user.id)
+    return redirect(url_for('human_review'))
+
+@app.route('/human-review/<int:case_id>/resolve', methods=['POST'])
+@admin_page_required
+def human_review_resolve(case_id):
+    decision = request.form.get('decision')
+    if decision not in ('APPROVE', 'REJECT'):
+        flash('Choose a decision.', 'danger')
+        return redirect(url_for('human_review', case=case_id))
+    if review.resolve(case_id, g.user.id, decision, request.form.get('notes') or None):
+        flash(f'Case #{case_id} resolved: {decision}.', 'success')
+    else:
+        flash(f'Your lease on case #{case_id} expired; claim it again to resolve it.', 'danger')
+    return redirect(url_for('human_review'))
+
+# ---------------- ADMIN: BULK INTAKE ---------------- 
+@app.route('/admin/bulk-intake', methods=['POST'])
+@admin_required
+def admin_bulk_intake():
+    """Upload a CSV/JSONL file of applications (form field 'file'); returns intake stats as JSON."""
+    user = g.user
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    from bulk_intake import intake_stream, detect_format, DEFAULT_CHUNK_SIZE
+    fmt = request.form.get('format') or detect_format(upload.filename)
+    chunk_size = request.form.get('chunk_size', type=int) or DEFAULT_CHUNK_SIZE
+    # Werkzeug spools large uploads to disk; read it back as text one chunk at a time
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    try:
+        stats = intake_stream(stream, fmt, user.id, score_applicants, chunk_size)
+    except Exception as e:
+        print(f"Bulk intake error: {e}")
+        return jsonify({'error': f'Bulk intake failed: {e}'}), 400
+    return jsonify(stats)
+
+# ---------------- ADMIN: EXPORT ---------------- 
+@app.route('/admin/export')
+@admin_required
+def admin_export():
+    """
+    Stream loan applications as a download: ?format=csv|csv.gz|parquet, optional
+    start / end (YYYY-MM-DD, inclusive), decision (APPROVE/REJECT) and chunk_size.
+    """
+    import export_loans
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export_loans.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(export_loans.FORMATS)}"}), 400
+    try:
+        start = export_loans.parse_date(request.args.get('start'))
+        end = export_loans.parse_date(request.args.get('end'))
+        decision = request.args.get('decision') or None
+        query = export_loans.export_query(start, end, decision)
+        if fmt == 'parquet':
+            export_loans.require_pyarrow()
+    except export_loans.ParquetUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {e}'}), 400
+    chunk_size = request.args.get('chunk_size', type=int) or export_loans.DEFAULT_CHUNK_SIZE
+    writebehind.drain()  # include decisions still in the write-behind log
+    mimetype, extension = export_loans.FORMATS[fmt]
+
+    def generate():
+        stats, written = {}, 0
+        archived = export_loans.archived_batches(start, end, decision, chunk_size)
+        batches = export_loans.iter_batches(query, chunk_size, stats, archived)
+        for data in export_loans.encode(batches, fmt):
+            written += len(data)
+            yield data
+        print(f"[OK] Export ({fmt}): {stats['rows']:,} loans, {written / 1e6:,.1f} MB in "
+              f"{stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s)")
+
+    filename = f"loan_applications-{datetime.utcnow():%Y%m%d-%H%M%S}.{extension}"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+# ---------------- ADMIN: RETRAIN ---------------- 
+@app.route('/admin/retrain', methods=['GET', 'POST'])
+@admin_required
+def admin_retrain():
+    """POST starts a background retrain job (?force=1 promotes even if validation fails); GET reports the last one."""
+    import retrain
+    if request.method == 'POST':
+        force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+        if not retrain.submit(force):
+            return jsonify({'error': 'A retrain job is already running', 'status': retrain.status()}), 409
+        return jsonify({'state': 'started'}), 202
+    return jsonify(retrain.status())
+
+# ---------------- JSON DECISION API ---------------- 
+def _api_caller():
+    """'key' for a valid X-API-Key, 'session' for a logged-in user, None if unauthorized."""
+    supplied = request.headers.get('X-API-Key')
+    if DECISION_API_KEY and supplied:
+        return 'key' if hmac.compare_digest(supplied, DECISION_API_KEY) else None
+    return 'session' if 'user_id' in session else None
+
+@app.route('/api/v1/decisions', methods=['POST'])
+def api_decisions():
+    """
+    Decide one or many applicants with the same model + policy as loan_form.
+    Body: an applicant object, a list of them, or {"applicants": [...], "persist": true}.
+    Pass ?persist=1 (or "persist": true) to also store LoanApplication rows; each applicant
+    then needs a user_id. A logged-in caller's decisions are always filed under their own
+    account; only X-API-Key callers may name another user_id.
+    """
+    caller = _api_caller()
+    if caller is None:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    payload = request.get_json(silent=True)
+    persist = request.args.get('persist', '').lower() in ('1', 'true', 'yes')
+    if isinstance(payload, dict) and 'applicants' in payload:
+        applicants = payload['applicants']
+        persist = persist or bool(payload.get('persist'))
+    elif isinstance(payload, dict):
+        applicants = [payload]
+    else:
+        applicants = payload
+    if not isinstance(applicants, list) or not applicants:
+        return jsonify({'error': 'Expected an applicant object or a non-empty list of applicants'}), 400
+    if len(applicants) > API_MAX_BATCH:
+        return jsonify({'error': f'At most {API_MAX_BATCH} applicants per request'}), 413
+
+    from bulk_intake import parse_record, known_user_ids, feature_columns, insert_scored
+    rows, errors = [], []
+    for i, applicant in enumerate(applicants):
+        row, error = parse_record(applicant, session.get('user_id')) if isinstance(applicant, dict) \
+            else (None, 'not an object')
+        if error:
+            errors.append({'index': i, 'error': error})
+        elif caller == 'session' and row['user_id'] != session['user_id']:
+            return jsonify({'error': f'Forbidden: applicant {i} belongs to another user_id'}), 403
+        rows.append(row)
+    if persist and not errors:
+        known = known_user_ids(row['user_id'] for row in rows)
+        errors = [{'index': i, 'error': f"user_id: no such user ({row['user_id']})"}
+                  for i, row in enumerate(rows) if row['user_id'] not in known]
+    if errors:
+        return jsonify({'error': 'Invalid applicants', 'details': errors[:50]}), 400
+
+    result, contributions, model_version = score_applicants(feature_columns(rows))
+    reason_codes = result.top_reason_codes
+    results = []
+    for i in range(len(rows)):
+        results.append({
+            'decision': str(result.decisions[i]),
+            'confidence': float(result.confidences[i]),
+            'tier': result.tiers[i] or None,
+            'reasons': [str(code) for code in reason_codes[i] if code],
+            'explanation': result.explanation(i),
+            'contributions': dict(zip(POLICY_FEATURES, contributions[i].tolist())) if contributions is not None else None,
+        })
+
+    if persist:
+        try:
+            insert_scored(rows, result, contributions, model_version)
+        except Exception as e:
+            print(f"Decision API persist error: {e}")
+            return jsonify({'error': f'Could not store decisions: {e}'}), 500
+
+    return jsonify({
+        'model_version': model_version,
+        'policy_version': POLICY.version,
+        'persisted': persist,
+        'results': results,
+    })
+
 # ---------------- ROOT ---------------- 
 @app.route('/')
 def index():
@@ -435,5 +687,22 @@ def index():
         return redirect(url_for('dashboard'))
     return redirect(url_for('login'))
 
+# ---------------- STARTUP ---------------- 
+def warm_up():
+    """
+    Per-process setup that would otherwise land on a worker's first requests: load the
+    model, fix the password hash cost and compile every template. gunicorn.conf.py calls
+    this in the master under preload_app, so forked workers share the results
+    copy-on-write. Leaves no threads running and no database connections open.
+    """
+    if ML_AVAILABLE:
+        from ml import preload_model
+        preload_model()
+    passwords.policy()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    with app.app_context():
+        db.engine.dispose()
+
 if __name__ == '__main__':
     app.run(debug=True)
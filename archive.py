@@ -0,0 +1,568 @@
+"""
+archive.py — Cold storage for old, closed loan applications.
+
+`python archive.py` moves every closed loan (no open review case) from the
+months that ended more than ARCHIVE_AFTER_DAYS ago out of loan_application
+into columnar segment files, one directory per calendar month and run:
+
+    <ARCHIVE_DIR>/<store key>/<YYYY-MM>/part-<n>/
+        meta.json                       row count and how each column is stored
+        <column>.npy                    numbers and timestamps (narrowest int dtype that fits,
+                                        NaN / NaT for NULL)
+        <column>.npy + .dict.json.gz    repetitive text (decisions, reason codes, model
+                                        versions): dictionary codes, -1 for NULL
+        <column>.blocks + .offsets.npy  free text (explanations): zlib-compressed blocks of
+                                        BLOCK_ROWS rows
+
+ARCHIVE_DIR defaults to '<database>-archive' beside the SQLite file (see
+models.data_dir), so the segments sit on the same persistent disk as the rows
+they replace. The store key is a random id kept in the database's
+archive_store table. Databases that share an ARCHIVE_DIR (tests, scripts,
+staging) therefore each get their own subdirectory.
+
+Rows are sorted by (user_id, submitted_at desc, id desc), so one user's loans
+are contiguous and found by binary search. The .npy files are left
+uncompressed because np.load(mmap_mode='r') can only map plain arrays: a scan
+maps just the columns it asks for and reads only the pages it touches. The
+text columns, which make up most of a row, are the ones compressed. A
+resolved review case is archived with its loan as the review_* columns.
+
+Each part is written to a temporary directory and renamed into place. One
+transaction then records it in archive_segment and archive_index and deletes
+the rows and their resolved review cases. After a crash the rows are either
+still in the table or in a recorded segment. Parts that this run wrote but
+could not record are removed before the error is raised. A run that was
+killed can leave an unrecorded directory. Later runs skip it and name it in a
+warning, but never delete what they did not write. manifest.json in the store
+directory lists the recorded segments for tools that read the files without
+the database.
+
+Readers:
+  user_loans() / find_loan()  a user's archived loans, for the dashboard, loan history
+                              and explanation pages. archive_index (user, segment,
+                              first/last submitted_at) says which segments to open, so
+                              a user with nothing archived costs one indexed lookup.
+  scan() / records()          column-pruned, memory-mapped reads of every segment for
+                              analytics (governance.rebuild, --stats)
+
+The governance rollups keep counting archived decisions, and export_loans.py
+includes archived loans in its exports. train_model.py
+reads loan_application only, so ARCHIVE_AFTER_DAYS also bounds its training
+history. Closed loans are never updated, so segments are never rewritten.
+
+Usage:
+    python archive.py                               # archive per ARCHIVE_AFTER_DAYS
+    python archive.py --older-than-days 180 --vacuum
+    python archive.py --stats                       # monthly totals read from the archive
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy import bindparam, insert, or_, select
+
+from models import db, data_dir, LoanApplication, ReviewCase, ArchiveStore, ArchiveSegment, ArchiveIndex
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '365'))
+SEGMENT_ROWS = int(os.environ.get('ARCHIVE_SEGMENT_ROWS', '100000'))    # rows read (and at most archived) per batch
+BLOCK_ROWS = 1024
+DICTIONARY_MAX_RATIO = 0.5     # dictionary-encode text with at most this many distinct values per row
+OPEN_SEGMENTS = 64             # segments kept mapped per process
+FORMAT = 1
+
+_loans = LoanApplication.__table__
+_cases = ReviewCase.__table__
+_store = ArchiveStore.__table__
+_segments = ArchiveSegment.__table__
+_index = ArchiveIndex.__table__
+
+LOAN_COLUMNS = [column.name for column in _loans.columns]
+# Resolved review case columns stored with the loan
+REVIEW_COLUMNS = {'review_reason': 'reason', 'review_resolution': 'resolution', 'review_notes': 'notes',
+                  'review_claimed_by': 'claimed_by', 'review_created_at': 'created_at',
+                  'review_resolved_at': 'resolved_at'}
+# Column -> Python type name ('int', 'float', 'str', 'datetime')
+KINDS = {column.name: column.type.python_type.__name__ for column in _loans.columns}
+KINDS.update((name, _cases.c[source].type.python_type.__name__) for name, source in REVIEW_COLUMNS.items())
+
+_dir = None
+_keys = {}      # database URL -> store key, once known (it never changes)
+
+
+def init_app(app, archive_dir=None):
+    """Remember where the segments live."""
+    global _dir
+    _dir = archive_dir or os.environ.get('ARCHIVE_DIR') or data_dir(app, 'archive')
+
+
+def _root():
+    if _dir:
+        return _dir
+    from flask import current_app
+    return os.environ.get('ARCHIVE_DIR') or data_dir(current_app, 'archive')
+
+
+def store_dir(create=False):
+    """
+    This database's directory under ARCHIVE_DIR, or None if it has never archived anything.
+    create: make the store key on first use (the archive job does)
+    """
+    url = str(db.engine.url)
+    key = _keys.get(url)
+    if key is None:
+        with db.engine.begin() as conn:
+            key = conn.execute(select(_store.c.key)).scalar()
+            if key is None:
+                if not create:
+                    return None
+                key = uuid.uuid4().hex[:16]
+                conn.execute(insert(_store).values(key=key, created_at=datetime.utcnow()))
+        _keys[url] = key
+    return os.path.join(_root(), key)
+
+
+# ---------------- writing ----------------
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _save(path, array):
+    with open(path, 'wb') as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _narrow(array):
+    """Smallest signed integer dtype holding every value of an int64 array."""
+    if not len(array):
+        return np.int8
+    low, high = int(array.min()), int(array.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return np.int64
+
+
+def _write_column(path, name, values, kind):
+    """Write one column's Python values under path; returns its meta.json entry."""
+    base = os.path.join(path, name)
+    if kind == 'int' and None not in values:
+        array = np.asarray(values, dtype=np.int64)
+        _save(base + '.npy', array.astype(_narrow(array)))
+        return {'kind': kind, 'encoding': 'plain'}
+    if kind in ('int', 'float'):
+        _save(base + '.npy', np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+        return {'kind': kind, 'encoding': 'plain'}
+    if kind == 'datetime':
+        _save(base + '.npy', np.array(values, dtype='datetime64[us]'))
+        return {'kind': kind, 'encoding': 'plain'}
+
+    distinct = set(values)
+    distinct.discard(None)
+    if len(distinct) <= max(1, DICTIONARY_MAX_RATIO * len(values)):
+        dictionary = sorted(distinct)
+        code = {value: i for i, value in enumerate(dictionary)}
+        codes = np.array([-1 if v is None else code[v] for v in values], dtype=np.int64)
+        _save(base + '.npy', codes.astype(_narrow(codes)))
+        _write(base + '.dict.json.gz', gzip.compress(json.dumps(dictionary).encode('utf-8'), mtime=0))
+        return {'kind': kind, 'encoding': 'dictionary'}
+
+    offsets = [0]
+    with open(base + '.blocks', 'wb') as f:
+        for start in range(0, len(values), BLOCK_ROWS):
+            block = zlib.compress(json.dumps(values[start:start + BLOCK_ROWS]).encode('utf-8'), 6)
+            f.write(block)
+            offsets.append(offsets[-1] + len(block))
+        f.flush()
+        os.fsync(f.fileno())
+    _save(base + '.offsets.npy', np.array(offsets, dtype=np.int64))
+    return {'kind': kind, 'encoding': 'blocks', 'block_rows': BLOCK_ROWS}
+
+
+def _next_part(month_dir):
+    """Next part number in month_dir, past any directory already there (recorded, leftover or .tmp)."""
+    numbers = [name[5:].split('.')[0] for name in (os.listdir(month_dir) if os.path.isdir(month_dir) else [])
+               if name.startswith('part-')]
+    return max((int(n) for n in numbers if n.isdigit()), default=0) + 1
+
+
+def _write_part(store, month, rows):
+    """
+    Write rows (mappings of LOAN_COLUMNS + REVIEW_COLUMNS, one calendar month) as a new part.
+    returns: (archive_segment row, [archive_index rows])
+    """
+    user_ids = np.array([row['user_id'] for row in rows], dtype=np.int64)
+    submitted = np.array([row['submitted_at'] for row in rows], dtype='datetime64[us]')
+    ids = np.array([row['id'] for row in rows], dtype=np.int64)
+    order = np.lexsort((-ids, -submitted.astype(np.int64), user_ids))
+    rows = [rows[i] for i in order]
+    user_ids, submitted, ids = user_ids[order], submitted[order], ids[order]
+
+    month_dir = os.path.join(store, month)
+    name = f"{month}/part-{_next_part(month_dir):04d}"
+    path = os.path.join(store, name)
+    tmp = f"{path}.tmp"
+    os.makedirs(tmp)
+    try:
+        columns = {column: _write_column(tmp, column, [row[column] for row in rows], KINDS[column])
+                   for column in KINDS}
+        _write(os.path.join(tmp, 'meta.json'),
+               json.dumps({'format': FORMAT, 'rows': len(rows), 'columns': columns}, indent=2).encode('utf-8'))
+        size = sum(entry.stat().st_size for entry in os.scandir(tmp))
+        os.rename(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    _fsync_dir(month_dir)
+
+    segment = {'name': name, 'rows': len(rows), 'min_id': int(ids.min()), 'max_id': int(ids.max()),
+               'first_at': submitted.min().tolist(), 'last_at': submitted.max().tolist(), 'bytes': size,
+               'created_at': datetime.utcnow()}
+    # Each user's run is newest first: its first row is the user's last_at, its last row the first_at
+    users, starts, counts = np.unique(user_ids, return_index=True, return_counts=True)
+    index = [{'user_id': int(user), 'segment': name, 'rows': int(count),
+              'first_at': submitted[start + count - 1].tolist(), 'last_at': submitted[start].tolist()}
+             for user, start, count in zip(users, starts, counts)]
+    return segment, index
+
+
+def unrecorded(store):
+    """Part directories in store that no archive_segment row refers to (left by a killed run)."""
+    recorded = set(db.session.execute(select(_segments.c.name)).scalars())
+    db.session.commit()
+    found = []
+    for month in sorted(os.listdir(store)) if os.path.isdir(store) else []:
+        month_dir = os.path.join(store, month)
+        if os.path.isdir(month_dir):
+            found.extend(f"{month}/{part}" for part in sorted(os.listdir(month_dir))
+                         if f"{month}/{part}" not in recorded)
+    return found
+
+
+def archive_closed(older_than_days=ARCHIVE_AFTER_DAYS, now=None, batch_rows=SEGMENT_ROWS):
+    """
+    Move closed loans from months that ended more than older_than_days ago into new segments.
+    Must run inside an app context. returns: list of the archive_segment rows written
+    """
+    now = now or datetime.utcnow()
+    cutoff = (now - timedelta(days=older_than_days)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    store = store_dir(create=True)
+    for name in unrecorded(store):
+        print(f"[WARNING] {os.path.join(store, name)} is not a recorded segment (left by an interrupted run?); "
+              f"skipping it")
+    query = (select(_loans, *[_cases.c[source].label(name) for name, source in REVIEW_COLUMNS.items()])
+             .select_from(_loans.outerjoin(_cases, _cases.c.loan_id == _loans.c.id))
+             .where(_loans.c.submitted_at < cutoff, or_(_cases.c.id.is_(None), _cases.c.status != 'OPEN'))
+             .order_by(_loans.c.id)
+             .limit(batch_rows))
+    delete_cases = _cases.delete().where(_cases.c.loan_id == bindparam('archived_id'))
+    delete_loans = _loans.delete().where(_loans.c.id == bindparam('archived_id'))
+
+    written = []
+    last_id = 0
+    while True:
+        parts = []
+        try:
+            with db.engine.begin() as conn:
+                rows = conn.execute(query.where(_loans.c.id > last_id)).mappings().all()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                by_month = defaultdict(list)
+                for row in rows:
+                    by_month[row['submitted_at'].strftime('%Y-%m')].append(row)
+                # Files first, then every write to the database, so the write lock is held only briefly
+                for month, month_rows in sorted(by_month.items()):
+                    parts.append(_write_part(store, month, month_rows))
+                conn.execute(insert(_segments), [segment for segment, _ in parts])
+                conn.execute(insert(_index), [row for _, index in parts for row in index])
+                archived = [{'archived_id': row['id']} for row in rows]
+                conn.execute(delete_cases, archived)
+                conn.execute(delete_loans, archived)
+        except BaseException:
+            # Nothing was recorded: drop this batch's parts, the rows are still in the table
+            for segment, _ in parts:
+                shutil.rmtree(os.path.join(store, segment['name']), ignore_errors=True)
+            raise
+        written.extend(segment for segment, _ in parts)
+    write_manifest()
+    return written
+
+
+def vacuum():
+    """Give the pages freed by archiving back to the filesystem (rewrites the database file)."""
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('VACUUM')
+
+
+def write_manifest():
+    """Rewrite manifest.json from archive_segment; returns it."""
+    segments = [{**row, 'first_at': row['first_at'].isoformat(), 'last_at': row['last_at'].isoformat(),
+                 'created_at': row['created_at'].isoformat() if row['created_at'] else None}
+                for row in db.session.execute(select(_segments).order_by(_segments.c.name)).mappings()]
+    db.session.commit()
+    manifest = {'format': FORMAT, 'segments': segments}
+    store = store_dir(create=True)
+    os.makedirs(store, exist_ok=True)
+    path = os.path.join(store, 'manifest.json')
+    tmp = f"{path}.tmp"
+    _write(tmp, json.dumps(manifest, indent=2).encode('utf-8'))
+    os.replace(tmp, path)
+    return manifest
+
+
+def load_manifest(store=None):
+    """The manifest in store (default: this database's store directory); empty if there is none."""
+    store = store or store_dir()
+    if store is None:
+        return {'format': FORMAT, 'segments': []}
+    try:
+        with open(os.path.join(store, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'format': FORMAT, 'segments': []}
+
+
+# ---------------- reading ----------------
+
+class Segment:
+    """One part directory; columns are memory-mapped when first used."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta['rows']
+        self._arrays = {}
+        self._dictionaries = {}
+
+    def array(self, name):
+        """A stored array (dictionary codes for dictionary text), memory-mapped."""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def values(self, name, index=None):
+        """
+        Column values, at index (an int array) if given: an array for numbers and timestamps
+        (NaN / NaT for NULL), an object array of str / None for text.
+        """
+        encoding = self.meta['columns'][name]['encoding']
+        if encoding == 'blocks':
+            return self._text(name, index)
+        values = self.array(name)
+        if index is not None:
+            values = values[index]
+        if encoding == 'dictionary':
+            return self._dictionary(name)[values]   # code -1 picks the trailing None
+        return values
+
+    def _dictionary(self, name):
+        if name not in self._dictionaries:
+            with gzip.open(os.path.join(self.path, f'{name}.dict.json.gz'), 'rt', encoding='utf-8') as f:
+                dictionary = json.load(f)
+            values = np.empty(len(dictionary) + 1, dtype=object)
+            values[:-1] = dictionary
+            self._dictionaries[name] = values
+        return self._dictionaries[name]
+
+    def _text(self, name, index):
+        offsets = self.array(f'{name}.offsets')
+        block_rows = self.meta['columns'][name]['block_rows']
+        rows = np.arange(self.rows) if index is None else np.asarray(index, dtype=np.int64)
+        blocks = rows // block_rows
+        out = np.empty(len(rows), dtype=object)
+        with open(os.path.join(self.path, f'{name}.blocks'), 'rb') as f:
+            for block in np.unique(blocks):
+                f.seek(int(offsets[block]))
+                texts = json.loads(zlib.decompress(f.read(int(offsets[block + 1] - offsets[block]))))
+                if index is None:
+                    out[block * block_rows:block * block_rows + len(texts)] = texts
+                else:
+                    hit = np.flatnonzero(blocks == block)
+                    out[hit] = [texts[i] for i in (rows[hit] - block * block_rows).tolist()]
+        return out
+
+    def user_range(self, user_id):
+        users = self.array('user_id')
+        return int(np.searchsorted(users, user_id, 'left')), int(np.searchsorted(users, user_id, 'right'))
+
+    def user_rows(self, user_id, limit, before=None):
+        """Row numbers of up to limit of the user's loans, newest first, older than the (submitted_at, id) keyset."""
+        lo, hi = self.user_range(user_id)
+        if before is None:
+            return np.arange(lo, min(hi, lo + limit))
+        ts, ids = self.array('submitted_at')[lo:hi], self.array('id')[lo:hi]
+        before_ts = np.datetime64(before[0], 'us')
+        keep = np.flatnonzero((ts < before_ts) | ((ts == before_ts) & (ids < before[1])))
+        return lo + keep[:limit]
+
+    def loans(self, index):
+        """Transient (never added to the session) LoanApplication objects for the given rows."""
+        columns = [_python(self.values(name, index), KINDS[name]) for name in LOAN_COLUMNS]
+        return [LoanApplication(**dict(zip(LOAN_COLUMNS, row))) for row in zip(*columns)]
+
+
+@lru_cache(maxsize=OPEN_SEGMENTS)
+def _segment(path):
+    return Segment(path)
+
+
+def _python(values, kind):
+    """Column values as a list of Python values, None for NULL."""
+    if kind == 'datetime':
+        return values.astype('datetime64[us]').tolist()   # NaT -> None
+    if kind == 'str':
+        return values.tolist()
+    if values.dtype.kind == 'f':
+        cast = int if kind == 'int' else float
+        return [None if v != v else cast(v) for v in values.tolist()]
+    return values.tolist()
+
+
+def _newest_first(loan):
+    return (loan.submitted_at or datetime.min, loan.id)
+
+
+def user_loans(user_id, limit, before=None, floor=None):
+    """
+    Up to limit of a user's archived loans, newest first (id breaks ties), as transient LoanApplication objects.
+    before: (submitted_at, id) keyset; only older loans are returned
+    floor: (submitted_at, id) of the oldest loan the caller already has limit of; segments holding
+           nothing that new are skipped
+    """
+    query = select(_index.c.segment, _index.c.last_at).where(_index.c.user_id == user_id)
+    if before is not None:
+        query = query.where(_index.c.first_at <= before[0])
+    if floor is not None:
+        query = query.where(_index.c.last_at >= floor[0])
+    found = []
+    for name, last_at in db.session.execute(query.order_by(_index.c.last_at.desc())).all():
+        if len(found) >= limit and last_at < found[limit - 1].submitted_at:
+            break   # this and every later segment only hold older loans
+        segment = _segment(os.path.join(store_dir(), name))
+        found.extend(segment.loans(segment.user_rows(user_id, limit, before)))
+        found.sort(key=_newest_first, reverse=True)
+    return found[:limit]
+
+
+def find_loan(user_id, loan_id):
+    """The user's archived loan with this id as a transient LoanApplication, or None."""
+    query = (select(_index.c.segment)
+             .join(_segments, _segments.c.name == _index.c.segment)
+             .where(_index.c.user_id == user_id, _segments.c.min_id <= loan_id, _segments.c.max_id >= loan_id))
+    for name in db.session.execute(query).scalars().all():
+        segment = _segment(os.path.join(store_dir(), name))
+        lo, hi = segment.user_range(user_id)
+        hit = np.flatnonzero(segment.array('id')[lo:hi] == loan_id)
+        if len(hit):
+            return segment.loans(lo + hit)[0]
+    return None
+
+
+def scan(columns, start=None, end=None, store=None):
+    """
+    Yield (segment name, {column: values}) for every archived segment, reading only `columns`
+    (see Segment.values). start / end: datetimes; segments outside [start, end) are skipped
+    and rows outside it dropped. store: a store directory (default: this database's); only
+    its manifest.json is read, so with a store given it works without the database.
+    """
+    store = store or store_dir()
+    for entry in load_manifest(store)['segments']:
+        if (start and datetime.fromisoformat(entry['last_at']) < start
+                or end and datetime.fromisoformat(entry['first_at']) >= end):
+            continue
+        segment = _segment(os.path.join(store, entry['name']))
+        index = None
+        if start or end:
+            ts = segment.array('submitted_at')
+            keep = np.ones(segment.rows, dtype=bool)
+            if start:
+                keep &= ts >= np.datetime64(start, 'us')
+            if end:
+                keep &= ts < np.datetime64(end, 'us')
+            index = np.flatnonzero(keep)
+        yield entry['name'], {name: segment.values(name, index) for name in columns}
+
+
+def records(columns, start=None, end=None, store=None):
+    """Like scan(), but yields each segment's rows as a list of dicts of Python values (None for NULL)."""
+    for _, values in scan(columns, start, end, store):
+        lists = [_python(values[name], KINDS[name]) for name in columns]
+        yield [dict(zip(columns, row)) for row in zip(*lists)]
+
+
+def monthly_stats(store=None):
+    """{YYYY-MM: {'decisions', 'approved', 'overrides', 'confidence_sum'}} from a scan of four columns."""
+    stats = defaultdict(lambda: {'decisions': 0, 'approved': 0, 'overrides': 0, 'confidence_sum': 0.0})
+    for name, values in scan(['model_decision', 'human_override', 'model_confidence'], store=store):
+        decided = values['model_decision'] != None  # noqa: E711 (elementwise over an object array)
+        overridden = values['human_override'] != None  # noqa: E711
+        final = np.where(overridden, values['human_override'], values['model_decision'])
+        month = stats[name.split('/')[0]]
+        month['decisions'] += int(decided.sum())
+        month['approved'] += int((final[decided] == 'APPROVE').sum())
+        month['overrides'] += int(overridden.sum())
+        month['confidence_sum'] += float(np.nansum(np.asarray(values['model_confidence'])[decided]))
+    return dict(sorted(stats.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old, closed loan applications into columnar archive files.")
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f"archive months that ended more than this many days ago (default {ARCHIVE_AFTER_DAYS})")
+    parser.add_argument('--vacuum', action='store_true', help="VACUUM the database afterwards to shrink the file")
+    parser.add_argument('--stats', action='store_true', help="print monthly totals from the archive and exit")
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        if args.stats:
+            started = time.perf_counter()
+            stats = monthly_stats()
+            seconds = time.perf_counter() - started
+            print(f"  {'month':<8} {'decisions':>10} {'approval':>9} {'avg conf':>9} {'overrides':>10}")
+            for month, s in stats.items():
+                n = s['decisions'] or 1
+                print(f"  {month:<8} {s['decisions']:>10,} {s['approved'] / n:>9.1%} "
+                      f"{s['confidence_sum'] / n:>9.1%} {s['overrides']:>10,}")
+            print(f"[OK] Scanned {sum(s['decisions'] for s in stats.values()):,} archived decisions in {seconds:.2f}s")
+            return
+        started = time.perf_counter()
+        written = archive_closed(args.older_than_days)
+        rows = sum(segment['rows'] for segment in written)
+        size = sum(segment['bytes'] for segment in written)
+        for segment in written:
+            print(f"  {segment['name']}: {segment['rows']:,} loans, {segment['bytes'] / 1e6:.1f} MB")
+        print(f"[OK] Archived {rows:,} loans into {len(written)} segment(s), {size / 1e6:.1f} MB, "
+              f"in {time.perf_counter() - started:.1f}s")
+        if args.vacuum:
+            vacuum()
+            print("[OK] Database vacuumed")
+
+
+if __name__ == '__main__':
+    main()
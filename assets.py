@@ -0,0 +1,170 @@
+"""
+assets.py — Fingerprinted, precompressed static files.
+
+`python assets.py` (run before the server starts; see the Procfile) copies
+every file under static/ to static/dist/ under a content-hashed name
+(style.css -> style.<hash>.css), writes .gz and, when the brotli package is
+installed, .br variants next to each text file, and records them in
+static/dist/manifest.json. The files from the previous build are kept, so
+pages rendered before a deploy still find their assets.
+
+init_app() loads the manifest. url_for('static', filename='style.css')
+then resolves to the fingerprinted file, and GET /static/dist/<name> sends
+the best variant the client accepts, with
+Cache-Control: public, max-age=31536000, immutable. A fingerprinted URL
+never changes content, so browsers never ask for it again. A front proxy
+or CDN can serve static/dist as is (nginx gzip_static / brotli_static).
+
+Files missing from the manifest, or edited since the last build, keep their
+plain /static URL, so development works without a build.
+
+Usage:
+    python assets.py
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'application/xml')
+
+# served name -> (content type, encodings available besides identity, best first)
+_served = {}
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _sources():
+    for root, dirs, files in os.walk(STATIC_DIR):
+        if root == STATIC_DIR and 'dist' in dirs:
+            dirs.remove('dist')
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, '/'), path
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _compressors():
+    compressors = [('gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    try:
+        import brotli
+        compressors.insert(0, ('br', '.br', lambda data: brotli.compress(data, quality=11)))
+    except ImportError:
+        print("[WARNING] brotli not installed (pip install brotli); writing gzip variants only")
+    return compressors
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build():
+    """Write the fingerprinted files and the manifest; returns the manifest."""
+    previous = load_manifest()
+    compressors = _compressors()
+    manifest = {}
+    for name, path in _sources():
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = _digest(data)
+        stem, ext = os.path.splitext(name)
+        served = f"{stem}.{digest}{ext}"
+        entry = {'file': served, 'hash': digest, 'encodings': []}
+        target = os.path.join(DIST_DIR, served)
+        _write(target, data)
+        content_type = mimetypes.guess_type(name)[0] or ''
+        if content_type.startswith(COMPRESSIBLE):
+            for encoding, suffix, compress in compressors:
+                compressed = compress(data)
+                if len(compressed) < len(data) * 0.9:  # not worth a variant otherwise
+                    _write(target + suffix, compressed)
+                    entry['encodings'].append(encoding)
+        manifest[name] = entry
+
+    # Keep this build and the previous one; anything older is no longer referenced
+    keep = {e['file'] for m in (manifest, previous) for e in m.values()}
+    for root, _, files in os.walk(DIST_DIR):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            served = os.path.relpath(path, DIST_DIR).replace(os.sep, '/')
+            base = served[:-3] if served.endswith(('.gz', '.br')) else served
+            if base not in keep and path != MANIFEST_PATH:
+                os.remove(path)
+    _write(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def init_app(app):
+    """Resolve url_for('static') to the built files and register the /static/dist route."""
+    from flask import request, send_from_directory, abort
+
+    urls = {}
+    _served.clear()
+    for name, entry in load_manifest().items():
+        source = os.path.join(STATIC_DIR, name)
+        try:
+            with open(source, 'rb') as f:
+                current = _digest(f.read())
+        except OSError:
+            continue
+        if current != entry['hash']:
+            print(f"[WARNING] static/{name} changed since the last asset build; serving it unfingerprinted")
+            continue
+        urls[name] = f"dist/{entry['file']}"
+        _served[entry['file']] = (mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                                  entry['encodings'])
+
+    if urls:
+        @app.url_defaults
+        def _fingerprint(endpoint, values):
+            if endpoint == 'static' and values.get('filename') in urls:
+                values['filename'] = urls[values['filename']]
+
+    @app.route('/static/dist/<path:filename>')
+    def static_dist(filename):
+        served = _served.get(filename)
+        if served is None:
+            abort(404)
+        content_type, encodings = served
+        encoding = request.accept_encodings.best_match(encodings) if encodings else None
+        suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+        response = send_from_directory(DIST_DIR, filename + suffix, mimetype=content_type, max_age=MAX_AGE)
+        if suffix:
+            response.headers['Content-Encoding'] = encoding
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    return len(urls)
+
+
+def main():
+    manifest = build()
+    for name, entry in manifest.items():
+        variants = ', '.join(entry['encodings']) or 'uncompressed only'
+        print(f"  {name} -> dist/{entry['file']} ({variants})")
+    print(f"[OK] Built {len(manifest)} static asset(s) into {DIST_DIR}")
+
+
+if __name__ == '__main__':
+    main()
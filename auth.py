@@ -0,0 +1,98 @@
+"""
+auth.py — Request-scoped current user for the protected pages.
+
+The logged-in user is loaded once per request into `g.user` as a read-only
+snapshot. Snapshots are kept in a small per-process TTL cache, so page views
+do not query the user table every time. Updates and deletes of a User row
+through the ORM evict its entry at once. Changes made by another worker
+process show up when the entry expires (USER_CACHE_TTL seconds).
+"""
+import os
+from functools import wraps
+
+from flask import g, session, redirect, url_for, flash, jsonify
+from sqlalchemy import event
+
+from cache import TTLCache
+from models import db, User
+
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '30'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '4096'))
+
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+class CurrentUser:
+    """Detached, immutable copy of the User columns the views and templates read."""
+    __slots__ = ('id', 'name', 'email', 'is_admin', 'spending')
+
+    def __init__(self, user):
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(user, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CurrentUser is read-only')
+
+
+def load_current_user():
+    """Return the logged-in user's snapshot (cached in g for the rest of the request), or None."""
+    if 'user' in g:
+        return g.user
+    user_id = session.get('user_id')
+    user = None
+    if user_id is not None:
+        user = _user_cache.get(user_id)
+        if user is None:
+            row = db.session.get(User, user_id)
+            if row is None:
+                session.pop('user_id', None)
+            else:
+                user = CurrentUser(row)
+                _user_cache.set(user_id, user)
+    g.user = user
+    return user
+
+
+def invalidate_user(user_id):
+    _user_cache.pop(user_id)
+
+
+def login_required(view):
+    """Redirect to /login unless a user is logged in; the view reads the user from g.user."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if load_current_user() is None:
+            return redirect(url_for('login'))
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def admin_page_required(view):
+    """login_required for admin-only pages: non-admins are sent back to the dashboard."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        user = load_current_user()
+        if user is None:
+            return redirect(url_for('login'))
+        if not user.is_admin:
+            flash('Admin access required.', 'danger')
+            return redirect(url_for('dashboard'))
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def admin_required(view):
+    """Like login_required for admin-only JSON endpoints: 403 instead of a redirect."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        user = load_current_user()
+        if user is None or not user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _evict_user(mapper, connection, target):
+    invalidate_user(target.id)
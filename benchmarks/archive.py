@@ -0,0 +1,144 @@
+"""
+archive.py — Storage and read costs of the cold-loan archive (see ../archive.py).
+
+Fills a scratch SQLite database with --rows loans spread over the last two
+years, then archives everything past ARCHIVE_AFTER_DAYS and reports:
+
+    size           database file before and after archiving (+ VACUUM), and the archive
+    monthly stats  decisions / approvals / overrides / confidence per month, as a SQL
+                   GROUP BY over loan_application before archiving vs. a scan of the
+                   three archive columns after
+    pages          /loan-history (first page and a page deep in the archived years) and
+                   /dashboard for a user with --user-loans loans, before and after
+
+Usage:
+    python benchmarks/archive.py [--rows 300000] [--user-loans 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _median_ms(fn, n=30):
+    fn()
+    samples = []
+    for _ in range(n):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _fill(rows, user_loans, user_id):
+    from sqlalchemy import insert
+    from models import db, LoanApplication
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    reasons = ['Credit score is borderline ({}). Recommended: 500+', 'Debt-to-income ratio too high ({:.1%})',
+               'Limited employment history ({:.1f} years)']
+    batch = []
+    for i in range(rows):
+        decision = 'APPROVE' if rng.random() < 0.6 else 'REJECT'
+        score = rng.randint(300, 850)
+        batch.append(dict(
+            user_id=user_id if i < user_loans else 100 + i % 5000,
+            amount=rng.uniform(5e3, 3e5), income=rng.uniform(1e4, 3e5), credit_score=score,
+            employment_years=rng.uniform(0, 20), debt_to_income=rng.uniform(0, 0.8),
+            model_decision=decision, model_confidence=rng.random(),
+            human_override=('APPROVE' if decision == 'REJECT' else None) if rng.random() < 0.02 else None,
+            explanation=(f"Reasons: {reasons[0].format(score)}; {reasons[1].format(rng.random())}"
+                         if decision == 'REJECT' else 'Approved: meets all lending criteria'),
+            submitted_at=now - timedelta(days=rng.uniform(0, 730)),
+            contrib_income=rng.gauss(0, 1), contrib_credit_score=rng.gauss(0, 1),
+            contrib_employment_years=rng.gauss(0, 1), contrib_debt_to_income=rng.gauss(0, 1),
+            contrib_amount=rng.gauss(0, 1), reason_codes='LOW_SCORE,HIGH_DTI' if decision == 'REJECT' else '',
+            model_version='20260101-abc123'))
+        if len(batch) == 20000:
+            db.session.execute(insert(LoanApplication), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(LoanApplication), batch)
+    db.session.commit()
+
+
+def _sql_monthly():
+    from sqlalchemy import text
+    from models import db
+    return db.session.execute(text(
+        "SELECT strftime('%Y-%m', submitted_at), count(*), "
+        "sum(coalesce(human_override, model_decision) = 'APPROVE'), count(human_override), sum(model_confidence) "
+        "FROM loan_application GROUP BY 1")).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--user-loans', type=int, default=2_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='archive-bench-')
+    db_path = os.path.join(tmp, 'bench.sqlite')
+    os.environ.update(DATABASE_PATH=db_path, ARCHIVE_DIR=os.path.join(tmp, 'archive'), WRITE_BEHIND='0')
+    sys.path.insert(0, ROOT)
+    from app import app
+    import archive
+    import pagecache
+    from models import User
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'admin@trustbank.com', 'password': 'admin123'})
+    client.get('/dashboard')  # consume the login flash
+    with app.app_context():
+        user_id = User.query.filter_by(email='admin@trustbank.com').first().id
+        started = time.perf_counter()
+        _fill(args.rows, args.user_loans, user_id)
+        print(f"{args.rows:,} loans ({args.user_loans:,} for the benchmark user) in {time.perf_counter() - started:.1f}s")
+
+    def pages():
+        old = (datetime.utcnow() - timedelta(days=600)).isoformat()
+        results = {}
+        for label, url in (('history first page', '/loan-history'),
+                           ('history deep page', f'/loan-history?before={old}&before_id=999999999'),
+                           ('dashboard', '/dashboard')):
+            def get():
+                pagecache._pages.clear()  # time the render, not the page cache
+                assert client.get(url).status_code == 200
+            results[label] = _median_ms(get)
+        return results
+
+    with app.app_context():
+        size_before = os.path.getsize(db_path)
+        sql_ms = _median_ms(_sql_monthly, 5)
+        pages_before = pages()
+
+        started = time.perf_counter()
+        written = archive.archive_closed()
+        archive_s = time.perf_counter() - started
+        archive.vacuum()
+        size_after = os.path.getsize(db_path)
+        archive_bytes = sum(segment['bytes'] for segment in written)
+        archived = sum(segment['rows'] for segment in written)
+
+        scan_ms = _median_ms(archive.monthly_stats, 5)
+        pages_after = pages()
+
+    print(f"\nArchived {archived:,} loans into {len(written)} segments in {archive_s:.1f}s")
+    print(f"  database        {size_before / 1e6:8.1f} MB -> {size_after / 1e6:.1f} MB after VACUUM")
+    print(f"  archive         {archive_bytes / 1e6:8.1f} MB ({archive_bytes / max(archived, 1):.0f} bytes/loan, "
+          f"table + indexes were {(size_before - size_after) / max(archived, 1):.0f})")
+    print(f"  monthly stats   {sql_ms:8.1f} ms SQL GROUP BY over {args.rows:,} rows, {scan_ms:.1f} ms archive scan "
+          f"over {archived:,} ({len(archive.KINDS)} columns stored, 3 read)")
+    print(f"\n  {'page':<20} {'before ms':>10} {'after ms':>10}")
+    for label in pages_before:
+        print(f"  {label:<20} {pages_before[label]:>10.2f} {pages_after[label]:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+login_throughput.py — /login POSTs per second per core under the old Werkzeug
+default hash (scrypt N=2**15) vs. the calibrated policy in passwords.py.
+
+One process per core posts /login in a loop for a fixed duration. Each
+process runs the full app against a shared SQLite file. The admin account
+starts with a Werkzeug-default hash, so the policy run also covers the
+one-time transparent rehash.
+
+Usage:
+    python benchmarks/login_throughput.py [--seconds 5] [--processes N]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CREDENTIALS = {'email': 'admin@trustbank.com', 'password': 'admin123'}
+MODES = {
+    'werkzeug default': {'PASSWORD_HASH_METHOD': 'scrypt', 'PASSWORD_HASH_COST': str(2 ** 15)},
+    'policy': {},
+}
+
+
+def _env(tmp, overrides):
+    for name in ('PASSWORD_HASH_METHOD', 'PASSWORD_HASH_COST'):
+        os.environ.pop(name, None)
+    os.environ.update(overrides, DATABASE_PATH=os.path.join(tmp, 'bench.sqlite'), SQLITE_PRODUCTION='1')
+    sys.path.insert(0, ROOT)
+
+
+def _seed(tmp, overrides):
+    _env(tmp, overrides)
+    from werkzeug.security import generate_password_hash
+    from app import app
+    from models import db, User
+    with app.app_context():
+        admin = User.query.filter_by(email=CREDENTIALS['email']).first()
+        admin.password_hash = generate_password_hash(CREDENTIALS['password'])
+        db.session.commit()
+
+
+def _worker(tmp, overrides, seconds, start, results):
+    _env(tmp, overrides)
+    from app import app
+    import passwords
+    passwords.policy()  # calibrate before the clock starts
+    client = app.test_client()
+    start.wait()
+    logins = failures = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        r = client.post('/login', data=CREDENTIALS)
+        if r.status_code == 302:
+            logins += 1
+        else:
+            failures += 1
+        client.get('/logout')
+    results.put((logins, failures))
+
+
+def run(overrides, processes, seconds):
+    ctx = mp.get_context('spawn')
+    tmp = tempfile.mkdtemp(prefix='login-bench-')
+    with ctx.Pool(1) as pool:
+        pool.apply(_seed, (tmp, overrides))
+    start, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(tmp, overrides, seconds, start, results)) for _ in range(processes)]
+    for p in procs:
+        p.start()
+    time.sleep(3.0 + 1.0 * processes)  # imports + calibration
+    start.set()
+    logins = failures = 0
+    for _ in procs:
+        l, f = results.get()
+        logins += l
+        failures += f
+    for p in procs:
+        p.join()
+    return {'logins_per_sec': logins / seconds, 'failures': failures}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes on {os.cpu_count()} cores, {args.seconds:.0f}s of /login posts")
+    print(f"  {'hashing':<18} {'logins/s':>9} {'per core':>9} {'failed':>7}")
+    for label, overrides in MODES.items():
+        r = run(overrides, args.processes, args.seconds)
+        per_core = r['logins_per_sec'] / min(args.processes, os.cpu_count() or 1)
+        print(f"  {label:<18} {r['logins_per_sec']:>9,.1f} {per_core:>9,.1f} {r['failures']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+metrics_overhead.py — Per-request cost of the instrumentation in metrics.py.
+
+Measures the request hooks directly: start + finish with a typical dashboard
+load of 3 SQL statements and one template render. It then times /dashboard
+GETs through the Flask test client, attaching and detaching every hook between
+alternating blocks; the overhead is the median difference between neighbouring blocks.
+The budget is 50µs per request.
+
+Usage:
+    python benchmarks/metrics_overhead.py [--requests 20000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_US = 50.0
+QUERIES_PER_REQUEST = 3
+
+
+class _Response:
+    status_code = 200
+
+
+def hooks(requests):
+    """µs per simulated request spent in the metrics hooks alone (3 no-op statements, 1 render)."""
+    import metrics
+    from app import app
+    execute = metrics._timed_execute(lambda cursor, statement, parameters, context: None)
+    template = app.jinja_env.from_string('')
+    plain = app.jinja_env.template_class.__mro__[1].render
+    with app.test_request_context('/dashboard'):
+        response = _Response()
+        samples = []
+        for _ in range(5):
+            started = time.perf_counter()
+            for _ in range(requests):
+                metrics._start_request()
+                for _ in range(QUERIES_PER_REQUEST):
+                    execute(None, None, None, None)
+                template.render()
+                metrics._finish_request(response)
+            with_hooks = time.perf_counter() - started
+            # Take out the cost of rendering the empty template itself
+            started = time.perf_counter()
+            for _ in range(requests):
+                plain(template)
+            samples.append((with_hooks - (time.perf_counter() - started)) / requests * 1e6)
+    return min(samples)
+
+
+def _set_instrumented(app, on):
+    """Attach or detach every metrics hook (request hooks, SQL timing, template timing)."""
+    import metrics
+    with app.app_context():
+        if on:
+            metrics._instrument(app)
+        else:
+            metrics._uninstrument(app)
+
+
+def end_to_end(requests, blocks=60):
+    """
+    µs per /dashboard GET through the test client with and without the hooks.
+    Short blocks alternate between the two modes in one process. The result is
+    the median difference between neighbouring blocks, so machine noise that
+    drifts over seconds cancels out.
+    returns: (median µs per request uninstrumented, median overhead µs)
+    """
+    from app import app
+    client = app.test_client()
+    client.post('/login', data={'email': 'admin@trustbank.com', 'password': 'admin123'})
+    for _ in range(200):
+        client.get('/dashboard')
+    timings = []
+    instrumented = True
+    for _ in range(blocks * 2):
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.get('/dashboard')
+        timings.append((instrumented, (time.perf_counter() - started) / requests * 1e6))
+        instrumented = not instrumented
+        _set_instrumented(app, instrumented)
+        for _ in range(5):
+            client.get('/dashboard')  # recompile templates after the toggle cleared the cache
+    differences = [on - off for (_, on), (_, off) in zip(timings[::2], timings[1::2])]
+    baseline = statistics.median(t for mode, t in timings if not mode)
+    return baseline, statistics.median(differences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+    os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(prefix='metrics-bench-'), 'bench.sqlite'))
+    os.environ['METRICS_ENABLED'] = '1'
+    sys.path.insert(0, ROOT)
+
+    per_request = hooks(args.requests)
+    print(f"hooks only ({QUERIES_PER_REQUEST} queries + 1 render): {per_request:6.2f} µs/request")
+
+    off, overhead = end_to_end(max(20, args.requests // 400))
+    print(f"/dashboard end to end: {off:7.1f} µs per request, metrics add {overhead:+.1f} µs "
+          f"({'within' if overhead < BUDGET_US else 'OVER'} the {BUDGET_US:.0f}µs budget)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+sqlite_concurrency.py — Read/write throughput of several worker processes sharing
+one SQLite file, with the default settings vs. the production mode
+(models.init_sqlite(production=True): WAL, busy_timeout, pragmas, pool).
+
+Each process mimics a gunicorn worker: it repeatedly either inserts a loan
+application (one commit) or reads a user's latest loan, for a fixed duration.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--workers 4] [--seconds 5] [--write-ratio 0.2]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from models import db, User, LoanApplication, init_sqlite
+
+USERS = 50
+
+
+def _make_app(db_file, production):
+    app = Flask(__name__)
+    init_sqlite(app, db_file, production=production)
+    return app
+
+
+def _seed(db_file, production):
+    app = _make_app(db_file, production)
+    with app.app_context():
+        db.create_all()
+        for i in range(USERS):
+            db.session.add(User(name=f'Bench {i}', email=f'bench{i}@example.com'))
+        db.session.commit()
+
+
+def _worker(db_file, production, seconds, write_ratio, seed, results):
+    app = _make_app(db_file, production)
+    rng = random.Random(seed)
+    reads = writes = errors = 0
+    with app.app_context():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            user_id = rng.randint(1, USERS)
+            try:
+                if rng.random() < write_ratio:
+                    db.session.add(LoanApplication(
+                        user_id=user_id, amount=50000, income=60000, credit_score=720,
+                        employment_years=5, debt_to_income=0.25, model_decision='APPROVE',
+                        model_confidence=0.9, submitted_at=datetime.utcnow()))
+                    db.session.commit()
+                    writes += 1
+                else:
+                    LoanApplication.query.filter_by(user_id=user_id).order_by(
+                        LoanApplication.submitted_at.desc()).first()
+                    db.session.rollback()
+                    reads += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put((reads, writes, errors))
+
+
+def run(production, workers, seconds, write_ratio):
+    tmp = tempfile.mkdtemp(prefix='sqlite-bench-')
+    db_file = os.path.join(tmp, 'bench.sqlite')
+    _seed(db_file, production)
+    results = mp.Queue()
+    procs = [mp.Process(target=_worker, args=(db_file, production, seconds, write_ratio, i, results))
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+    totals = [0, 0, 0]
+    for _ in procs:
+        for i, value in enumerate(results.get()):
+            totals[i] += value
+    for p in procs:
+        p.join()
+    reads, writes, errors = totals
+    return {'reads_per_sec': reads / seconds, 'writes_per_sec': writes / seconds, 'locked_errors': errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.seconds:.0f}s each, {args.write_ratio:.0%} writes")
+    print(f"  {'mode':<12} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    for label, production in (('default', False), ('production', True)):
+        r = run(production, args.workers, args.seconds, args.write_ratio)
+        print(f"  {label:<12} {r['reads_per_sec']:>10,.0f} {r['writes_per_sec']:>10,.0f} {r['locked_errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+startup.py — Cold-start latency and per-worker memory.
+
+1. Cold import: `import app` in a fresh interpreter against an existing
+   database (median of --runs), and which optional heavy modules got imported.
+2. First request: import plus the first /api/v1/decisions POST (model load)
+   and the first /login GET (template compile), in a fresh interpreter.
+3. gunicorn with --workers workers, with and without preload_app
+   (gunicorn.conf.py): time until the first response, then per-worker RSS,
+   PSS (shared pages split between the processes that map them) and USS
+   (pages only that worker has) after some traffic. These come from
+   /proc/<pid>/smaps_rollup, so this part needs Linux.
+
+Usage:
+    python benchmarks/startup.py [--workers 4] [--runs 5]
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('sklearn', 'scipy', 'pandas', 'joblib', 'pyarrow')
+API_KEY = 'startup-bench'
+APPLICANT = b'{"amount": 50000, "income": 60000, "credit_score": 720, "employment_years": 5, "debt_to_income": 0.25}'
+
+IMPORT_PROBE = f"""
+import sys, time
+started = time.perf_counter()
+import app
+print('BENCH', time.perf_counter() - started, ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+"""
+
+FIRST_REQUEST_PROBE = f"""
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+r = client.post('/api/v1/decisions', data={APPLICANT!r}, content_type='application/json',
+                headers={{'X-API-Key': {API_KEY!r}}})
+assert r.status_code == 200, r.status_code
+decided = time.perf_counter()
+assert client.get('/login').status_code == 200
+print('BENCH', imported - started, decided - imported, time.perf_counter() - decided)
+"""
+
+
+def _env(tmp, **extra):
+    env = dict(os.environ, DATABASE_PATH=os.path.join(tmp, 'bench.sqlite'), DECISION_API_KEY=API_KEY,
+               SQLITE_PRODUCTION='1', METRICS_DIR=os.path.join(tmp, 'metrics'), PYTHONDONTWRITEBYTECODE='0')
+    env.update(extra)
+    return env
+
+
+def _probe(code, env):
+    """Fields of the BENCH line the probe prints (the app's own log lines are skipped)."""
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return next(line.split()[1:] for line in out.splitlines() if line.startswith('BENCH '))
+
+
+def cold_import(env, runs):
+    times, heavy = [], ''
+    for _ in range(runs):
+        fields = _probe(IMPORT_PROBE, env)
+        times.append(float(fields[0]))
+        heavy = fields[1] if len(fields) > 1 else ''
+    return statistics.median(times), heavy
+
+
+def first_request(env, runs):
+    samples = [tuple(map(float, _probe(FIRST_REQUEST_PROBE, env)))
+               for _ in range(runs)]
+    return tuple(statistics.median(s[i] for s in samples) for i in range(3))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get(url, data=None):
+    request = urllib.request.Request(url, data=data, headers={'X-API-Key': API_KEY, 'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=5) as r:
+        return r.status
+
+
+def _memory(pid):
+    """(RSS, PSS, USS) in MB from smaps_rollup."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return fields['Rss'] / 1024, fields['Pss'] / 1024, uss / 1024
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(p) for p in f.read().split()]
+
+
+def gunicorn_run(env, workers, preload):
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    env = dict(env, GUNICORN_PRELOAD='1' if preload else '0')
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(workers),
+                             '-b', f'127.0.0.1:{port}', 'app:app'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                _get(f'{base}/login')
+                break
+            except OSError:
+                if proc.poll() is not None or time.perf_counter() - started > 60:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.02)
+        first_response = time.perf_counter() - started
+        while len(_children(proc.pid)) < workers:
+            time.sleep(0.05)
+        all_workers = time.perf_counter() - started
+        for _ in range(25 * workers):
+            _get(f'{base}/api/v1/decisions', APPLICANT)
+            _get(f'{base}/login')
+        time.sleep(0.5)
+        memory = [_memory(pid) for pid in _children(proc.pid)]
+        return first_response, all_workers, memory
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='startup-bench-')
+    env = _env(tmp)
+    _probe(IMPORT_PROBE, env)  # create the schema and admin once, outside the timings
+
+    seconds, heavy = cold_import(env, args.runs)
+    print(f"cold import app:       {seconds * 1000:7.1f} ms   (optional heavy modules loaded: {heavy or 'none'})")
+    imported, decided, rendered = first_request(env, args.runs)
+    print(f"first decision POST:   {decided * 1000:7.1f} ms   first /login render: {rendered * 1000:6.1f} ms")
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("[WARNING] /proc/<pid>/smaps_rollup not available; skipping the gunicorn part")
+        return
+    print(f"\ngunicorn, {args.workers} workers")
+    print(f"  {'mode':<11} {'first 200':>10} {'all up':>8} {'RSS/worker':>11} {'PSS/worker':>11} "
+          f"{'USS/worker':>11} {'PSS total':>10}")
+    for preload in (False, True):
+        first_response, all_up, memory = gunicorn_run(env, args.workers, preload)
+        rss, pss, uss = (statistics.mean(m[i] for m in memory) for i in range(3))
+        print(f"  {'preload' if preload else 'no preload':<11} {first_response * 1000:>8.0f}ms {all_up * 1000:>6.0f}ms "
+              f"{rss:>9.1f}MB {pss:>9.1f}MB {uss:>9.1f}MB {sum(m[1] for m in memory):>8.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
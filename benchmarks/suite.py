@@ -0,0 +1,306 @@
+"""
+suite.py — Timing benchmarks for the request and scoring hot paths, with
+regression checks against a stored JSON baseline.
+
+Everything runs in-process through the Flask test client against a fresh
+SQLite file in a temporary directory:
+
+    predict_single          ml.predict_single on one applicant
+    loan_form_post          full /loan-form POST (score, policy, insert, redirect)
+    dashboard_10            /dashboard for a user with 10 historical loans
+    dashboard_1k            ... 1,000 loans
+    dashboard_100k          ... 100,000 loans
+    login_post              /login POST (password verify) + /logout
+
+Each benchmark reports the median (of the fastest of several rounds) and the
+p95 in milliseconds. A benchmark whose median is more than --threshold (default
+25%) slower than the baseline is re-timed up to --retries times to rule out a
+noisy machine; if it is still slower, the run fails (exit 1).
+
+baseline.json may also hold "thresholds" (a per-benchmark allowed slowdown
+that overrides --threshold) and "notes" (why). Use them when a benchmark's cost
+has a known, accepted reason, rather than re-recording its reference number;
+--save keeps both.
+
+Usage:
+    python benchmarks/suite.py                 # run, compare with benchmarks/baseline.json
+    python benchmarks/suite.py --save          # write the baseline (median of 3 separate runs)
+    python benchmarks/suite.py --only dashboard --threshold 0.5
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+DEFAULT_THRESHOLD = float(os.environ.get('BENCH_THRESHOLD', '0.25'))
+ROUNDS = 5
+HISTORY_SIZES = {'dashboard_10': 10, 'dashboard_1k': 1_000, 'dashboard_100k': 100_000}
+APPLICANT = {'amount': 50000, 'income': 60000, 'credit_score': 720, 'employment_years': 5, 'debt_to_income': 0.25}
+
+
+def _setup_env(tmp):
+    """Point the app at a scratch database before it is imported."""
+    os.environ.update(
+        DATABASE_PATH=os.path.join(tmp, 'bench.sqlite'),
+        WRITE_BEHIND='0',
+        # A fixed hash cost keeps login timings comparable across runs (no calibration). It is
+        # the app's floor (Werkzeug's default), which every login has paid since before this suite
+        PASSWORD_HASH_METHOD='scrypt',
+        PASSWORD_HASH_COST=str(2 ** 15),
+    )
+    sys.path.insert(0, ROOT)
+
+
+def _time(fn, iterations, warmup, rounds=ROUNDS):
+    """
+    Time fn in `rounds` rounds with the GC paused. The reported median is the
+    fastest round's median: a noisy neighbour can slow a round down but never
+    speed one up, so this is the most repeatable figure. p95 covers all samples.
+    """
+    for _ in range(warmup):
+        fn()
+    per_round = max(1, iterations // rounds)
+    medians, samples = [], []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            round_samples = []
+            for _ in range(per_round):
+                started = time.perf_counter()
+                fn()
+                round_samples.append((time.perf_counter() - started) * 1000)
+            medians.append(statistics.median(round_samples))
+            samples.extend(round_samples)
+            gc.collect()
+    finally:
+        gc.enable()
+    samples.sort()
+    return {
+        'median_ms': min(medians),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'iterations': len(samples),
+    }
+
+
+def _seed_user(app, email, loans):
+    """Create a user with `loans` historical applications via one executemany."""
+    from sqlalchemy import insert
+    from models import db, User, LoanApplication
+    with app.app_context():
+        user = User(name=email.split('@')[0], email=email)
+        user.set_password('bench123')
+        db.session.add(user)
+        db.session.commit()
+        start = datetime.utcnow() - timedelta(days=365)
+        rows = [dict(APPLICANT, user_id=user.id, model_decision='APPROVE' if i % 3 else 'REJECT',
+                     model_confidence=0.8, explanation=None, submitted_at=start + timedelta(minutes=i))
+                for i in range(loans)]
+        for i in range(0, len(rows), 10_000):
+            db.session.execute(insert(LoanApplication.__table__), rows[i:i + 10_000])
+        db.session.commit()
+
+
+def _client(app, email):
+    client = app.test_client()
+    r = client.post('/login', data={'email': email, 'password': 'bench123'})
+    assert r.status_code == 302, f"login failed for {email}"
+    return client
+
+
+def _clear_flashes(client):
+    with client.session_transaction() as sess:
+        sess.pop('_flashes', None)
+
+
+def benchmarks(app, scale):
+    """Yield (name, callable, iterations, warmup); setup runs lazily per benchmark."""
+    import ml
+
+    def predict():
+        model, _ = ml.get_model()
+        features = dict(APPLICANT)
+        return lambda: ml.predict_single(model, features)
+    yield 'predict_single', predict, 2000 * scale, 200
+
+    def loan_form():
+        _seed_user(app, 'bench-form@example.com', 0)
+        client = _client(app, 'bench-form@example.com')
+
+        def post():
+            r = client.post('/loan-form', data=APPLICANT)
+            assert r.status_code == 302, r.status_code
+            _clear_flashes(client)
+        return post
+    yield 'loan_form_post', loan_form, 200 * scale, 20
+
+    for name, loans in HISTORY_SIZES.items():
+        def dashboard(loans=loans):
+            email = f'bench-{loans}@example.com'
+            _seed_user(app, email, loans)
+            client = _client(app, email)
+            _clear_flashes(client)
+
+            def get():
+                r = client.get('/dashboard')
+                assert r.status_code == 200, r.status_code
+            return get
+        yield name, dashboard, 200 * scale, 20
+
+    def login():
+        _seed_user(app, 'bench-login@example.com', 0)
+        client = app.test_client()
+
+        def post():
+            r = client.post('/login', data={'email': 'bench-login@example.com', 'password': 'bench123'})
+            assert r.status_code == 302, r.status_code
+            client.get('/logout')
+        return post
+    yield 'login_post', login, 25 * scale, 3
+
+
+def run(only=None, scale=1):
+    tmp = tempfile.mkdtemp(prefix='bench-suite-')
+    _setup_env(tmp)
+    from app import app
+
+    results, timers = {}, {}
+    for name, setup, iterations, warmup in benchmarks(app, scale):
+        if only and not any(o in name for o in only):
+            continue
+        fn = setup()
+        timers[name] = lambda fn=fn, iterations=iterations, warmup=warmup: _time(fn, iterations, warmup)
+        results[name] = _report(name, timers[name]())
+    return results, timers
+
+
+def _report(name, r):
+    print(f"  {name:<18} median {r['median_ms']:>9.3f} ms   p95 {r['p95_ms']:>9.3f} ms   (n={r['iterations']})")
+    return r
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table; returns the names that regressed past their threshold."""
+    regressions = []
+    print(f"\n  {'benchmark':<18} {'baseline':>10} {'now':>10} {'change':>8} {'allowed':>8}")
+    for name, r in results.items():
+        base = baseline['results'].get(name)
+        if not base:
+            print(f"  {name:<18} {'—':>10} {r['median_ms']:>10.3f} {'new':>8}")
+            continue
+        allowed = baseline.get('thresholds', {}).get(name, threshold)
+        change = r['median_ms'] / base['median_ms'] - 1
+        flag = '  REGRESSION' if change > allowed else ''
+        print(f"  {name:<18} {base['median_ms']:>10.3f} {r['median_ms']:>10.3f} {change:>+8.1%} {allowed:>+8.0%}{flag}")
+        if change > allowed:
+            regressions.append(name)
+    return regressions
+
+
+def _median_of_runs(args):
+    """
+    Run the suite in args.save_runs fresh processes and keep each benchmark's median run.
+    Machine noise can make a whole process fast or slow, so one run can be
+    unrepresentative whichever way it goes.
+    """
+    runs = []
+    for i in range(args.save_runs):
+        print(f"Run {i + 1} of {args.save_runs}")
+        out = os.path.join(tempfile.mkdtemp(prefix='bench-run-'), 'results.json')
+        cmd = [sys.executable, os.path.abspath(__file__), '--no-compare', '--output', out, '--scale', str(args.scale)]
+        if args.only:
+            cmd += ['--only', *args.only]
+        subprocess.run(cmd, check=True)
+        with open(out) as f:
+            runs.append(json.load(f)['results'])
+    return {name: sorted((r[name] for r in runs), key=lambda r: r['median_ms'])[len(runs) // 2]
+            for name in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed median slowdown as a fraction (default %(default)s)")
+    parser.add_argument('--only', nargs='*', help="run benchmarks whose name contains any of these")
+    parser.add_argument('--scale', type=int, default=1, help="multiply iteration counts")
+    parser.add_argument('--retries', type=int, default=2, help="re-time apparent regressions this many times")
+    parser.add_argument('--save-runs', type=int, default=3,
+                        help="separate processes whose per-benchmark median becomes the baseline")
+    parser.add_argument('--output', help="also write this run's results to a JSON file")
+    parser.add_argument('--no-compare', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.save:
+        results = _median_of_runs(args)
+    else:
+        results, timers = run(args.only, args.scale)
+    report = {'environment': environment(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.no_compare:
+        return
+
+    if args.save:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            report.update((key, previous[key]) for key in ('thresholds', 'notes') if key in previous)
+            if args.only:
+                # Partial run: keep the other benchmarks' baselines
+                report['results'] = dict(previous['results'], **results)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[OK] Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\n[WARNING] No baseline at {args.baseline}; run with --save to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['environment'].get('cpus') != os.cpu_count() or \
+            baseline['environment'].get('processor') != environment()['processor']:
+        print("[WARNING] Baseline was recorded on different hardware; timings may not be comparable")
+    regressions = compare(results, baseline, args.threshold)
+    for attempt in range(args.retries):
+        if not regressions:
+            break
+        print(f"\n  Re-timing {', '.join(regressions)} (attempt {attempt + 1} of {args.retries})")
+        for name in regressions:
+            again = _report(name, timers[name]())
+            if again['median_ms'] < results[name]['median_ms']:
+                results[name] = again
+        regressions = compare({name: results[name] for name in regressions}, baseline, args.threshold)
+    if regressions:
+        print(f"\n[FAIL] {len(regressions)} benchmark(s) slower than baseline by more than allowed: "
+              f"{', '.join(regressions)}")
+        raise SystemExit(1)
+    print("\n[OK] No benchmark regressed by more than allowed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+write_behind.py — Loan-form submission throughput and latency with one commit per
+request vs. the write-behind log (WRITE_BEHIND=1, see writebehind.py).
+
+Each process imports the full app against a shared SQLite file in production
+mode, logs in and posts /loan-form as fast as it can for a fixed duration,
+like a gunicorn worker under a burst of applicants. At the end every log is
+drained and the stored row count is checked against the acknowledged posts.
+
+Usage:
+    python benchmarks/write_behind.py [--workers 4] [--seconds 5]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORM = dict(amount=50000, income=60000, credit_score=720, employment_years=5, debt_to_income=0.25)
+
+
+def _env(tmp, write_behind):
+    os.environ.update(DATABASE_PATH=os.path.join(tmp, 'bench.sqlite'), SQLITE_PRODUCTION='1',
+                      WRITE_BEHIND='1' if write_behind else '0', WRITE_BEHIND_DIR=os.path.join(tmp, 'wb'))
+    sys.path.insert(0, ROOT)
+
+
+def _worker(tmp, write_behind, seconds, start, results):
+    _env(tmp, write_behind)
+    from app import app
+    client = app.test_client()
+    client.post('/login', data={'email': 'admin@trustbank.com', 'password': 'admin123'})
+    start.wait()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        t = time.perf_counter()
+        r = client.post('/loan-form', data=FORM)
+        if r.status_code == 302:
+            latencies.append(time.perf_counter() - t)
+        with client.session_transaction() as sess:
+            sess.pop('_flashes', None)  # the redirect is never followed; don't let flashes pile up
+    results.put(latencies)
+
+
+def _count(tmp, write_behind):
+    _env(tmp, write_behind)
+    from app import app
+    import writebehind
+    from models import LoanApplication
+    with app.app_context():
+        writebehind.drain()
+        return LoanApplication.query.count()
+
+
+def run(write_behind, workers, seconds):
+    ctx = mp.get_context('spawn')  # fresh interpreter per worker so the env vars apply
+    tmp = tempfile.mkdtemp(prefix='write-behind-bench-')
+    with ctx.Pool(1) as pool:
+        pool.apply(_count, (tmp, write_behind))  # create the schema once
+    start, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(tmp, write_behind, seconds, start, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    time.sleep(3.0)  # let every worker finish importing
+    start.set()
+    latencies = sorted(l for _ in procs for l in results.get())
+    for p in procs:
+        p.join()
+    with ctx.Pool(1) as pool:
+        stored = pool.apply(_count, (tmp, write_behind))
+    n = len(latencies)
+    return {'posts_per_sec': n / seconds, 'p50_ms': latencies[n // 2] * 1000 if n else 0.0,
+            'p99_ms': latencies[int(n * 0.99)] * 1000 if n else 0.0, 'acked': n, 'stored': stored}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.seconds:.0f}s of /loan-form posts")
+    print(f"  {'mode':<14} {'posts/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'acked':>7} {'stored':>7}")
+    for label, write_behind in (('commit', False), ('write-behind', True)):
+        r = run(write_behind, args.workers, args.seconds)
+        print(f"  {label:<14} {r['posts_per_sec']:>9,.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['acked']:>7,} {r['stored']:>7,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Shared pytest setup. The whole session runs against a scratch database, so
+importing app (test_db.py, test_user_flow.py, ...) never touches instance/.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import uuid
+import warnings
+
+import numpy as np
+import pytest
+from flask import Flask
+
+_scratch = tempfile.mkdtemp(prefix='loan-tests-')
+atexit.register(shutil.rmtree, _scratch, True)
+os.environ['DATABASE_PATH'] = os.path.join(_scratch, 'app.sqlite')
+for name in ('ARCHIVE_DIR', 'WRITE_BEHIND', 'WRITE_BEHIND_DIR'):
+    os.environ.pop(name, None)
+
+from models import db, init_sqlite  # noqa: E402  (after DATABASE_PATH is set)
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Factory for bare apps (models only, no routes), each bound to its own empty database under tmp_path."""
+    apps = []
+
+    def make():
+        app = Flask(__name__)
+        init_sqlite(app, str(tmp_path / f'app-{len(apps)}.sqlite'))
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+
+@pytest.fixture
+def scratch_app(make_app):
+    """A bare app on an empty database, with its app context pushed for the test."""
+    app = make_app()
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def make_user():
+    """Factory for users with a unique email in the real app's scratch database; returns (id, email)."""
+    from app import app
+    from models import User
+
+    def make(password='secret123', is_admin=False):
+        email = f"user_{uuid.uuid4().hex[:8]}@example.com"
+        with app.app_context():
+            user = User(name='Test User', email=email, is_admin=is_admin)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+            return user.id, email
+
+    return make
+
+
+@pytest.fixture
+def login():
+    """login(email, password) -> a test client of the real app with that user signed in."""
+    from app import app
+
+    def sign_in(email, password='secret123'):
+        client = app.test_client()
+        response = client.post('/login', data={'email': email, 'password': password})
+        assert response.status_code == 302, response.status_code
+        return client
+
+    return sign_in
+
+
+@pytest.fixture(scope='session')
+def applicant_matrix():
+    """A fixed sample of 2,000 applicants in FEATURES order, plus zero and extreme rows."""
+    rng = np.random.default_rng(1)
+    n = 2000
+    X = np.column_stack([rng.uniform(0, 300000, n), rng.integers(200, 851, n), rng.uniform(0, 30, n),
+                         rng.uniform(0, 1, n), rng.uniform(1000, 500000, n)])
+    return np.vstack([X, np.zeros(5), [1e7, 850, 40, 0.0, 1e3], [0, 300, 0, 2.0, 1e7]])
+
+
+@pytest.fixture(scope='session')
+def sklearn_model():
+    """The committed model_joblib.pkl that model_weights.json was exported from (skipped without scikit-learn)."""
+    joblib = pytest.importorskip('joblib')
+    pytest.importorskip('sklearn')
+    from ml import MODEL_PATH
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # pickled by an older scikit-learn
+        return joblib.load(MODEL_PATH)
@@ -0,0 +1,182 @@
+"""
+counterfactual.py — "What would get me approved?" for rejected applicants.
+
+suggest() builds a grid of candidate profiles around the applicant. It only
+moves features the way an applicant can actually move them, within limits:
+
+  amount            down, to no less than 30% of the request and min_amount
+  income            up, by at most 50%
+  credit_score      up, by at most 150 points (form maximum 900)
+  employment_years  up, by at most 3 years (time passing)
+  debt_to_income    down, by paying debt off (the ratio is then recomputed
+                    against the candidate income, so a raise lowers it too)
+
+Each feature gets a handful of levels: regular steps plus the values that
+just satisfy each of the policy's thresholds (and the amount and income
+implied by the loan-to-income limits), so the smallest change that clears
+a rule is on the grid. Every combination of levels for up to MAX_CHANGED
+features at a time (the rest stay as they are) makes some ten thousand
+rows. They are scored in one pass through ml.predict_batch and
+LoanPolicy.evaluate, exactly as loan_form decides.
+
+Approved candidates are ranked by effort: EFFORT per feature, plus
+CHANGE_PENALTY for every feature touched. A candidate is dropped when a
+cheaper one already changes a subset of its features.
+"""
+from itertools import combinations
+
+import numpy as np
+
+from policy import POLICY, FEATURES
+
+MAX_CREDIT_SCORE = 900          # the loan form's upper bound
+MIN_AMOUNT_FRACTION = 0.3
+MAX_INCOME_GAIN = 0.5
+MAX_CREDIT_GAIN = 150
+MAX_EXTRA_YEARS = 3.0
+MAX_CHANGED = 3
+MAX_SUGGESTIONS = 3
+
+# Change that counts as one unit of effort
+EFFORT = {
+    'amount': 0.2,              # a 20% smaller loan
+    'income': 0.1,              # a 10% raise
+    'credit_score': 40.0,       # 40 points
+    'employment_years': 1.0,    # a year of waiting
+    'debt_to_income': 0.05,     # paying off debt worth 5% of income
+}
+CHANGE_PENALTY = 1.0
+
+# Step past a strict threshold, in each feature's own units
+_EPSILON = {'income': 1.0, 'credit_score': 1.0, 'employment_years': 0.1, 'debt_to_income': 0.001}
+
+
+def _thresholds(feature):
+    """(threshold, op) for every rule, tier condition and reason the policy applies to feature."""
+    rules = [rule['when'] for rule in POLICY.advisories] + list(POLICY.critical)
+    rules += [rule['when'] for rule in POLICY.fallback['reasons']]
+    rules += [condition for tier in POLICY.tiers for condition in tier['conditions']]
+    return {(float(threshold), op) for name, op, threshold in rules if name == feature}
+
+
+def _rising(feature):
+    """Lowest values at or above each threshold that put feature on the approving side of it."""
+    eps = _EPSILON[feature]
+    # Rules are written as ge/gt (passes above) or lt/le (reason fires below); either way, reach the boundary
+    return [t + eps if op in ('gt', 'le') else t for t, op in _thresholds(feature)]
+
+
+def _falling(feature):
+    eps = _EPSILON[feature]
+    return [t - eps if op in ('lt', 'ge') else t for t, op in _thresholds(feature)]
+
+
+def _levels(current, candidates, low, high, round_to):
+    """Sorted unique candidate values in [low, high] other than the current one, rounded towards it."""
+    values = np.asarray(candidates, dtype=float) / round_to
+    values = (np.floor(values) if high <= current else np.ceil(values - 1e-9)) * round_to
+    values = np.unique(np.round(values, 6))
+    return values[(values >= low) & (values <= high) & (np.abs(values - current) > 1e-9)]
+
+
+def feature_levels(applicant):
+    """{feature: (L,) changed values it may take}; debt_to_income levels are at the current income."""
+    amount, income = applicant['amount'], applicant['income']
+    credit, years, dti = applicant['credit_score'], applicant['employment_years'], applicant['debt_to_income']
+    loan_to_income = [t for t, _ in _thresholds('loan_to_income') if t > 0]
+    return {
+        'amount': _levels(amount, [*(amount * np.linspace(1, MIN_AMOUNT_FRACTION, 15)),
+                                   *(t * income for t in loan_to_income)],
+                          min(amount, max(POLICY.min_amount, amount * MIN_AMOUNT_FRACTION)), amount, 1000),
+        'income': _levels(income, [*(income * np.array([1.05, 1.1, 1.15, 1.2, 1.3, 1.4, 1.5])), *_rising('income'),
+                                   *(amount / t for t in loan_to_income)],
+                          income, income * (1 + MAX_INCOME_GAIN), 1000),
+        'credit_score': _levels(credit, [*(credit + np.array([10, 20, 30, 50, 75, 100, 125, 150])),
+                                         *_rising('credit_score')],
+                                credit, min(MAX_CREDIT_SCORE, credit + MAX_CREDIT_GAIN), 1),
+        'employment_years': _levels(years, [*(years + np.array([0.5, 1, 1.5, 2, 3])), *_rising('employment_years')],
+                                    years, years + MAX_EXTRA_YEARS, 0.1),
+        'debt_to_income': _levels(dti, [*(dti - np.array([0.02, 0.05, 0.08, 0.1, 0.15, 0.2, 0.25, 0.3])),
+                                        *_falling('debt_to_income')],
+                                  0.0, dti, 0.001),
+    }
+
+
+def candidate_grid(applicant):
+    """
+    Every combination of levels for up to MAX_CHANGED features, the others left as they are.
+    returns: (columns dict of (M,) arrays for the policy, debt_to_income at the current income (M,))
+    """
+    levels = feature_levels(applicant)
+    blocks = []
+    for k in range(1, MAX_CHANGED + 1):
+        for subset in combinations(FEATURES, k):
+            grid = np.meshgrid(*(levels[name] for name in subset), indexing='ij')
+            size = grid[0].size
+            if size:
+                block = {name: np.full(size, applicant[name]) for name in FEATURES}
+                block.update((name, g.ravel()) for name, g in zip(subset, grid))
+                blocks.append(block)
+    if not blocks:
+        empty = np.zeros(0)
+        return {name: empty for name in FEATURES}, empty
+    columns = {name: np.concatenate([block[name] for block in blocks]) for name in FEATURES}
+    debt = columns['debt_to_income']
+    columns['debt_to_income'] = debt * applicant['income'] / columns['income']
+    return columns, debt
+
+
+def effort(applicant, columns, debt):
+    """(M,) effort of each candidate and (M, 5) mask of the features it changes (FEATURES order)."""
+    deltas = {
+        'amount': (applicant['amount'] - columns['amount']) / applicant['amount'],
+        'income': (columns['income'] - applicant['income']) / applicant['income'],
+        'credit_score': columns['credit_score'] - applicant['credit_score'],
+        'employment_years': columns['employment_years'] - applicant['employment_years'],
+        'debt_to_income': applicant['debt_to_income'] - debt,
+    }
+    changed = np.column_stack([deltas[name] > 1e-9 for name in FEATURES])
+    cost = sum(deltas[name] / EFFORT[name] for name in FEATURES) + CHANGE_PENALTY * changed.sum(axis=1)
+    return cost, changed
+
+
+def suggest(applicant, model=None, limit=MAX_SUGGESTIONS):
+    """
+    Cheapest reachable changes that turn applicant (a mapping of FEATURES) into an approval.
+    model: the served model (ml.get_model()[0]), or None to decide by the rules alone
+    returns: list of {'changes': [(feature, current, suggested)], 'confidence', 'tier', 'effort'},
+             cheapest first; empty when nothing on the grid is approved
+    """
+    applicant = {name: float(applicant[name]) for name in FEATURES}
+    if applicant['amount'] <= 0 or applicant['income'] <= 0:
+        return []  # every limit is relative to these
+    columns, debt = candidate_grid(applicant)
+    if not len(debt):
+        return []
+    model_decisions = model_confidences = None
+    if model is not None:
+        from ml import predict_batch
+        model_decisions, model_confidences, _, _ = predict_batch(model, columns)
+    result = POLICY.evaluate(columns, model_decisions, model_confidences)
+
+    approved = np.flatnonzero(result.decisions == 'APPROVE')
+    cost, changed = effort(applicant, columns, debt)
+    approved = approved[np.argsort(cost[approved], kind='stable')]
+
+    suggestions, taken = [], []
+    shown = {'debt_to_income': debt}
+    for idx in approved:
+        mask = changed[idx]
+        if any((mask | earlier).tolist() == mask.tolist() for earlier in taken):
+            continue  # a cheaper suggestion already needs only some of these changes
+        taken.append(mask)
+        suggestions.append({
+            'changes': [(name, applicant[name], float(shown.get(name, columns[name])[idx]))
+                        for name, moved in zip(FEATURES, mask) if moved],
+            'confidence': float(result.confidences[idx]),
+            'tier': result.tiers[idx] or None,
+            'effort': float(cost[idx]),
+        })
+        if len(suggestions) >= limit:
+            break
+    return suggestions
@@ -0,0 +1,214 @@
+"""
+drift.py — Feature drift of live applicants against the model's training data.
+
+Each feature has fixed bin edges (BINS). Every decision adds one count per
+feature to a per-day histogram in governance_rollup, under metric 'drift',
+key '<feature>:<bin>', value_sum the feature's sum. The counts are written
+in the same upsert and transaction as the other governance counters
+(governance.rollup_counts), so the update is O(1) per decision and nothing
+ever rescans loan_application.
+
+The reference is the same histogram over the training rows. It is stored in
+model_weights.json under "reference", so it is promoted together with the
+model it describes. train_model.py and ml.train_from_dataframe compute it
+while they train. The shipped model_weights.json carries the reference of
+the 12-row sample that model was fitted on, too small to score against
+(DRIFT_MIN_SAMPLES) until the first retrain. For a model trained elsewhere, `python drift.py
+--set-reference` builds one from the rollups of a past date range.
+
+report() sums the daily histograms over sliding windows (DRIFT_WINDOWS days,
+ending today) and compares each window with the reference:
+  PSI  sum((live - ref) * ln(live / ref)) over bin shares; below 0.1 is
+       stable, 0.1-0.25 moderate, above 0.25 significant drift
+  KS   the largest gap between the two cumulative distributions at the bin
+       edges, a lower bound on the exact KS statistic, flagged when it passes
+       the 5% critical value for the two sample sizes
+Windows (or references) with fewer than DRIFT_MIN_SAMPLES rows are not scored.
+
+Usage:
+    python drift.py                                              # print the report
+    python drift.py --set-reference --start 2026-01-01 --end 2026-03-31
+"""
+import argparse
+import bisect
+import json
+import math
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from policy import FEATURES
+
+# Interior bin edges: bin 0 is below the first edge, the last bin at or above the last edge
+BINS = {
+    'income': [10000, 20000, 25000, 30000, 40000, 50000, 60000, 75000, 100000, 150000, 200000, 300000],
+    'credit_score': [300, 350, 400, 450, 500, 550, 600, 650, 700, 750, 800, 850],
+    'employment_years': [0.5, 1, 2, 3, 5, 7, 10, 15, 20],
+    'debt_to_income': [0.1, 0.2, 0.3, 0.36, 0.4, 0.43, 0.5, 0.6, 0.8],
+    'amount': [5000, 10000, 20000, 30000, 50000, 75000, 100000, 150000, 200000, 300000, 500000],
+}
+METRIC = 'drift'
+WINDOWS = [int(days) for days in os.environ.get('DRIFT_WINDOWS', '1,7,30').split(',')]
+MIN_SAMPLES = int(os.environ.get('DRIFT_MIN_SAMPLES', '100'))
+PSI_MODERATE, PSI_SIGNIFICANT = 0.1, 0.25
+_SMOOTHING = 0.5    # pseudo-count per bin, so an empty bin does not make PSI infinite
+
+
+def bin_index(feature, value):
+    return bisect.bisect_right(BINS[feature], value)
+
+
+def histograms(X):
+    """{feature: bin counts (list)} of an (N, 5) array in FEATURES order; for the training reference."""
+    X = np.asarray(X, dtype=float)
+    return {name: np.bincount(np.searchsorted(BINS[name], X[:, j], side='right'),
+                              minlength=len(BINS[name]) + 1).tolist()
+            for j, name in enumerate(FEATURES)}
+
+
+def add_histograms(total, counts):
+    """Add one histograms() result into another (in place); returns total."""
+    for name, values in counts.items():
+        total[name] = [a + b for a, b in zip(total.get(name, [0] * len(values)), values)]
+    return total
+
+
+def make_reference(counts, source):
+    return {'source': source, 'rows': int(sum(counts[FEATURES[0]])), 'bins': BINS, 'counts': counts}
+
+
+def load_reference(weights_path=None):
+    """The served model's reference dict, or None if it has none (or its bins no longer match BINS)."""
+    from ml import WEIGHTS_PATH
+    try:
+        with open(weights_path or WEIGHTS_PATH) as f:
+            weights = json.load(f)
+    except (OSError, ValueError):
+        return None
+    reference = weights.get('reference')
+    if not reference or reference.get('bins') != BINS:
+        return None
+    reference['model_version'] = weights.get('model_version')
+    return reference
+
+
+def psi(live, reference):
+    live = np.asarray(live, dtype=float) + _SMOOTHING
+    reference = np.asarray(reference, dtype=float) + _SMOOTHING
+    p, q = live / live.sum(), reference / reference.sum()
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+def ks(live, reference):
+    """(max CDF gap at the bin edges, True if above the 5% critical value)."""
+    n, m = sum(live), sum(reference)
+    gap = float(np.max(np.abs(np.cumsum(live) / n - np.cumsum(reference) / m)))
+    return gap, gap > 1.36 * math.sqrt((n + m) / (n * m))
+
+
+def window_counts(days, today=None):
+    """{window days: {feature: bin counts}} summed from the daily drift rollups, one query for all windows."""
+    from sqlalchemy import select
+    from models import db, GovernanceRollup
+    table = GovernanceRollup.__table__
+    today = today or datetime.utcnow().date()
+    since = today - timedelta(days=max(days) - 1)
+    windows = {d: {name: [0] * (len(BINS[name]) + 1) for name in FEATURES} for d in days}
+    for day, key, count in db.session.execute(
+            select(table.c.day, table.c.key, table.c['count'])
+            .where(table.c.metric == METRIC, table.c.day >= since, table.c.day <= today)):
+        feature, index = key.rsplit(':', 1)
+        if feature not in BINS:
+            continue
+        age = (today - day).days
+        for d in days:
+            if age < d:
+                windows[d][feature][int(index)] += count
+    return windows
+
+
+def report(reference=None, days=None):
+    """
+    Drift of each feature per window against the reference.
+    returns: {'reference': dict or None, 'min_samples', 'windows': [{'days', 'decisions', 'features':
+             [{'feature', 'psi', 'level', 'ks', 'ks_drift'}]}]}, psi/ks None where either side has fewer
+             than MIN_SAMPLES rows
+    """
+    reference = reference or load_reference()
+    days = days or WINDOWS
+    windows = []
+    for d, counts in window_counts(days).items():
+        decisions = sum(counts[FEATURES[0]])
+        features = []
+        for name in FEATURES:
+            row = {'feature': name, 'psi': None, 'level': None, 'ks': None, 'ks_drift': False}
+            if reference and decisions >= MIN_SAMPLES and reference['rows'] >= MIN_SAMPLES:
+                row['psi'] = psi(counts[name], reference['counts'][name])
+                row['level'] = ('significant' if row['psi'] > PSI_SIGNIFICANT
+                                else 'moderate' if row['psi'] > PSI_MODERATE else 'stable')
+                row['ks'], row['ks_drift'] = ks(counts[name], reference['counts'][name])
+            features.append(row)
+        windows.append({'days': d, 'decisions': decisions, 'features': features})
+    return {'reference': reference, 'min_samples': MIN_SAMPLES, 'windows': windows}
+
+
+def set_reference(start, end, weights_path=None):
+    """Store the rollup histograms of [start, end] as the served model's reference; returns it."""
+    from ml import WEIGHTS_PATH
+    weights_path = weights_path or WEIGHTS_PATH
+    span = (end - start).days + 1
+    counts = window_counts([span], today=end)[span]
+    if sum(counts[FEATURES[0]]) == 0:
+        raise ValueError(f"No decisions recorded between {start} and {end}")
+    with open(weights_path) as f:
+        weights = json.load(f)
+    weights['reference'] = make_reference(counts, f'decisions {start} to {end}')
+    tmp = f"{weights_path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(weights, f, indent=2)
+    os.replace(tmp, weights_path)
+    return weights['reference']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature drift of live applicants against the training data.")
+    parser.add_argument('--set-reference', action='store_true',
+                        help="use the decisions between --start and --end as the served model's reference")
+    parser.add_argument('--start', type=lambda v: datetime.strptime(v, '%Y-%m-%d').date())
+    parser.add_argument('--end', type=lambda v: datetime.strptime(v, '%Y-%m-%d').date())
+    args = parser.parse_args()
+
+    from app import app
+    with app.app_context():
+        if args.set_reference:
+            if not args.start or not args.end:
+                parser.error("--set-reference needs --start and --end")
+            try:
+                reference = set_reference(args.start, args.end)
+            except ValueError as e:
+                print(f"[ERROR] {e}")
+                raise SystemExit(1)
+            print(f"[OK] Reference set from {reference['source']} ({reference['rows']:,} decisions)")
+            return
+        result = report()
+
+    if result['reference'] is None:
+        print("[WARNING] The served model has no training reference; see --set-reference")
+        return
+    print(f"Reference: {result['reference']['source']}, {result['reference']['rows']:,} rows")
+    if result['reference']['rows'] < MIN_SAMPLES:
+        print(f"[WARNING] The reference has fewer than {MIN_SAMPLES} rows, so nothing is scored; "
+              f"retrain the model or see --set-reference")
+    for window in result['windows']:
+        print(f"\nLast {window['days']} day(s): {window['decisions']:,} decisions")
+        for row in window['features']:
+            if row['psi'] is None:
+                print(f"  {row['feature']:<18} not enough decisions (need {MIN_SAMPLES})")
+            else:
+                print(f"  {row['feature']:<18} PSI {row['psi']:.3f} ({row['level']})  "
+                      f"KS {row['ks']:.3f}{' (drift)' if row['ks_drift'] else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+export_loans.py — Stream loan applications out as CSV (optionally gzipped) or Parquet.
+
+Rows come through a streaming cursor (stream_results) in chunks of
+--chunk-size, and each chunk is encoded and written before the next one is
+fetched, so memory stays flat however large the table is. The same generators
+back GET /admin/export, which sends the file as a chunked HTTP response.
+
+Loans moved to cold storage by archive.py are included: the matching archived
+rows come first, one segment at a time, then the rows still in the table. Each
+part is in id order.
+
+Filters: submitted_at date range (inclusive) and final decision (the human
+override when there is one, else the model decision).
+
+Parquet output needs pyarrow (in requirements.txt); each chunk becomes one
+row group.
+
+Usage:
+    python export_loans.py loans.csv.gz
+    python export_loans.py loans.parquet --start 2026-01-01 --end 2026-03-31 --decision REJECT
+"""
+import argparse
+import csv
+import io
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+import archive
+from models import db, LoanApplication
+
+DEFAULT_CHUNK_SIZE = 10000
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+DECISIONS = ('APPROVE', 'REJECT')
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.parquet'):
+        return 'parquet'
+    return 'csv.gz' if name.endswith('.gz') else 'csv'
+
+
+def parse_date(value):
+    """YYYY-MM-DD -> datetime, None for empty; ValueError otherwise."""
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+
+def export_query(start=None, end=None, decision=None):
+    """
+    SELECT of every loan_application column in id order.
+    start / end: datetimes (end is inclusive of its whole day); decision: 'APPROVE' or 'REJECT'
+    """
+    table = LoanApplication.__table__
+    query = select(table).order_by(table.c.id)
+    if start:
+        query = query.where(table.c.submitted_at >= start)
+    if end:
+        query = query.where(table.c.submitted_at < end + timedelta(days=1))
+    if decision:
+        if decision not in DECISIONS:
+            raise ValueError(f"decision must be one of {', '.join(DECISIONS)}")
+        query = query.where(func.coalesce(table.c.human_override, table.c.model_decision) == decision)
+    return query
+
+
+def archived_batches(start=None, end=None, decision=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield lists of row tuples (columns() order) of the archived loans export_query's filters
+    would select, chunk_size at a time, in id order within each archive segment.
+    """
+    names = columns()
+    for rows in archive.records(names, start, end + timedelta(days=1) if end else None):
+        if decision:
+            rows = [row for row in rows if (row['human_override'] or row['model_decision']) == decision]
+        rows.sort(key=lambda row: row['id'])
+        for i in range(0, len(rows), chunk_size):
+            yield [tuple(row[name] for name in names) for row in rows[i:i + chunk_size]]
+
+
+def iter_batches(query, chunk_size=DEFAULT_CHUNK_SIZE, stats=None, archived=()):
+    """
+    Yield lists of row tuples, chunk_size at a time: the batches in archived (see
+    archived_batches), then the rows of query from one streaming cursor.
+    Must run inside an app context. stats: optional dict updated with rows, seconds, rows_per_sec
+    """
+    started = time.perf_counter()
+    if stats is not None:
+        stats.update(rows=0, seconds=0.0, rows_per_sec=0.0)
+
+    def counted(batch):
+        if stats is not None:
+            stats['rows'] += len(batch)
+            stats['seconds'] = time.perf_counter() - started
+            stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        return batch
+
+    for batch in archived:
+        yield counted(batch)
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for batch in result.partitions():
+            yield counted(batch)
+
+
+def columns():
+    return [column.name for column in LoanApplication.__table__.columns]
+
+
+def csv_chunks(batches):
+    """Header, then one encoded block of CSV per batch."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns())
+    for batch in batches:
+        writer.writerows(batch)
+        yield buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of byte blocks into one gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+class ParquetUnavailable(RuntimeError):
+    """Parquet was asked for but pyarrow is not installed."""
+
+
+def require_pyarrow():
+    """Raise ParquetUnavailable unless pyarrow can be imported; check before streaming starts."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ParquetUnavailable("Parquet export needs pyarrow (pip install pyarrow)")
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    types = {int: pa.int64(), float: pa.float64(), bool: pa.bool_(), datetime: pa.timestamp('us')}
+    fields = []
+    for column in LoanApplication.__table__.columns:
+        try:
+            arrow_type = types.get(column.type.python_type, pa.string())
+        except NotImplementedError:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=column.nullable or column.primary_key))
+    return pa.schema(fields)
+
+
+class _Spool(io.RawIOBase):
+    """Write-only sink that hands its bytes over on take(); tell() keeps counting for Parquet offsets."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_chunks(batches, compression='snappy'):
+    """One Parquet row group per batch; yields the file's bytes as each group is written."""
+    require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = _arrow_schema()
+    sink = _Spool()
+    with pq.ParquetWriter(sink, schema, compression=compression) as writer:
+        for batch in batches:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    yield sink.take()
+
+
+def encode(batches, fmt):
+    """Byte blocks of the export file in format fmt (a FORMATS key)."""
+    if fmt == 'parquet':
+        return parquet_chunks(batches)
+    chunks = csv_chunks(batches)
+    return gzip_chunks(chunks) if fmt == 'csv.gz' else chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export loan applications to CSV, gzipped CSV or Parquet.")
+    parser.add_argument('path', help="output file; the extension picks the format (.csv, .csv.gz, .parquet)")
+    parser.add_argument('--format', choices=list(FORMATS))
+    parser.add_argument('--start', type=parse_date, help="first submitted_at day, YYYY-MM-DD")
+    parser.add_argument('--end', type=parse_date, help="last submitted_at day (inclusive), YYYY-MM-DD")
+    parser.add_argument('--decision', choices=DECISIONS)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    fmt = args.format or detect_format(args.path)
+    if fmt == 'parquet':
+        try:
+            require_pyarrow()
+        except ParquetUnavailable as e:
+            print(f"[ERROR] {e}")
+            raise SystemExit(1)
+
+    from app import app
+    import writebehind
+
+    stats, written, report_at = {}, 0, 0
+    with app.app_context(), open(args.path, 'wb') as f:
+        writebehind.drain()
+        batches = iter_batches(export_query(args.start, args.end, args.decision), args.chunk_size, stats,
+                               archived_batches(args.start, args.end, args.decision, args.chunk_size))
+        for data in encode(batches, fmt):
+            f.write(data)
+            written += len(data)
+            if stats['rows'] >= report_at:
+                print(f"  {stats['rows']:,} rows, {written / 1e6:,.1f} MB ({stats['rows_per_sec']:,.0f} rows/s)")
+                report_at = stats['rows'] + 100 * args.chunk_size
+
+    print(f"[OK] {stats['rows']:,} loans written to {args.path} ({written / 1e6:,.1f} MB) in "
+          f"{stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,23 @@
 """
 extract_model.py — Run this ONCE locally to export model weights to JSON.
-The JSON file is then committed so Render never needs scikit-learn.
+The JSON file is then committed so Render never needs scikit-learn:
+the app scores from it with scorer.LinearScorer (MODEL_BACKEND=weights).
+
+ml.train_from_dataframe re-exports the weights automatically after training;
+this script is for refreshing them from an existing model_joblib.pkl.
 
 Usage:  python extract_model.py
 Output: model_weights.json
 """
-import json, joblib, os
+import joblib
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "model_joblib.pkl")
-OUT_PATH   = os.path.join(os.path.dirname(__file__), "model_weights.json")
+from ml import MODEL_PATH, WEIGHTS_PATH, export_weights
 
 model = joblib.load(MODEL_PATH)
+weights = export_weights(model)
 
-weights = {
-    "coef": model.coef_[0].tolist(),          # shape: (n_features,)
-    "intercept": float(model.intercept_[0]),
-    "classes": model.classes_.tolist(),
-    "features": ["income", "credit_score", "employment_years", "debt_to_income", "amount"]
-}
-
-with open(OUT_PATH, "w") as f:
-    json.dump(weights, f, indent=2)
-
-print(f"[OK] Saved model weights to: {OUT_PATH}")
+print(f"[OK] Saved model weights to: {WEIGHTS_PATH}")
 print(f"     coef      : {weights['coef']}")
 print(f"     intercept : {weights['intercept']}")
 print(f"     classes   : {weights['classes']}")
+print(f"     version   : {weights['model_version']}")
@@ -0,0 +1,247 @@
+"""
+governance.py — Incrementally maintained rollups behind the governance dashboard.
+
+Every write of a LoanApplication adds to a handful of counters in the
+governance_rollup table, in the same transaction:
+
+    metric       key                          count / value_sum
+    decision     APPROVE | REJECT             decisions / sum of confidences
+    confidence   <decision>:<bucket 0-9>      decisions per 10%-wide confidence bucket
+    credit_band  <band>:<decision>            decisions per credit-score band
+    explained    <decision>                   decisions stored with an explanation
+    override     <model>:<human>              human overrides (reviewed decisions)
+    drift        <feature>:<bin>              decisions per feature bin / sum of the feature (drift.py)
+    meta         rebuilt                      1 once rebuild() has backfilled the history (ALL_TIME row)
+
+ORM writes are picked up by a Session after_flush hook; Core bulk inserts
+(bulk_intake.insert_scored) call record_decisions() directly. The dashboard
+reads only these rows: its cost grows with the number of days and keys,
+never with the number of decisions.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+import archive
+from drift import METRIC as DRIFT, bin_index, report as drift_report
+from models import db, LoanApplication, GovernanceRollup
+from policy import FEATURES
+
+# Running all-time totals are kept under this sentinel day so the dashboard reads
+# a fixed number of rows instead of summing every day ever recorded.
+ALL_TIME = date(1970, 1, 1)
+
+# Marks that rebuild() has counted every loan stored before the rollups existed;
+# without it the table may only hold what was written since (see migrate_db.py)
+REBUILT = {'day': ALL_TIME, 'metric': 'meta', 'key': 'rebuilt'}
+
+CREDIT_BANDS = [(750, '750+'), (700, '700-749'), (650, '650-699'), (500, '500-649'), (300, '300-499'), (None, '<300')]
+
+_table = GovernanceRollup.__table__
+_upsert = sqlite_insert(_table)
+_upsert = _upsert.on_conflict_do_update(
+    index_elements=[_table.c.day, _table.c.metric, _table.c.key],
+    set_={
+        'count': _table.c['count'] + _upsert.excluded['count'],
+        'value_sum': _table.c.value_sum + _upsert.excluded.value_sum,
+    },
+)
+
+
+def credit_band(score):
+    for floor, label in CREDIT_BANDS:
+        if floor is None or score >= floor:
+            return label
+
+
+def confidence_bucket(confidence):
+    return min(max(int((confidence or 0.0) * 10), 0), 9)
+
+
+def _get(loan, name):
+    return loan[name] if isinstance(loan, dict) else getattr(loan, name)
+
+
+def rollup_counts(loans):
+    """Aggregate loans (dicts or LoanApplication objects) into {(day, metric, key): [count, value_sum]}."""
+    counts = defaultdict(lambda: [0, 0.0])
+    for loan in loans:
+        decision = _get(loan, 'model_decision')
+        if not decision:
+            continue
+        day = (_get(loan, 'submitted_at') or datetime.utcnow()).date()
+        confidence = _get(loan, 'model_confidence') or 0.0
+        c = counts[(day, 'decision', decision)]
+        c[0] += 1
+        c[1] += confidence
+        counts[(day, 'confidence', f'{decision}:{confidence_bucket(confidence)}')][0] += 1
+        counts[(day, 'credit_band', f"{credit_band(_get(loan, 'credit_score'))}:{decision}")][0] += 1
+        if _get(loan, 'explanation'):
+            counts[(day, 'explained', decision)][0] += 1
+        for name in FEATURES:
+            value = _get(loan, name)
+            if value is not None:
+                c = counts[(day, DRIFT, f'{name}:{bin_index(name, value)}')]
+                c[0] += 1
+                c[1] += value
+    return counts
+
+
+def apply_counts(connection, counts):
+    """Upsert per-day counters and the matching ALL_TIME totals (none for drift, which only reads days)."""
+    merged = defaultdict(lambda: [0, 0.0])
+    for (day, metric, key), (c, v) in counts.items():
+        for d in ((day,) if metric == DRIFT else (day, ALL_TIME)):
+            m = merged[(d, metric, key)]
+            m[0] += c
+            m[1] += v
+    if merged:
+        connection.execute(_upsert, [
+            {'day': day, 'metric': metric, 'key': key, 'count': c, 'value_sum': v}
+            for (day, metric, key), (c, v) in merged.items()
+        ])
+
+
+def record_decisions(connection, loans):
+    """Add freshly written loans to the rollups (call inside the inserting transaction)."""
+    apply_counts(connection, rollup_counts(loans))
+
+
+def _override_counts(loan, previous):
+    counts = defaultdict(lambda: [0, 0.0])
+    day = (loan.submitted_at or datetime.utcnow()).date()
+    if previous:
+        counts[(day, 'override', f'{loan.model_decision}:{previous}')][0] -= 1
+    if loan.human_override:
+        counts[(day, 'override', f'{loan.model_decision}:{loan.human_override}')][0] += 1
+    return counts
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_loans(session, flush_context):
+    new = [obj for obj in session.new if isinstance(obj, LoanApplication)]
+    connection = session.connection()
+    if new:
+        record_decisions(connection, new)
+    for obj in session.dirty:
+        if not isinstance(obj, LoanApplication):
+            continue
+        history = db.inspect(obj).attrs.human_override.history
+        if history.has_changes():
+            previous = history.deleted[0] if history.deleted else None
+            apply_counts(connection, _override_counts(obj, previous))
+
+
+def is_rebuilt():
+    """True once rebuild() has completed on this database."""
+    return db.session.execute(select(_table.c['count']).filter_by(**REBUILT)).scalar() is not None
+
+
+def rebuild():
+    """
+    Recompute every rollup from loan_application and the archive and set the REBUILT
+    marker, in one transaction (one-off backfill; see migrate_db.py).
+    """
+    db.session.execute(_table.delete())
+    columns = ['submitted_at', 'model_decision', 'model_confidence', 'explanation', *FEATURES]
+    query = select(*[LoanApplication.__table__.c[name] for name in columns]).execution_options(yield_per=10000)
+    for partition in db.session.execute(query).mappings().partitions():
+        record_decisions(db.session.connection(), partition)
+    counts = defaultdict(lambda: [0, 0.0])
+    for rows in archive.records(columns + ['human_override']):
+        record_decisions(db.session.connection(), rows)
+        for row in rows:
+            if row['human_override']:
+                day = row['submitted_at'].date()
+                counts[(day, 'override', f"{row['model_decision']}:{row['human_override']}")][0] += 1
+    overrides = db.session.execute(
+        select(func.date(LoanApplication.submitted_at), LoanApplication.model_decision,
+               LoanApplication.human_override, func.count())
+        .where(LoanApplication.human_override.isnot(None))
+        .group_by(func.date(LoanApplication.submitted_at), LoanApplication.model_decision,
+                  LoanApplication.human_override))
+    for day, model_decision, human, n in overrides:
+        counts[(datetime.strptime(day, '%Y-%m-%d').date(), 'override', f'{model_decision}:{human}')][0] += n
+    apply_counts(db.session.connection(), counts)
+    db.session.execute(_table.insert().values(**REBUILT, count=1, value_sum=0.0))
+    db.session.commit()
+
+
+def _ratio(num, den):
+    return num / den if den else None
+
+
+def summary(days=30):
+    """Everything the governance page shows, read from the rollup table only."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    totals = {(metric, key): (count, value_sum) for metric, key, count, value_sum in db.session.execute(
+        select(_table.c.metric, _table.c.key, _table.c['count'], _table.c.value_sum)
+        .where(_table.c.day == ALL_TIME))}
+
+    daily = defaultdict(lambda: {'APPROVE': 0, 'REJECT': 0, 'confidence_sum': 0.0, 'overrides': 0})
+    for day, metric, key, count, value_sum in db.session.execute(
+            select(_table.c.day, _table.c.metric, _table.c.key, _table.c['count'], _table.c.value_sum)
+            .where(_table.c.day >= since, _table.c.metric.in_(('decision', 'override')))):
+        d = daily[day]
+        if metric == 'decision':
+            d[key] = d.get(key, 0) + count
+            d['confidence_sum'] += value_sum
+        elif key.split(':')[0] != key.split(':')[1]:
+            d['overrides'] += count
+
+    def total(metric, key):
+        return totals.get((metric, key), (0, 0.0))[0]
+
+    approved, rejected = total('decision', 'APPROVE'), total('decision', 'REJECT')
+    decisions = approved + rejected
+    confidence_sum = totals.get(('decision', 'APPROVE'), (0, 0.0))[1] + totals.get(('decision', 'REJECT'), (0, 0.0))[1]
+
+    # Human review outcomes, with APPROVE as the positive class
+    tp, fp = total('override', 'APPROVE:APPROVE'), total('override', 'APPROVE:REJECT')
+    fn, tn = total('override', 'REJECT:APPROVE'), total('override', 'REJECT:REJECT')
+    reviewed = tp + fp + fn + tn
+    precision, recall = _ratio(tp, tp + fp), _ratio(tp, tp + fn)
+    f1 = _ratio(2 * precision * recall, precision + recall) if precision is not None and recall is not None else None
+
+    confidence_histogram = []
+    for bucket in range(10):
+        confidence_histogram.append({
+            'label': f'{bucket * 10}-{bucket * 10 + 9}%',
+            'APPROVE': total('confidence', f'APPROVE:{bucket}'),
+            'REJECT': total('confidence', f'REJECT:{bucket}'),
+        })
+
+    credit_bands = []
+    for _, band in CREDIT_BANDS:
+        a, r = total('credit_band', f'{band}:APPROVE'), total('credit_band', f'{band}:REJECT')
+        credit_bands.append({'band': band, 'decisions': a + r, 'approval_rate': _ratio(a, a + r)})
+
+    recent = []
+    for day in sorted(daily, reverse=True):
+        d = daily[day]
+        n = d['APPROVE'] + d['REJECT']
+        recent.append({'day': day, 'decisions': n, 'approval_rate': _ratio(d['APPROVE'], n),
+                       'avg_confidence': _ratio(d['confidence_sum'], n), 'overrides': d['overrides']})
+
+    return {
+        'decisions': decisions,
+        'decisions_recent': sum(r['decisions'] for r in recent),
+        'days': days,
+        'approval_rate': _ratio(approved, decisions),
+        'avg_confidence': _ratio(confidence_sum, decisions),
+        'explained_rejections': _ratio(total('explained', 'REJECT'), rejected),
+        'reviewed': reviewed,
+        'override_rate': _ratio(fp + fn, decisions),
+        'accuracy': _ratio(tp + tn, reviewed),
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'confidence_histogram': confidence_histogram,
+        'max_bucket': max([b['APPROVE'] + b['REJECT'] for b in confidence_histogram] + [1]),
+        'credit_bands': credit_bands,
+        'recent': recent,
+        'drift': drift_report(),
+    }
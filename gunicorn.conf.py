@@ -0,0 +1,52 @@
+"""
+gunicorn.conf.py — Pre-forking startup for the web app.
+
+With preload_app (GUNICORN_PRELOAD=1, the default) the master imports app.py
+once: schema checks and the admin bootstrap in init_db run a single time,
+then app.warm_up() loads the model, calibrates the password hash cost and
+compiles the templates before any worker is forked. Workers inherit all of it
+copy-on-write. gc.freeze() moves those objects out of the collector's reach,
+so a worker's garbage collections never write to (and un-share) their pages.
+
+Each worker re-creates whatever must not cross a fork. post_fork replaces the
+inherited SQLAlchemy pool, and the model watcher, metrics writer, write-behind
+flusher and password pool threads start per process on first use.
+
+Worker count and bind address come from WEB_CONCURRENCY and PORT, as gunicorn
+reads them by default. See benchmarks/startup.py for cold-start timings and per-worker memory.
+"""
+import gc
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def on_starting(server):
+    # A new server counts from zero: drop the previous server's snapshots and retired totals
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.startswith('metrics-') and name.endswith('.json'):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from app import warm_up
+    warm_up()
+    gc.freeze()
+    server.log.info("Preloaded app, model and templates; forking workers")
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import app, ML_AVAILABLE
+    from models import db
+    with app.app_context():
+        # Never reuse a connection that belongs to the master
+        db.engine.dispose(close=False)
+    if ML_AVAILABLE:
+        from ml import get_model
+        get_model()  # already loaded; starts this worker's model watcher
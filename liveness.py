@@ -0,0 +1,48 @@
+"""
+liveness.py — Is the process that owns a per-process file still running?
+
+Per-worker files (metrics snapshots, write-behind logs) outlive their process,
+and a pid alone cannot say whether its owner is still there: the kernel hands
+pids out again, so a file left by a dead worker can look alive for as long as
+an unrelated process holds its old pid. Each file name therefore carries the
+owner's start token as well, and alive() checks both.
+
+The token is the process start time from /proc/<pid>/stat (clock ticks since
+boot, in hex), which differs between two processes that share a pid. Where
+/proc is not available the token is random and alive() falls back to the pid.
+"""
+import os
+import uuid
+
+_own = {}   # pid -> token of this process (a fork gets its own)
+
+
+def start_time(pid):
+    """The process's start time as a token, or None if it is gone or /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Field 22; the command name (field 2) may contain spaces, so count from its closing ')'
+    return format(int(stat.rsplit(b')', 1)[1].split()[19]), 'x')
+
+
+def token():
+    """This process's start token, for naming the files it owns."""
+    pid = os.getpid()
+    if pid not in _own:
+        _own[pid] = start_time(pid) or uuid.uuid4().hex[:8]
+    return _own[pid]
+
+
+def alive(pid, owner_token):
+    """True while the process that named a file (pid, owner_token) is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # someone else's process holds the pid; its start time still tells
+    started = start_time(pid)
+    return started is None or started == owner_token
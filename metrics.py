@@ -0,0 +1,386 @@
+"""
+metrics.py — Request timing and decision counters in Prometheus text format.
+
+init_app() hooks every request. The request's wall time goes into a per-route
+histogram. Time spent in SQL, model scoring (observe_model, called by
+score_applicants) and Jinja rendering is summed per route, so the split of
+each route's time can be graphed.
+
+SQL is timed by wrapping the engine dialect's do_execute* methods, the same
+point where SQLAlchemy fires its cursor events. Listening for those events
+would cost more: any engine-level listener puts every statement through
+SQLAlchemy's joined event dispatcher. Rendering is timed by a Template
+subclass on the app's Jinja environment rather than by blinker signals, for
+the same reason.
+
+Each worker keeps its numbers in memory and a background thread writes a
+snapshot to METRICS_DIR/metrics-<pid>-<start token>.json every
+METRICS_FLUSH_INTERVAL seconds (see liveness.py: a later process reusing the
+pid writes a file of its own). render() merges every snapshot in the
+directory with this worker's live numbers, so a scrape of /metrics on any
+gunicorn worker covers them all. Snapshots of exited workers are folded into
+metrics-retired.json and deleted, under a flock so scrapes never count a
+worker twice or not at all; counters therefore never go backwards. Clearing
+the directory when the server (not a worker) starts resets them, which
+Prometheus treats as a restart. Without METRICS_DIR only this process is
+reported.
+
+The per-request hooks are plain dict updates under one lock;
+benchmarks/metrics_overhead.py measures them.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited workers' snapshots are kept rather than folded
+    fcntl = None
+
+from flask import request
+
+import liveness
+from models import db
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_DIR = os.environ.get('METRICS_DIR')
+FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1.0'))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ('sql', 'model', 'render')
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by route, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'Request wall time by route.', LATENCY_BUCKETS),
+    'http_request_phase_seconds_total': ('counter', 'Seconds spent in SQL, model scoring and template rendering, by route.', None),
+    'db_queries_total': ('counter', 'SQL statements executed, by route.', None),
+    'model_scoring_seconds': ('histogram', 'Time to score one batch of applicants.', LATENCY_BUCKETS),
+    'loan_decisions_total': ('counter', 'Loan decisions by outcome.', None),
+    'model_fallback_total': ('counter', 'Decisions made by the rules alone because the model failed or was unavailable.', None),
+    'page_cache_total': ('counter', 'Rendered-page cache lookups by route and result (hit, miss, not_modified, bypass).', None),
+}
+
+_lock = threading.Lock()
+_counters = {}      # (name, labels) -> value; labels is a tuple of (key, value) pairs
+_histograms = {}    # (name, labels) -> [count per bucket..., count above the last bucket, sum, count]
+_local = threading.local()
+
+
+def inc(name, labels=(), value=1.0):
+    key = (name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def _observe(name, labels, seconds):
+    """Record one histogram sample; caller holds _lock."""
+    key = (name, labels)
+    buckets = METRICS[name][2]
+    h = _histograms.get(key)
+    if h is None:
+        h = _histograms[key] = [0] * (len(buckets) + 3)
+    h[bisect.bisect_left(buckets, seconds)] += 1   # non-cumulative; render() accumulates
+    h[-2] += seconds
+    h[-1] += 1
+
+
+def observe(name, labels, seconds):
+    with _lock:
+        _observe(name, labels, seconds)
+
+
+def observe_model(seconds):
+    """Model scoring time: a histogram sample, plus the current request's model phase."""
+    observe('model_scoring_seconds', (), seconds)
+    if getattr(_local, 'active', False):
+        _local.model += seconds
+
+
+def count_decisions(decisions):
+    """decisions: array of 'APPROVE'/'REJECT' from a PolicyResult."""
+    approved = int((decisions == 'APPROVE').sum())
+    if approved:
+        inc('loan_decisions_total', (('outcome', 'APPROVE'),), approved)
+    if len(decisions) - approved:
+        inc('loan_decisions_total', (('outcome', 'REJECT'),), len(decisions) - approved)
+
+
+def count_fallback(reason, n=1):
+    inc('model_fallback_total', (('reason', reason),), n)
+
+
+# ---- request hooks ----
+
+def _start_request():
+    if METRICS_DIR and _writer_pid != os.getpid():
+        _ensure_writer()
+    _local.active = True
+    _local.started = time.perf_counter()
+    _local.sql = _local.model = _local.render = 0.0
+    _local.queries = 0
+
+
+def _finish_request(response):
+    if not getattr(_local, 'active', False):
+        return response
+    _local.active = False
+    elapsed = time.perf_counter() - _local.started
+    rule = request.url_rule
+    route = rule.rule if rule is not None else 'unmatched'
+    method = request.method
+    labels = (('route', route),)
+    with _lock:
+        key = ('http_requests_total', (('route', route), ('method', method), ('status', str(response.status_code))))
+        _counters[key] = _counters.get(key, 0.0) + 1
+        _observe('http_request_duration_seconds', labels, elapsed)
+        for phase in PHASES:
+            spent = getattr(_local, phase)
+            if spent:
+                key = ('http_request_phase_seconds_total', (('route', route), ('phase', phase)))
+                _counters[key] = _counters.get(key, 0.0) + spent
+        if _local.queries:
+            key = ('db_queries_total', labels)
+            _counters[key] = _counters.get(key, 0.0) + _local.queries
+    return response
+
+
+def _timed_execute(execute):
+    def timed(*args):
+        started = time.perf_counter()
+        try:
+            return execute(*args)
+        finally:
+            if getattr(_local, 'active', False):
+                _local.sql += time.perf_counter() - started
+                _local.queries += 1
+    timed.original = execute
+    return timed
+
+
+_EXECUTE_METHODS = ('do_execute', 'do_executemany', 'do_execute_no_params')
+
+
+def _instrument(app):
+    dialect = db.engine.dialect
+    for name in _EXECUTE_METHODS:
+        setattr(dialect, name, _timed_execute(getattr(dialect, name)))
+
+    base = app.jinja_env.template_class
+
+    class TimedTemplate(base):
+        def render(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return base.render(self, *args, **kwargs)
+            finally:
+                if getattr(_local, 'active', False):
+                    _local.render += time.perf_counter() - started
+
+    app.jinja_env.template_class = TimedTemplate
+    app.jinja_env.cache.clear()  # templates are bound to the class they were loaded with
+    app.before_request_funcs.setdefault(None, []).append(_start_request)
+    app.after_request_funcs.setdefault(None, []).append(_finish_request)
+
+
+def _uninstrument(app):
+    """Undo _instrument (used by benchmarks/metrics_overhead.py)."""
+    dialect = db.engine.dialect
+    for name in _EXECUTE_METHODS:
+        setattr(dialect, name, getattr(dialect, name).original)
+    app.jinja_env.template_class = app.jinja_env.template_class.__mro__[1]
+    app.jinja_env.cache.clear()
+    app.before_request_funcs[None].remove(_start_request)
+    app.after_request_funcs[None].remove(_finish_request)
+
+
+def init_app(app):
+    """Instrument every request of app (no-op with METRICS_ENABLED=0). Call after the database is set up."""
+    if not ENABLED:
+        return
+    with app.app_context():
+        _instrument(app)
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        atexit.register(_dump)
+
+
+# ---- multi-process aggregation ----
+
+_writer_pid = None
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'counters': [[name, labels, value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, labels, list(h)] for (name, labels), h in _histograms.items()],
+        }
+
+
+RETIRED = 'metrics-retired.json'
+
+
+def _snapshot_path():
+    return os.path.join(METRICS_DIR, f"metrics-{os.getpid()}-{liveness.token()}.json")
+
+
+def _write(path, snapshot):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def _dump():
+    _write(_snapshot_path(), _snapshot())
+
+
+def _dump_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            _dump()
+        except OSError as e:
+            print(f"[WARNING] Could not write metrics snapshot: {e}")
+
+
+def _reset_after_fork():
+    # A forked worker starts from zero; the parent's numbers are in the parent's snapshot
+    _counters.clear()
+    _histograms.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _ensure_writer():
+    """Start this process's snapshot thread (lazily, so it is per worker after a fork)."""
+    global _writer_pid
+    if METRICS_DIR and _writer_pid != os.getpid():
+        _writer_pid = os.getpid()
+        threading.Thread(target=_dump_loop, name='metrics-writer', daemon=True).start()
+
+
+def _snapshot_names():
+    return [name for name in os.listdir(METRICS_DIR)
+            if name.startswith('metrics-') and name.endswith('.json') and name != RETIRED]
+
+
+def _read(name):
+    """A snapshot, or None if it is gone (folded by another worker) or unreadable."""
+    try:
+        with open(os.path.join(METRICS_DIR, name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _add(counters, histograms, snap):
+    for name, labels, value in snap['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0.0) + value
+    for name, labels, h in snap['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        if key in histograms:
+            histograms[key] = [a + b for a, b in zip(histograms[key], h)]
+        else:
+            histograms[key] = list(h)
+
+
+def _fold_retired(names):
+    """
+    Add the snapshots of exited workers to metrics-retired.json, then delete them; caller
+    holds the directory flock. Folded names are recorded with the totals, so a crash between
+    the two steps never adds a snapshot twice. returns: the names still live
+    """
+    retired = _read(RETIRED) or {'counters': [], 'histograms': [], 'folded': []}
+    live, dead = [], []
+    for name in names:
+        pid, _, token = name[len('metrics-'):-len('.json')].partition('-')  # no token: pre-token name
+        (live if liveness.alive(int(pid), token) else dead).append(name)
+    for name in [name for name in dead if name in retired['folded']]:
+        # Already counted by a fold that died before deleting it
+        os.unlink(os.path.join(METRICS_DIR, name))
+        dead.remove(name)
+    if not dead:
+        return live
+    counters, histograms = {}, {}
+    _add(counters, histograms, retired)
+    for name in dead:
+        snap = _read(name)
+        if snap:
+            _add(counters, histograms, snap)
+    _write(os.path.join(METRICS_DIR, RETIRED), {
+        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+        'histograms': [[name, labels, h] for (name, labels), h in histograms.items()],
+        'folded': dead,
+    })
+    for name in dead:
+        os.unlink(os.path.join(METRICS_DIR, name))
+    return live
+
+
+def _merged():
+    counters, histograms = {}, {}
+    snapshots = []
+    if METRICS_DIR:
+        own = os.path.basename(_snapshot_path())
+        with open(os.path.join(METRICS_DIR, 'metrics.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            names = [name for name in _snapshot_names() if name != own]
+            if fcntl is not None:
+                names = _fold_retired(names)
+            for name in [RETIRED, *names]:
+                snap = _read(name)
+                if snap:
+                    snapshots.append(snap)
+    snapshots.append(_snapshot())
+    for snap in snapshots:
+        _add(counters, histograms, snap)
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render():
+    """All metrics, merged across workers, in Prometheus text exposition format 0.0.4."""
+    _ensure_writer()
+    counters, histograms = _merged()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        else:
+            for (metric, labels), h in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, h):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels, (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels, (('le', '+Inf'),))} {int(h[-1])}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(h[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {int(h[-1])}")
+    return '\n'.join(lines) + '\n'
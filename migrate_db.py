@@ -1,5 +1,48 @@
-from app import app, db
-from sqlalchemy import text
+from app import app, db, score_applicants
+from models import ensure_indexes, LoanApplication, decision_details
+from governance import is_rebuilt as governance_rebuilt, rebuild as rebuild_governance
+from policy import FEATURES
+from sqlalchemy import text, select, update, bindparam
+import numpy as np
+
+BACKFILL_CHUNK = 5000
+
+def backfill_decision_details():
+    """
+    Fill reason codes, contributions and model version for loans stored before
+    those columns existed, by scoring their features with the current model.
+    Only loans the current model and policy still decide the same way are filled;
+    the rest keep NULL details and no model version, since today's breakdown
+    would explain a decision that was never made.
+    returns: (rows updated, rows left without details)
+    """
+    table = LoanApplication.__table__
+    updated, skipped, last_id = 0, 0, 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.model_decision, *[table.c[name] for name in FEATURES])
+            .where(table.c.reason_codes.is_(None), table.c.id > last_id)
+            .order_by(table.c.id).limit(BACKFILL_CHUNK)).all()
+        if not rows:
+            return updated, skipped
+        last_id = rows[-1].id
+        columns = {name: np.array([row[i + 2] for row in rows], dtype=float) for i, name in enumerate(FEATURES)}
+        result, contributions, model_version = score_applicants(columns)
+        matching = [i for i, row in enumerate(rows) if str(result.decisions[i]) == row.model_decision]
+        skipped += len(rows) - len(matching)
+        if not matching:
+            continue
+        details = [decision_details(result.reason_codes(i),
+                                    contributions[i] if contributions is not None else None, model_version)
+                   for i in matching]
+        # Bind names must differ from the column names in an executemany UPDATE
+        params = [dict({f"new_{k}": v for k, v in d.items()}, loan_id=rows[i].id) for d, i in zip(details, matching)]
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('loan_id'))
+            .values({name: bindparam(f"new_{name}") for name in details[0]}),
+            params)
+        db.session.commit()
+        updated += len(matching)
 
 def migrate():
     with app.app_context():
@@ -29,7 +72,26 @@ def migrate():
                     conn.execute(text("ALTER TABLE user ADD COLUMN spending FLOAT DEFAULT 0.0"))
                     conn.commit()
                     print("Successfully added 'spending' column to user.")
-                    
+
+            print("Ensuring indexes (loan_application user_id, submitted_at)...")
+            ensure_indexes()
+            print("Indexes are up to date.")
+
+            # New rollup tables are created by create_all(); fill them once from existing loans.
+            # Live writes may have added to them before this ran, so check the marker, not emptiness.
+            db.create_all()
+            if not governance_rebuilt():
+                print("Backfilling governance rollups from loan_application...")
+                rebuild_governance()
+                print("Governance rollups rebuilt.")
+
+            # The explanation columns themselves are added by init_db when the app is imported
+            backfilled, skipped = backfill_decision_details()
+            if backfilled:
+                print(f"Backfilled reason codes and contributions for {backfilled} existing loans.")
+            if skipped:
+                print(f"[WARNING] {skipped} existing loans are decided differently today; left without details.")
+
         except Exception as e:
             print(f"Migration failed: {e}")
 
@@ -1,18 +1,33 @@
 # ml.py
+# scikit-learn and joblib are imported lazily: the web workers score through
+# scorer.LinearScorer (plain NumPy) and only training/export needs them.
 import numpy as np
-from sklearn.linear_model import LogisticRegression
-from joblib import dump, load
+import hashlib
+import io
+import json
 import os
+import threading
+import time
+
+from scorer import LinearScorer, FEATURES, expit
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "model_joblib.pkl")
+WEIGHTS_PATH = os.path.join(BASE_DIR, "model_weights.json")
+
+# "weights" scores from model_weights.json with NumPy only; "sklearn" unpickles
+# model_joblib.pkl and needs scikit-learn installed.
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'weights')
+
+# How often (seconds) each worker's watcher thread re-stats the model file to look for a new one.
+MODEL_CHECK_INTERVAL = float(os.environ.get('MODEL_CHECK_INTERVAL', '2.0'))
 
 def _features_from_df(df):
     """
     Given DataFrame with columns: income, credit_score, employment_years, debt_to_income, amount
     returns X (np.array) and y (if present)
     """
-    X = df[['income', 'credit_score', 'employment_years', 'debt_to_income', 'amount']].values
+    X = df[FEATURES].values
     y = None
     if 'label' in df.columns:
         y = df['label'].values
@@ -20,16 +35,64 @@ def _features_from_df(df):
 
 def train_from_dataframe(df):
     """Train logistic regression on provided DataFrame with label column (1 = approve, 0 = reject)."""
+    from sklearn.linear_model import LogisticRegression
     X, y = _features_from_df(df)
     if y is None:
         raise ValueError("DataFrame must contain 'label' column")
     model = LogisticRegression(max_iter=1000)
     model.fit(X, y)
-    dump(model, MODEL_PATH)
+    import drift
+    save_model(model, reference=drift.make_reference(drift.histograms(X), f'training, {len(X):,} rows'))
     return model
 
+def export_weights(model, path=WEIGHTS_PATH, model_path=MODEL_PATH, reference=None):
+    """
+    Write the coefficients of a fitted binary LogisticRegression to JSON for LinearScorer.
+    reference: the training data's feature histograms (drift.make_reference), stored for drift.py;
+    if None, an existing file's reference is kept when it describes the same model_version
+    """
+    with open(model_path, 'rb') as f:
+        source_version = hashlib.sha256(f.read()).hexdigest()[:12]
+    weights = {
+        "coef": model.coef_[0].tolist(),          # shape: (n_features,)
+        "intercept": float(model.intercept_[0]),
+        "classes": model.classes_.tolist(),
+        "features": FEATURES,
+        "model_version": source_version,
+    }
+    if reference is None:
+        # Re-exporting the same model (extract_model.py) keeps the reference it was trained with
+        try:
+            with open(path) as f:
+                previous = json.load(f)
+            if previous.get("model_version") == source_version:
+                reference = previous.get("reference")
+        except (OSError, ValueError):
+            pass
+    if reference is not None:
+        weights["reference"] = reference
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(weights, f, indent=2)
+    os.replace(tmp, path)  # ModelHolder never sees a half-written file
+    return weights
+
+def save_model(model, model_path=MODEL_PATH, weights_path=WEIGHTS_PATH, reference=None):
+    """
+    Write model to model_path and its exported weights to weights_path, each via a
+    temporary file and an atomic rename. returns: the weights dict (with model_version)
+    """
+    from joblib import dump
+    tmp = f"{model_path}.tmp"
+    dump(model, tmp)
+    os.replace(tmp, model_path)
+    return export_weights(model, weights_path, model_path, reference)
+
 def ensure_model_exists():
     """If model file doesn't exist, create a default baseline model trained on tiny synthetic data."""
+    if os.path.exists(MODEL_PATH) and not os.path.exists(WEIGHTS_PATH):
+        from joblib import load
+        export_weights(load(MODEL_PATH))
     if not os.path.exists(MODEL_PATH):
         # pandas is only needed here (local training fallback) — lazy import so
         # the production server doesn't require pandas to be installed.
@@ -53,26 +116,149 @@ def ensure_model_exists():
         ], columns=['income','credit_score','employment_years','debt_to_income','amount','label'])
         train_from_dataframe(df)
 
+class ModelHolder:
+    """
+    Process-wide cache for the scoring model.
+
+    The model is loaded once per process and the cached object is handed out on
+    every call. A background thread (one per process, started on first use and
+    again after a fork) re-stats the file every `check_interval` seconds; if its
+    mtime or size changed, the new file is loaded and swapped in with a single
+    assignment, so callers that already hold the old model keep using it and no
+    request ever waits on a stat or a reload. Model files are replaced with an
+    atomic rename (see save_model), so a reload never sees a partial file.
+    Every model is tagged with a short content hash used as its version (for
+    exported weights, the hash of the pickle they came from).
+    """
+
+    def __init__(self, path, loader, check_interval=MODEL_CHECK_INTERVAL):
+        self.path = path
+        self.loader = loader
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None  # (model, version) — replaced atomically
+        self._stamp = None
+        self._watcher_pid = None
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _reload(self, stamp):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        model = self.loader(io.BytesIO(data))
+        version = getattr(model, 'version', None) or hashlib.sha256(data).hexdigest()[:12]
+        self._current = (model, version)
+        self._stamp = stamp
+        print(f"[OK] Loaded model {os.path.basename(self.path)} version {version}")
+
+    def refresh(self, force=False):
+        """Reload the model if the file on disk changed (or if `force`)."""
+        with self._lock:
+            try:
+                stamp = self._file_stamp()
+                if force or self._current is None or stamp != self._stamp:
+                    self._reload(stamp)
+            except Exception as e:
+                # A missing or unreadable file must not take the worker down:
+                # keep serving the previous model and retry on the next check.
+                if self._current is None:
+                    raise
+                print(f"Model reload error (keeping version {self._current[1]}): {e}")
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.refresh()
+
+    def _ensure_watcher(self):
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name=f"model-watcher-{os.path.basename(self.path)}",
+                         daemon=True).start()
+
+    def get(self):
+        """Return (model, version); the first call in a process loads it and starts the watcher."""
+        if self._current is None:
+            self.refresh()
+        if self._watcher_pid != os.getpid():
+            self._ensure_watcher()
+        return self._current
+
+
+def _load_pickle(f):
+    from joblib import load
+    return load(f)
+
+_pickle_holder = ModelHolder(MODEL_PATH, _load_pickle)
+_weights_holder = ModelHolder(WEIGHTS_PATH, LinearScorer.from_json)
+
+def _holder():
+    holder = _weights_holder if MODEL_BACKEND == 'weights' else _pickle_holder
+    if holder._current is None:
+        ensure_model_exists()
+    return holder
+
+def get_model():
+    """Return the cached (model, version) pair for this process."""
+    return _holder().get()
+
+def preload_model():
+    """
+    Load the model without starting the watcher thread, for a master process that
+    forks workers afterwards (gunicorn preload_app): the workers share the loaded
+    model copy-on-write and each starts its own watcher on first use.
+    """
+    holder = _holder()
+    holder.refresh()
+    return holder._current
+
 def load_model():
-    ensure_model_exists()
-    return load(MODEL_PATH)
+    return get_model()[0]
+
+def model_version():
+    return get_model()[1]
+
+def features_matrix(features):
+    """
+    Coerce applicants into an (N, 5) float matrix in FEATURES order.
+    Accepts an (N, 5) / (5,) array-like, or a mapping / DataFrame of columns keyed by feature name.
+    """
+    if hasattr(features, 'keys'):
+        return np.column_stack([np.asarray(features[name], dtype=float).reshape(-1) for name in FEATURES])
+    X = np.asarray(features, dtype=float)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.shape[1] != len(FEATURES):
+        raise ValueError(f"Expected {len(FEATURES)} feature columns, got {X.shape[1]}")
+    return X
+
+def predict_batch(model, features):
+    """
+    Score many applicants in one vectorized pass.
+    features: (N, 5) array or mapping of columns (see features_matrix)
+    returns: decisions (N,) array of "APPROVE"/"REJECT", confidences (N,), probs (N, 2) [reject, approve],
+             contributions (N, 5) coef * x in FEATURES order
+    """
+    X = features_matrix(features)
+    coefs = model.coef_[0]
+    z = model.decision_function(X)  # single pass; probabilities and classes both derive from it
+    p_approve = expit(z)
+    probs = np.column_stack([1.0 - p_approve, p_approve])
+    pred = model.classes_[(z > 0).astype(int)]
+    decisions = np.where(pred == 1, "APPROVE", "REJECT")
+    confidences = probs.max(axis=1)
+    contributions = X * coefs
+    return decisions, confidences, probs, contributions
 
 def predict_single(model, feature_dict):
     """
     feature_dict: keys income, credit_score, employment_years, debt_to_income, amount
     returns: decision ("APPROVE"/"REJECT"), confidence (prob of predicted class), raw_probs, contributions (coef * x)
     """
-    X = [[feature_dict['income'],
-          feature_dict['credit_score'],
-          feature_dict['employment_years'],
-          feature_dict['debt_to_income'],
-          feature_dict['amount']]]
-    probs = model.predict_proba(X)[0]  # [prob_class0, prob_class1] assuming label mapping (0 reject,1 approve)
-    pred = model.predict(X)[0]
-    conf = max(probs)
-    # compute simple linear contributions using model.coef_
-    coefs = model.coef_[0]  # shape (n_features,)
-    contributions = (coefs * np.array(X[0])).tolist()
-    feature_names = ['income','credit_score','employment_years','debt_to_income','amount']
-    contrib_map = dict(zip(feature_names, contributions))
-    return ("APPROVE" if pred==1 else "REJECT"), float(conf), probs.tolist(), contrib_map
+    decisions, confidences, probs, contributions = predict_batch(model, [[feature_dict[name] for name in FEATURES]])
+    contrib_map = dict(zip(FEATURES, contributions[0].tolist()))
+    return str(decisions[0]), float(confidences[0]), probs[0].tolist(), contrib_map
@@ -1,9 +1,68 @@
+import os
+
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import passwords
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# Per-connection pragmas for the "production SQLite" mode (SQLITE_PRODUCTION=1):
+# WAL lets readers run alongside the single writer, busy_timeout makes writers queue
+# instead of failing with "database is locked", and synchronous=NORMAL (safe under
+# WAL) drops the fsync on every commit — a power cut can lose the last commits, but
+# an app crash cannot.
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    'cache_size': -32000,       # negative = KiB, i.e. ~32 MB page cache per connection
+    'mmap_size': 268435456,     # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+
+def init_sqlite(app, db_file, production=False, pool_size=5):
+    """
+    Point the app at an SQLite file and bind `db` to it.
+    production: turn on WAL and the SQLITE_PRAGMAS above on every new connection and
+        size the connection pool for threaded (gthread) workers.
+    """
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_file}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if production:
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+            'pool_size': pool_size,
+            'max_overflow': pool_size,
+            'pool_timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+            'connect_args': {
+                'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+                'check_same_thread': False,
+            },
+        })
+    db.init_app(app)
+    if production:
+        with app.app_context():
+            event.listen(db.engine, 'connect', _apply_sqlite_pragmas)
+
+def data_dir(app, name):
+    """
+    Directory '<database file stem>-<name>' beside the app's SQLite file, for files that
+    must stay with the database (write-behind logs, the loan archive). DATABASE_PATH may be
+    a persistent disk while instance/ belongs to the code checkout.
+    """
+    database = make_url(app.config['SQLALCHEMY_DATABASE_URI']).database
+    if not database or database == ':memory:':
+        return os.path.join(app.instance_path, name)
+    return f"{os.path.splitext(os.path.abspath(database))[0]}-{name}"
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -11,16 +70,23 @@ class User(db.Model):
     password_hash = db.Column(db.String(128))
     is_admin = db.Column(db.Boolean, default=False)
     spending = db.Column(db.Float, default=0.0)
+    loans_changed_at = db.Column(db.DateTime)  # bumped with every loan write; see pagecache.py
 
     loans = db.relationship('LoanApplication', backref='user', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(self.password_hash, password)
 
 class LoanApplication(db.Model):
+    # Per-user lookups (dashboard, history, explanation) filter on user_id and sort by
+    # submitted_at; SQLite appends the rowid, so (submitted_at, id) keyset pages are index-only.
+    __table_args__ = (
+        db.Index('ix_loan_application_user_submitted', 'user_id', 'submitted_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
@@ -33,10 +99,156 @@ class LoanApplication(db.Model):
     human_override = db.Column(db.String(50))
     explanation = db.Column(db.Text, nullable=True)  # Store rejection reasons or approval notes
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Frozen at decision time so the explanation page never re-scores: the model's
+    # per-feature contributions (coef * x, NULL when the rules decided alone), the
+    # policy reason codes that fired (comma-separated, '' for none; NULL only on loans
+    # from before these columns existed) and the model version used.
+    contrib_income = db.Column(db.Float)
+    contrib_credit_score = db.Column(db.Float)
+    contrib_employment_years = db.Column(db.Float)
+    contrib_debt_to_income = db.Column(db.Float)
+    contrib_amount = db.Column(db.Float)
+    reason_codes = db.Column(db.Text)
+    model_version = db.Column(db.String(32))
+
+    @property
+    def contributions(self):
+        """{feature: contribution} in FEATURES order, or None if none were stored."""
+        values = [getattr(self, column) for column in CONTRIBUTION_COLUMNS.values()]
+        if any(v is None for v in values):
+            return None
+        return dict(zip(CONTRIBUTION_COLUMNS, values))
+
+    @property
+    def impacts(self):
+        """
+        [(feature, contribution, share)] largest first, where share is the feature's
+        fraction of the total absolute contribution; [] if none were stored.
+        """
+        contributions = self.contributions
+        if not contributions:
+            return []
+        total = sum(abs(v) for v in contributions.values()) or 1.0
+        return sorted(((name, value, abs(value) / total) for name, value in contributions.items()),
+                      key=lambda item: -item[2])
+
+    @property
+    def reason_code_list(self):
+        return self.reason_codes.split(',') if self.reason_codes else []
+
+CONTRIBUTION_COLUMNS = {name: f"contrib_{name}" for name in
+                       ("income", "credit_score", "employment_years", "debt_to_income", "amount")}
+
+def decision_details(reason_codes, contributions, model_version):
+    """
+    LoanApplication column values that freeze one decision's explanation.
+    reason_codes: list of policy reason codes; contributions: (5,) row from
+    ml.predict_batch in FEATURES order, or None when the model was not used.
+    """
+    row = {'reason_codes': ','.join(reason_codes), 'model_version': model_version}
+    values = [None] * len(CONTRIBUTION_COLUMNS) if contributions is None else [float(v) for v in contributions]
+    row.update(zip(CONTRIBUTION_COLUMNS.values(), values))
+    return row
+
+class ReviewCase(db.Model):
+    """
+    A decision queued for human review. Reviewers claim cases under a time-bounded
+    lease (claimed_by / lease_expires_at); an expired lease makes the case claimable
+    again. See review.py.
+    """
+    __tablename__ = 'review_case'
+    __table_args__ = (
+        # Listing and claim-next walk this index: open cases by priority, oldest first
+        db.Index('ix_review_case_queue', 'status', 'priority', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    loan_id = db.Column(db.Integer, db.ForeignKey('loan_application.id'), nullable=False, unique=True)
+    status = db.Column(db.String(16), nullable=False, default='OPEN')   # OPEN | RESOLVED
+    priority = db.Column(db.Integer, nullable=False, default=100)       # lower is reviewed first
+    reason = db.Column(db.String(200))
+    claimed_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    lease_expires_at = db.Column(db.DateTime)
+    resolution = db.Column(db.String(50))
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime)
+
+    loan = db.relationship('LoanApplication', backref=db.backref('review_case', uselist=False))
+    reviewer = db.relationship('User', foreign_keys=[claimed_by])
+
+class GovernanceRollup(db.Model):
+    """
+    Pre-aggregated decision statistics, one row per (day, metric, key).
+    Maintained incrementally by governance.py whenever loan applications are
+    written, so the governance dashboard never scans loan_application.
+    """
+    __tablename__ = 'governance_rollup'
+    day = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(32), primary_key=True)   # e.g. 'decision', 'confidence', 'override'
+    key = db.Column(db.String(64), primary_key=True)      # e.g. 'APPROVE', 'REJECT:7', 'APPROVE:REJECT'
+    count = db.Column(db.Integer, nullable=False, default=0)
+    value_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+class WriteBehindCheckpoint(db.Model):
+    """How far each write-behind log has been replayed into loan_application (see writebehind.py)."""
+    __tablename__ = 'write_behind_checkpoint'
+    log_name = db.Column(db.String(120), primary_key=True)
+    offset = db.Column(db.Integer, nullable=False, default=0)
+
+class ArchiveStore(db.Model):
+    """
+    This database's directory under ARCHIVE_DIR (one row), so databases that share an
+    ARCHIVE_DIR never see or touch each other's segments.
+    """
+    __tablename__ = 'archive_store'
+    key = db.Column(db.String(32), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ArchiveSegment(db.Model):
+    """A set of columnar files holding archived loan_application rows (see archive.py)."""
+    __tablename__ = 'archive_segment'
+    name = db.Column(db.String(64), primary_key=True)     # '<YYYY-MM>/part-<n>', its directory in the store (see ArchiveStore)
+    rows = db.Column(db.Integer, nullable=False)
+    min_id = db.Column(db.Integer, nullable=False)
+    max_id = db.Column(db.Integer, nullable=False)
+    first_at = db.Column(db.DateTime, nullable=False)     # oldest / newest submitted_at in the segment
+    last_at = db.Column(db.DateTime, nullable=False)
+    bytes = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ArchiveIndex(db.Model):
+    """Which archive segments hold a user's loans, so their pages open only those."""
+    __tablename__ = 'archive_index'
+    user_id = db.Column(db.Integer, primary_key=True)
+    segment = db.Column(db.String(64), primary_key=True)
+    rows = db.Column(db.Integer, nullable=False)
+    first_at = db.Column(db.DateTime, nullable=False)
+    last_at = db.Column(db.DateTime, nullable=False)
+
+def ensure_indexes():
+    """create_all() only builds indexes with new tables; add any missing ones to existing tables."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+def ensure_columns():
+    """create_all() never alters existing tables; add nullable columns that are missing (e.g. new LoanApplication ones)."""
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable and column.server_default is None:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                    print(f"[OK] Added column {table.name}.{column.name}")
 
 def init_db(app):
     with app.app_context():
         db.create_all()
+        ensure_columns()
+        ensure_indexes()
         # Create default admin user if it doesn't exist
         if not User.query.filter_by(email='admin@trustbank.com').first():
             admin = User(
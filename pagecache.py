@@ -0,0 +1,98 @@
+"""
+pagecache.py — Rendered-page cache and conditional GET for the per-user loan pages.
+
+Every write that changes a user's loans also stamps user.loans_changed_at, in
+the same transaction. ORM writes (loan_form, write-behind replay, review
+overrides, deletes) are picked up by a Session after_flush hook; Core bulk
+inserts (bulk_intake.insert_scored) call touch_loans() directly.
+
+render_page() keys each rendered page by route, query string, the user's
+snapshot and that stamp, in a per-process LRU of RENDER_CACHE_SIZE pages. A
+new loan changes the stamp, so the old entries are never hit again and age
+out. One indexed read of the stamp replaces the page's queries and template
+work on a hit.
+
+Responses carry a strong ETag (hash of the body) and Last-Modified (the
+stamp) with Cache-Control: private, no-cache, so browsers revalidate and an
+unchanged page comes back as 304 Not Modified. Pages with pending flash
+messages are rendered fresh and never cached: they consume the messages.
+"""
+import hashlib
+import os
+from datetime import datetime
+
+from flask import g, request, session, render_template, Response
+from sqlalchemy import bindparam, event, update, select
+from sqlalchemy.orm import Session
+
+import metrics
+from cache import TTLCache
+from models import db, User, LoanApplication
+
+RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', '512'))
+
+_pages = TTLCache(maxsize=RENDER_CACHE_SIZE)
+_users = User.__table__
+# Built once: constructing and cache-looking-up a fresh UPDATE on every decision cost
+# ~10x what SQLite spends running it
+_touch = (update(_users).where(_users.c.id == bindparam('touched_id'))
+          .values(loans_changed_at=bindparam('changed_at')))
+
+
+def touch_loans(connection, user_ids, when=None):
+    """Stamp users whose loans just changed (call inside the writing transaction)."""
+    when = when or datetime.utcnow()
+    params = [{'touched_id': user_id, 'changed_at': when} for user_id in sorted(set(user_ids))]
+    if params:
+        connection.execute(_touch, params[0] if len(params) == 1 else params)
+
+
+def loans_changed_at(user_id):
+    """When the user's loans last changed, or None if they never have since the stamp was added."""
+    return db.session.execute(select(_users.c.loans_changed_at).where(_users.c.id == user_id)).scalar()
+
+
+@event.listens_for(Session, 'after_flush')
+def _touch_flushed_loans(session, flush_context):
+    user_ids = {obj.user_id for obj in (*session.new, *session.dirty, *session.deleted)
+                if isinstance(obj, LoanApplication) and obj.user_id is not None}
+    if user_ids:
+        touch_loans(session.connection(), user_ids)
+
+
+def _count(result):
+    metrics.inc('page_cache_total', (('route', request.endpoint or ''), ('result', result)))
+
+
+def render_page(template_name, changed_at, context):
+    """
+    Response for a page that only depends on g.user and its loans.
+    changed_at: loans_changed_at(g.user.id), read after the session's write-behind records are stored
+    context: callable returning the template variables; only called on a cache miss
+    """
+    if '_flashes' in session:
+        _count('bypass')
+        return render_template(template_name, **context())
+
+    user = g.user
+    key = (request.endpoint, request.query_string, tuple(getattr(user, name) for name in user.__slots__),
+           changed_at)
+    entry = _pages.get(key)
+    if entry is None:
+        body = render_template(template_name, **context()).encode('utf-8')
+        entry = (hashlib.sha256(body).hexdigest()[:32], body)
+        _pages.set(key, entry)
+        result = 'miss'
+    else:
+        result = 'hit'
+
+    response = Response(entry[1], mimetype='text/html')
+    response.set_etag(entry[0])
+    if changed_at is not None:
+        response.last_modified = changed_at
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    response = response.make_conditional(request)
+    _count('not_modified' if response.status_code == 304 else result)
+    return response
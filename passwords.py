@@ -0,0 +1,158 @@
+"""
+passwords.py — Password hashing policy.
+
+Hash cost is calibrated once per process to about PASSWORD_HASH_TARGET_MS per
+hash. Set PASSWORD_HASH_COST to pin it instead; that keeps every worker on
+the same parameters and skips calibration. Neither goes below Werkzeug's own
+defaults (MIN_COST), the cost every password was hashed at before this module
+existed. So calibration can only raise the cost: where the floor already takes
+longer than the target, a login costs what it always did (~150 ms at scrypt
+N=2**15 on a slow box) instead of trading hash strength for latency. Scale
+logins with PASSWORD_HASH_THREADS, not by weakening the hash.
+
+On a successful login, hashes made with another method or a weaker cost are
+transparently re-hashed; stronger ones are kept (see needs_rehash).
+
+Hashing and verification run on a small thread pool of
+PASSWORD_HASH_THREADS threads. hashlib releases the GIL while hashing, so a
+burst of logins uses at most that many cores, and the threads serving
+loan_form and dashboard keep running. Up to PASSWORD_HASH_QUEUE more callers
+may wait for a thread. Past that, callers get HashingBusy after
+PASSWORD_HASH_WAIT seconds instead of piling up behind the pool.
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')       # 'scrypt' or 'pbkdf2:sha256'
+TARGET_MS = float(os.environ.get('PASSWORD_HASH_TARGET_MS', '50'))
+PINNED_COST = os.environ.get('PASSWORD_HASH_COST')               # scrypt N or pbkdf2 iterations
+THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', '1'))
+QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '8'))
+WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', '2.0'))
+
+# Werkzeug's defaults (scrypt:32768:8:1, pbkdf2 1,000,000 iterations): never hash below
+# these, however slow the machine or whatever PASSWORD_HASH_COST says
+MIN_COST = {'scrypt': 2 ** 15, 'pbkdf2': DEFAULT_PBKDF2_ITERATIONS}
+MAX_SCRYPT_N = 2 ** 17  # 128 MiB per hash at r=8
+# How much weaker than the policy a stored hash may be before a login re-hashes it. scrypt N
+# moves in doublings, so one step either side is tolerated and workers whose calibrations
+# land on neighbouring steps don't flap; pbkdf2 iterations are compared as a ratio.
+REHASH_SCRYPT_STEPS = 1
+REHASH_PBKDF2_RATIO = 0.75
+
+
+class HashingBusy(Exception):
+    """The hashing pool and its queue are full; the caller should retry later."""
+
+
+def _kind(method):
+    return 'scrypt' if method.startswith('scrypt') else 'pbkdf2'
+
+
+def _method_string(method, cost):
+    if _kind(method) == 'scrypt':
+        return f"scrypt:{cost}:8:1"
+    return f"{method}:{cost}"
+
+
+def _time_hash(method, cost, rounds=3):
+    best = math.inf
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash('calibration', method=_method_string(method, cost))
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def calibrate(method=METHOD, target_ms=TARGET_MS):
+    """Largest cost (on a coarse grid) whose hash takes at most target_ms here."""
+    floor = MIN_COST[_kind(method)]
+    probe_ms = _time_hash(method, floor)
+    if _kind(method) == 'scrypt':
+        # scrypt time is linear in N, and N must be a power of two
+        steps = math.floor(math.log2(target_ms / probe_ms)) if target_ms > probe_ms else 0
+        return min(floor * 2 ** steps, MAX_SCRYPT_N)
+    iterations = floor * target_ms / probe_ms
+    return max(floor, int(iterations // 10_000) * 10_000)
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def policy():
+    """(method, cost) used for new hashes; calibrated on first use unless pinned."""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                cost = int(PINNED_COST) if PINNED_COST else calibrate()
+                floor = MIN_COST[_kind(METHOD)]
+                if cost < floor:
+                    print(f"[WARNING] PASSWORD_HASH_COST={cost} is below Werkzeug's default; using {floor}")
+                    cost = floor
+                _policy = (METHOD, cost)
+                print(f"[OK] Password hashing: {_method_string(METHOD, cost)}")
+    return _policy
+
+
+def parse(password_hash):
+    """(method family, cost) of a stored Werkzeug hash, or (None, None) if unrecognised."""
+    try:
+        params = password_hash.split('$', 1)[0].split(':')
+        if params[0] == 'scrypt':
+            return 'scrypt', int(params[1])
+        if params[0] == 'pbkdf2':
+            return f"pbkdf2:{params[1]}", int(params[2])
+    except (AttributeError, IndexError, ValueError):
+        pass
+    return None, None
+
+
+def needs_rehash(password_hash):
+    """
+    True when the stored hash uses another method, or is weaker than the policy by more
+    than REHASH_SCRYPT_STEPS doublings of N (scrypt) or REHASH_PBKDF2_RATIO (pbkdf2).
+    A hash stronger than the policy is never re-hashed to a lower cost.
+    """
+    method, cost = parse(password_hash)
+    current_method, current_cost = policy()
+    if method != current_method:
+        return True
+    if _kind(method) == 'scrypt':
+        return math.log2(cost) < math.log2(current_cost) - REHASH_SCRYPT_STEPS
+    return cost < REHASH_PBKDF2_RATIO * current_cost
+
+
+_pool = None
+_pool_pid = None
+_slots = threading.BoundedSemaphore(THREADS + QUEUE)
+
+
+def _run(fn, *args):
+    """Run fn on the hashing pool, waiting at most WAIT seconds for a slot."""
+    global _pool, _pool_pid
+    if not _slots.acquire(timeout=WAIT):
+        raise HashingBusy()
+    try:
+        with _policy_lock:
+            if _pool_pid != os.getpid():  # first use, or first use after a fork
+                _pool = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='password-hash')
+                _pool_pid = os.getpid()
+        return _pool.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    method, cost = policy()
+    return _run(generate_password_hash, password, _method_string(method, cost))
+
+
+def verify(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
@@ -0,0 +1,185 @@
+"""
+policy.py — Declarative loan decision policy.
+
+Thresholds, approval tiers and rejection-reason text live in loan_policy.json
+(versioned). LoanPolicy.evaluate() turns every rule into a boolean mask over
+NumPy feature columns, so one applicant from the loan form and a batch of N
+applicants from an intake file go through exactly the same code path.
+
+Decision flow (per applicant):
+  1. Advisory rules add reason codes (within a group only the first match counts).
+  2. If a model decision is supplied, approve only when the model approves AND
+     every critical rule passes; otherwise reject, flagging failed critical checks.
+  3. Applicants still rejected without any reason fall through the approval
+     tiers; if no tier matches they are rejected with the fallback reasons.
+"""
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+POLICY_PATH = os.environ.get('LOAN_POLICY_PATH', os.path.join(BASE_DIR, "loan_policy.json"))
+
+FEATURES = ["income", "credit_score", "employment_years", "debt_to_income", "amount"]
+
+_OPS = {
+    'lt': np.less,
+    'le': np.less_equal,
+    'gt': np.greater,
+    'ge': np.greater_equal,
+}
+
+
+def derived_columns(columns):
+    """Return the feature columns as float arrays plus derived loan_to_income."""
+    cols = {name: np.atleast_1d(np.asarray(columns[name], dtype=float)) for name in FEATURES}
+    income = cols['income']
+    positive = income > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cols['loan_to_income'] = np.where(positive, cols['amount'] / np.where(positive, income, 1.0), np.inf)
+    return cols
+
+
+class PolicyResult:
+    """Vectorized outcome of LoanPolicy.evaluate for N applicants."""
+
+    def __init__(self, policy, cols, decisions, confidences, tiers, reason_mask,
+                 model_approved=None, model_confidences=None):
+        self.policy = policy
+        self.cols = cols
+        self.decisions = decisions        # (N,) "APPROVE"/"REJECT"
+        self.confidences = confidences    # (N,) float
+        self.tiers = tiers                # (N,) approval tier name, '' if none
+        self.reason_mask = reason_mask    # (N, R) bool, columns in policy.reason_codes order
+        self.model_approved = model_approved          # (N,) bool, or None when no model was used
+        self.model_confidences = model_confidences    # (N,) model's confidence in its own call, or None
+
+    @property
+    def conflicts(self):
+        """(N,) bool: the model and the rules disagree (model approved but a critical rule
+        rejected, or model rejected but an approval tier approved)."""
+        if self.model_approved is None:
+            return np.zeros(len(self.decisions), dtype=bool)
+        return self.model_approved != (self.decisions == 'APPROVE')
+
+    def __len__(self):
+        return len(self.decisions)
+
+    @property
+    def top_reason_codes(self):
+        """(N, max_reasons) array of reason codes in the order they fired, '' padded."""
+        k = self.policy.max_reasons
+        order = np.argsort(~self.reason_mask, axis=1, kind='stable')[:, :k]
+        present = np.take_along_axis(self.reason_mask, order, axis=1)
+        return np.where(present, self.policy.reason_codes[order], '')
+
+    def reason_codes(self, i):
+        return [str(c) for c in self.policy.reason_codes[self.reason_mask[i]]]
+
+    def reasons(self, i):
+        """Human-readable reason messages for applicant i, in the order they fired."""
+        values = {
+            'credit_score': int(self.cols['credit_score'][i]),
+            'employment_years': float(self.cols['employment_years'][i]),
+            'income': float(self.cols['income'][i]),
+            'amount': float(self.cols['amount'][i]),
+            'debt_to_income_pct': float(self.cols['debt_to_income'][i]) * 100,
+        }
+        return [self.policy.messages[j].format(**values) for j in np.flatnonzero(self.reason_mask[i])]
+
+    def explanation(self, i):
+        """Text stored on LoanApplication.explanation: top reasons for rejected applicants, else None."""
+        if self.decisions[i] != 'REJECT' or not self.reason_mask[i].any():
+            return None
+        return "Reasons: " + "; ".join(self.reasons(i)[:self.policy.max_reasons])
+
+
+class LoanPolicy:
+    def __init__(self, config):
+        self.config = config
+        self.version = config['version']
+        self.min_amount = float(config.get('min_amount', 0))
+        self.max_reasons = int(config.get('max_reasons', 3))
+        self.model_max_confidence = float(config['model_max_confidence'])
+        self.advisories = config['advisories']
+        self.critical = config['critical']
+        self.critical_failure = config['critical_failure']
+        self.tiers = config['tiers']
+        self.fallback = config['fallback']
+
+        # Reason columns: advisories, the critical-failure flag, then fallback reasons
+        reason_rules = self.advisories + [self.critical_failure] + self.fallback['reasons']
+        self.reason_codes = np.array([r['code'] for r in reason_rules])
+        self.messages = [r['message'] for r in reason_rules]
+
+    @classmethod
+    def load(cls, path=POLICY_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _mask(cols, rule):
+        feature, op, threshold = rule
+        return _OPS[op](cols[feature], threshold)
+
+    def _all(self, cols, rules, n):
+        mask = np.ones(n, dtype=bool)
+        for rule in rules:
+            mask &= self._mask(cols, rule)
+        return mask
+
+    def evaluate(self, columns, model_decisions=None, model_confidences=None):
+        """
+        columns: mapping of FEATURES to scalars or (N,) arrays
+        model_decisions / model_confidences: output of ml.predict_batch, or None when
+            the model is unavailable (rules and tiers alone then decide)
+        returns: PolicyResult
+        """
+        cols = derived_columns(columns)
+        n = len(cols['income'])
+        approve = np.zeros(n, dtype=bool)
+        confidences = np.zeros(n)
+        tiers = np.full(n, '', dtype=object)
+
+        # 1. Advisory reasons (first match per group)
+        advisory = np.zeros((n, len(self.advisories)), dtype=bool)
+        matched = {}
+        for j, rule in enumerate(self.advisories):
+            taken = matched.setdefault(rule['group'], np.zeros(n, dtype=bool))
+            hit = self._mask(cols, rule['when']) & ~taken
+            advisory[:, j] = hit
+            taken |= hit
+
+        # 2. Model decision gated by the critical rules
+        critical_pass = self._all(cols, self.critical, n)
+        critical_failed = np.zeros(n, dtype=bool)
+        model_approved = model_conf = None
+        if model_decisions is not None:
+            model_conf = np.atleast_1d(np.asarray(model_confidences, dtype=float))
+            model_approved = np.atleast_1d(model_decisions) == 'APPROVE'
+            approve = model_approved & critical_pass
+            confidences = np.where(approve, np.minimum(model_conf, self.model_max_confidence), 1.0 - model_conf)
+            critical_failed = ~critical_pass
+
+        # 3. Approval tiers for rejections that have no reason yet
+        undecided = ~approve & ~advisory.any(axis=1) & ~critical_failed
+        for tier in self.tiers:
+            hit = undecided & self._all(cols, tier['conditions'], n)
+            approve |= hit
+            confidences = np.where(hit, tier['confidence'], confidences)
+            tiers[hit] = tier['name']
+            undecided &= ~hit
+
+        fallback = np.zeros((n, len(self.fallback['reasons'])), dtype=bool)
+        if undecided.any():
+            confidences = np.where(undecided, self.fallback['confidence'], confidences)
+            for j, rule in enumerate(self.fallback['reasons']):
+                fallback[:, j] = undecided & self._mask(cols, rule['when'])
+
+        reason_mask = np.column_stack([advisory, critical_failed, fallback])
+        decisions = np.where(approve, 'APPROVE', 'REJECT')
+        return PolicyResult(self, cols, decisions, confidences, tiers, reason_mask, model_approved, model_conf)
+
+
+POLICY = LoanPolicy.load()
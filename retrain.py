@@ -0,0 +1,280 @@
+"""
+retrain.py — Retrain the model off the web workers, validate it and promote it atomically.
+
+A retrain job (train_model.train on everything but the newest loans) runs in a
+separate process from a one-process pool, so a web worker only submits it and
+returns. The candidate is written next to the live files as
+model_joblib.pkl.candidate / model_weights.json.candidate, then checked on the
+held-out newest loans:
+
+  * log loss may be at most RETRAIN_MAX_LOSS_INCREASE (relative) worse than the
+    served model's. It is measured on the held-out loans a human reviewer
+    overrode when there are at least RETRAIN_MIN_REVIEWED of them: those labels
+    did not come from the served model. Otherwise it falls back to every held-out
+    loan's final decision, which the served model (gated by the policy) mostly
+    made itself. That is a consistency check, not a quality one: it stops a
+    candidate that departs from current behaviour, and it favours the served
+    model. The status records which labels were used ('labels');
+  * run through the loan policy, its approval rate may move at most
+    RETRAIN_MAX_APPROVAL_SHIFT from the served model's.
+
+The job process runs at nice RETRAIN_NICE. A candidate that passes is promoted with os.replace: the pickle first, then the
+weights the web workers score from. Each worker's ModelHolder watcher thread
+sees the new file within MODEL_CHECK_INTERVAL seconds and swaps it in, with no
+restart and nothing added to any request. A rejected candidate is deleted.
+
+Under SQLITE_PRODUCTION=1 (WAL) the job's reads never block loan-form writes;
+with the default rollback journal they can, for the length of one chunk read.
+
+Only one job runs at a time across all workers: submit() takes an flock on
+instance/retrain.lock before starting a job, reports "already running" if it is
+held, and hands the locked file to the job process, which holds it until done. Progress and the outcome of the last job are in
+instance/retrain_status.json.
+
+Usage:
+    python retrain.py            # run a job in this process and print the outcome
+    python retrain.py --force    # promote even if validation fails
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing.reduction import DupFd
+
+try:
+    import fcntl
+except ImportError:  # Windows: only jobs submitted by the same worker are kept apart
+    fcntl = None
+
+import numpy as np
+
+from ml import BASE_DIR, MODEL_PATH, WEIGHTS_PATH
+
+HOLDOUT_FRACTION = float(os.environ.get('RETRAIN_HOLDOUT_FRACTION', '0.1'))
+HOLDOUT_MAX = int(os.environ.get('RETRAIN_HOLDOUT_MAX', '100000'))
+MIN_HOLDOUT = 100
+MIN_REVIEWED = int(os.environ.get('RETRAIN_MIN_REVIEWED', '50'))
+MAX_LOSS_INCREASE = float(os.environ.get('RETRAIN_MAX_LOSS_INCREASE', '0.02'))
+MAX_APPROVAL_SHIFT = float(os.environ.get('RETRAIN_MAX_APPROVAL_SHIFT', '0.05'))
+NICE = int(os.environ.get('RETRAIN_NICE', '10'))
+
+STATE_DIR = os.path.join(BASE_DIR, 'instance')
+STATUS_PATH = os.path.join(STATE_DIR, 'retrain_status.json')
+LOCK_PATH = os.path.join(STATE_DIR, 'retrain.lock')
+
+
+def _write_status(**status):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = f"{STATUS_PATH}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp, STATUS_PATH)
+
+
+def status():
+    """The last job's status dict, or {'state': 'never'}."""
+    try:
+        with open(STATUS_PATH) as f:
+            current = json.load(f)
+    except (OSError, ValueError):
+        return {'state': 'never'}
+    if current.get('state') == 'running' and not is_running():
+        current['state'] = 'interrupted'  # the job's process died without writing an outcome
+    return current
+
+
+def _try_lock():
+    """An open, exclusively locked lock file, or None if another job holds it."""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    handle = open(LOCK_PATH, 'a')
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+    return handle
+
+
+def is_running():
+    if fcntl is None:
+        return _pending is not None and not _pending.done()
+    handle = _try_lock()
+    if handle is None:
+        return True
+    handle.close()
+    return False
+
+
+def holdout_start():
+    """Smallest id of the newest labelled loans kept out of training, or None if there are too few."""
+    from sqlalchemy import select, func
+    from models import db, LoanApplication
+    table = LoanApplication.__table__
+    labelled = table.c.model_decision.isnot(None)
+    total = db.session.execute(select(func.count()).where(labelled)).scalar()
+    size = min(HOLDOUT_MAX, int(total * HOLDOUT_FRACTION))
+    if size < MIN_HOLDOUT or total - size < MIN_HOLDOUT:
+        return None
+    return db.session.execute(
+        select(table.c.id).where(labelled).order_by(table.c.id.desc()).offset(size - 1).limit(1)).scalar()
+
+
+def _log_loss(p_approve, y):
+    p = np.clip(p_approve, 1e-12, 1 - 1e-12)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def evaluate(model, X, y):
+    """Holdout log loss, raw accuracy and the approval rate after the loan policy."""
+    from ml import predict_batch
+    from policy import POLICY, FEATURES
+    decisions, confidences, probs, _ = predict_batch(model, X)
+    result = POLICY.evaluate(dict(zip(FEATURES, X.T)), decisions, confidences)
+    return {
+        'log_loss': _log_loss(probs[:, 1], y),
+        'accuracy': float(np.mean((probs[:, 1] > 0.5) == y)),
+        'approval_rate': float(np.mean(result.decisions == 'APPROVE')),
+    }
+
+
+def validate(candidate, served):
+    """List of reasons the candidate must not replace the served model (empty if it may)."""
+    if served is None:
+        return []
+    problems = []
+    if candidate['log_loss'] > served['log_loss'] * (1 + MAX_LOSS_INCREASE):
+        problems.append(f"log loss {candidate['log_loss']:.4f} vs {served['log_loss']:.4f} for the served model")
+    shift = abs(candidate['approval_rate'] - served['approval_rate'])
+    if shift > MAX_APPROVAL_SHIFT:
+        problems.append(f"policy approval rate {candidate['approval_rate']:.1%} vs {served['approval_rate']:.1%} "
+                        f"for the served model")
+    return problems
+
+
+def run_job(force=False, epochs=None, lock=None):
+    """
+    Train, validate and (if it passes, or force) promote a new model. Safe to run in
+    any process; returns the final status dict.
+    lock: the job lock submit() already holds, as a DupFd; taken here if None
+    """
+    lock = os.fdopen(lock.detach(), 'a') if lock is not None else _try_lock()
+    if lock is None:
+        return {'state': 'busy', 'reason': 'another retrain job is running'}
+    started = datetime.utcnow().isoformat(timespec='seconds')
+    candidate_model = f"{MODEL_PATH}.candidate"
+    candidate_weights = f"{WEIGHTS_PATH}.candidate"
+    try:
+        _write_status(state='running', started_at=started, pid=os.getpid())
+        from app import app
+        from ml import save_model
+        from scorer import LinearScorer
+        import train_model
+
+        with app.app_context():
+            cutoff = holdout_start()
+            if cutoff is None:
+                raise ValueError(f"not enough labelled loans for a holdout of at least {MIN_HOLDOUT}")
+            end = train_model.id_range()[1]
+            X, y = train_model.load_chunk(cutoff, end)
+            X_reviewed, y_reviewed = train_model.load_chunk(cutoff, end, reviewed_only=True)
+            model, stats = train_model.train(epochs=epochs or train_model.DEFAULT_EPOCHS, before=cutoff,
+                                             checkpoint_path=os.path.join(STATE_DIR, 'retrain_checkpoint.joblib'))
+
+        weights = save_model(model, candidate_model, candidate_weights, stats['reference'])
+        # Log loss on labels the served model did not produce, when there are enough of them
+        labels = 'human_override' if len(y_reviewed) >= MIN_REVIEWED else 'final_decision'
+        loss_X, loss_y = (X_reviewed, y_reviewed) if labels == 'human_override' else (X, y)
+
+        def measure(scorer):
+            metrics = evaluate(scorer, X, y)
+            metrics['log_loss'] = evaluate(scorer, loss_X, loss_y)['log_loss']
+            return metrics
+
+        # Validate exactly what the web workers would load
+        candidate = measure(LinearScorer.from_json(candidate_weights))
+        try:
+            served = measure(LinearScorer.from_json(WEIGHTS_PATH))
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Served model unreadable, validating the candidate alone: {e}")
+            served = None
+        problems = validate(candidate, served)
+
+        outcome = dict(started_at=started, finished_at=datetime.utcnow().isoformat(timespec='seconds'),
+                       version=weights['model_version'], trained_rows=stats['rows'], holdout_rows=len(y),
+                       labels=labels, loss_rows=len(loss_y), candidate=candidate, served=served,
+                       problems=problems)
+        if problems and not force:
+            for path in (candidate_model, candidate_weights):
+                os.remove(path)
+            outcome['state'] = 'rejected'
+        else:
+            os.replace(candidate_model, MODEL_PATH)
+            os.replace(candidate_weights, WEIGHTS_PATH)  # the file web workers watch goes last
+            outcome['state'] = 'promoted'
+        _write_status(**outcome)
+        return outcome
+    except Exception as e:
+        for path in (candidate_model, candidate_weights):
+            if os.path.exists(path):
+                os.remove(path)
+        outcome = {'state': 'failed', 'started_at': started, 'reason': str(e)}
+        _write_status(**outcome)
+        return outcome
+    finally:
+        lock.close()
+
+
+_pool = None
+_pool_pid = None
+_pending = None
+_pool_lock = threading.Lock()
+
+
+def _lower_priority():
+    os.nice(NICE)  # training yields the CPU to the web workers
+
+
+def submit(force=False):
+    """Start a job in the background pool; returns False if one is already queued or running."""
+    global _pool, _pool_pid, _pending
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            # spawn: the job imports the app fresh instead of inheriting this worker's connections
+            _pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_lower_priority)
+            _pool_pid, _pending = os.getpid(), None
+        if _pending is not None and not _pending.done():
+            return False
+        # Locked here, so two workers' POSTs cannot both start a job. The DupFd shares this
+        # lock with the job process, which holds it from then until the job ends.
+        lock = _try_lock()
+        if lock is None:
+            return False
+        try:
+            _pending = _pool.submit(run_job, force, None, DupFd(lock.fileno()) if fcntl else None)
+        finally:
+            lock.close()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain, validate and promote the loan model.")
+    parser.add_argument('--force', action='store_true', help="promote even if validation fails")
+    parser.add_argument('--epochs', type=int)
+    args = parser.parse_args()
+    outcome = run_job(args.force, args.epochs)
+    print(json.dumps(outcome, indent=2))
+    if outcome['state'] == 'promoted':
+        print(f"[OK] Promoted model version {outcome['version']}")
+    else:
+        print(f"[WARNING] Model not promoted: {outcome['state']}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+review.py — Human review queue for loan decisions.
+
+Decisions from loan_form are queued when the model and the rules disagree
+(priority 0) or when the model is unsure of its own call (priority = model
+confidence in percent, so the least certain come first).
+
+Reviewers claim a case under a lease of REVIEW_LEASE_SECONDS. Claiming is a
+single conditional UPDATE, so two reviewers can never hold the same case. If
+a reviewer walks away, the lease expires and the case becomes claimable
+again. Listing, claiming and resolving each run one query on
+ix_review_case_queue or the primary key; none of them scan loan_application.
+"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import and_, or_, select, update, func
+
+from models import db, LoanApplication, ReviewCase
+
+REVIEW_CONFIDENCE_THRESHOLD = float(os.environ.get('REVIEW_CONFIDENCE_THRESHOLD', '0.6'))
+REVIEW_LEASE_SECONDS = int(os.environ.get('REVIEW_LEASE_SECONDS', '900'))
+
+_cases = ReviewCase.__table__
+
+
+def review_flags(result):
+    """
+    Vectorized triage of a PolicyResult.
+    returns: (needs_review (N,) bool, priority (N,) int, reason per row or None)
+    """
+    conflicts = result.conflicts
+    if result.model_confidences is None:
+        # Rules alone decided; nothing to be unsure about
+        return conflicts, np.zeros(len(result), dtype=int), np.full(len(result), None)
+    low_confidence = result.model_confidences < REVIEW_CONFIDENCE_THRESHOLD
+    needs_review = conflicts | low_confidence
+    priority = np.where(conflicts, 0, np.round(result.model_confidences * 100)).astype(int)
+    reasons = np.where(conflicts, 'Model and eligibility rules disagree',
+                       np.where(low_confidence, 'Low confidence', None))
+    return needs_review, priority, reasons
+
+
+def enqueue(loan, priority, reason):
+    """Queue a (possibly unflushed) loan for review in the caller's transaction."""
+    db.session.add(ReviewCase(loan=loan, priority=int(priority), reason=reason, status='OPEN'))
+
+
+def _available(now):
+    return and_(_cases.c.status == 'OPEN',
+                or_(_cases.c.lease_expires_at.is_(None), _cases.c.lease_expires_at <= now))
+
+
+def list_open(limit=50):
+    """Open cases in review order, with their loan and applicant (joined by primary key)."""
+    return (ReviewCase.query
+            .filter(ReviewCase.status == 'OPEN')
+            .order_by(ReviewCase.priority, ReviewCase.id)
+            .options(db.joinedload(ReviewCase.loan).joinedload(LoanApplication.user),
+                     db.joinedload(ReviewCase.reviewer))
+            .limit(limit).all())
+
+
+def pending_count():
+    return db.session.execute(select(func.count()).select_from(_cases).where(_cases.c.status == 'OPEN')).scalar()
+
+
+def claim_next(reviewer_id):
+    """Atomically lease the most urgent claimable case to reviewer_id; returns its id or None."""
+    now = datetime.utcnow()
+    next_id = (select(_cases.c.id).where(_available(now))
+               .order_by(_cases.c.priority, _cases.c.id).limit(1).scalar_subquery())
+    case_id = db.session.execute(
+        update(_cases).where(_cases.c.id == next_id, _available(now))
+        .values(claimed_by=reviewer_id, lease_expires_at=now + timedelta(seconds=REVIEW_LEASE_SECONDS))
+        .returning(_cases.c.id)).scalar()
+    db.session.commit()
+    return case_id
+
+
+def claim(case_id, reviewer_id):
+    """Lease a specific case (or renew your own lease); False if someone else holds it."""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(_cases).where(_cases.c.id == case_id,
+                             or_(_available(now),
+                                 and_(_cases.c.status == 'OPEN', _cases.c.claimed_by == reviewer_id)))
+        .values(claimed_by=reviewer_id, lease_expires_at=now + timedelta(seconds=REVIEW_LEASE_SECONDS))
+    ).rowcount == 1
+    db.session.commit()
+    return claimed
+
+
+def release(case_id, reviewer_id):
+    db.session.execute(
+        update(_cases).where(_cases.c.id == case_id, _cases.c.status == 'OPEN', _cases.c.claimed_by == reviewer_id)
+        .values(claimed_by=None, lease_expires_at=None))
+    db.session.commit()
+
+
+def resolve(case_id, reviewer_id, decision, notes=None):
+    """
+    Close a case the reviewer currently holds and record the human decision on the loan.
+    returns: False if the reviewer's lease is gone (expired or taken over)
+    """
+    now = datetime.utcnow()
+    resolved = db.session.execute(
+        update(_cases).where(_cases.c.id == case_id, _cases.c.status == 'OPEN',
+                             _cases.c.claimed_by == reviewer_id, _cases.c.lease_expires_at > now)
+        .values(status='RESOLVED', resolution=decision, notes=notes, resolved_at=now, lease_expires_at=None)
+    ).rowcount == 1
+    if not resolved:
+        db.session.rollback()
+        return False
+    case = db.session.get(ReviewCase, case_id)
+    # ORM update so the governance rollups see the override
+    case.loan.human_override = decision
+    db.session.commit()
+    return True
@@ -0,0 +1,59 @@
+"""
+scorer.py — scikit-learn-free scoring for the loan model.
+
+Reads the weights exported to model_weights.json (see extract_model.py) and
+scores applicants with plain NumPy. LinearScorer exposes the same attributes and
+methods of LogisticRegression that ml.predict_single relies on (coef_,
+intercept_, classes_, predict_proba, predict), so callers never need to know
+which backend produced the model.
+"""
+import json
+
+import numpy as np
+
+FEATURES = ["income", "credit_score", "employment_years", "debt_to_income", "amount"]
+
+
+def expit(z):
+    """
+    Logistic sigmoid; matches scipy.special.expit to within 1 ulp (NumPy's vectorised exp
+    and the C library's round differently in the last bit for some inputs).
+    """
+    with np.errstate(over='ignore'):
+        return 1.0 / (1.0 + np.exp(-z))
+
+
+class LinearScorer:
+    """Binary logistic regression scorer built from exported weights."""
+
+    def __init__(self, coef, intercept, classes, features=None, version=None):
+        self.coef_ = np.asarray(coef, dtype=float).reshape(1, -1)
+        self.intercept_ = np.array([float(intercept)])
+        self.classes_ = np.asarray(classes)
+        self.feature_names = list(features or FEATURES)
+        self.version = version
+
+    @classmethod
+    def from_dict(cls, weights):
+        return cls(weights["coef"], weights["intercept"], weights["classes"],
+                   weights.get("features"), weights.get("model_version"))
+
+    @classmethod
+    def from_json(cls, f):
+        """Build a scorer from a path or an open (binary or text) file."""
+        if isinstance(f, str):
+            with open(f) as fh:
+                return cls.from_dict(json.load(fh))
+        return cls.from_dict(json.load(f))
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=float)
+        # Same expression as sklearn's LinearClassifierMixin so scores match bit for bit
+        return (X @ self.coef_.T + self.intercept_).ravel()
+
+    def predict_proba(self, X):
+        p = expit(self.decision_function(X))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
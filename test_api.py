@@ -0,0 +1,43 @@
+"""Decision API authorization: session callers may only file loans under their own account"""
+import app as app_module
+from app import app
+from models import LoanApplication
+
+APPLICANT = {'income': 90000, 'credit_score': 720, 'employment_years': 5, 'debt_to_income': 0.2, 'amount': 20000}
+
+
+def loans_of(user_id):
+    with app.app_context():
+        return LoanApplication.query.filter_by(user_id=user_id).count()
+
+
+def test_session_caller_cannot_persist_for_another_user(make_user, login):
+    me, my_email = make_user()
+    other, _ = make_user()
+    client = login(my_email)
+
+    response = client.post('/api/v1/decisions?persist=1', json={**APPLICANT, 'user_id': other})
+    assert response.status_code == 403
+    batch = {'persist': True, 'applicants': [APPLICANT, {**APPLICANT, 'user_id': other}]}
+    response = client.post('/api/v1/decisions', json=batch)
+    assert response.status_code == 403
+    assert loans_of(other) == 0 and loans_of(me) == 0
+
+    # Without a user_id, or with their own, the loan is filed under the caller
+    assert client.post('/api/v1/decisions?persist=1', json=APPLICANT).status_code == 200
+    assert client.post('/api/v1/decisions?persist=1', json={**APPLICANT, 'user_id': me}).status_code == 200
+    assert loans_of(me) == 2 and loans_of(other) == 0
+
+
+def test_api_key_caller_can_target_any_user(make_user, monkeypatch):
+    monkeypatch.setattr(app_module, 'DECISION_API_KEY', 'test-key')
+    target, _ = make_user()
+    client = app.test_client()
+
+    response = client.post('/api/v1/decisions?persist=1', json={**APPLICANT, 'user_id': target},
+                           headers={'X-API-Key': 'test-key'})
+    assert response.status_code == 200 and response.get_json()['persisted']
+    assert loans_of(target) == 1
+
+    assert client.post('/api/v1/decisions', json=APPLICANT, headers={'X-API-Key': 'wrong'}).status_code == 401
+    assert client.post('/api/v1/decisions', json=APPLICANT).status_code == 401
@@ -0,0 +1,134 @@
+"""Loan archive: write -> scan -> read back, per-database stores and cleanup of failed runs"""
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive
+from models import db, User, LoanApplication, ReviewCase, ArchiveSegment
+
+
+def add_loans(user_ids, n, days_ago, rng):
+    now = datetime.utcnow()
+    loans = []
+    for i in range(n):
+        decision = rng.choice(['APPROVE', 'REJECT'])
+        loans.append(LoanApplication(
+            user_id=user_ids[i % len(user_ids)], amount=round(rng.uniform(1e3, 3e5), 2),
+            income=round(rng.uniform(1e4, 2e5), 2), credit_score=rng.randint(300, 850),
+            employment_years=round(rng.uniform(0, 20), 1), debt_to_income=round(rng.uniform(0, 0.8), 3),
+            model_decision=decision, model_confidence=rng.random(),
+            explanation=f"Reasons: Income too low (₹{rng.randint(1, 9)})" if decision == 'REJECT' else None,
+            submitted_at=now - timedelta(days=rng.uniform(*days_ago)),
+            contrib_income=None if i % 3 else rng.gauss(0, 1), contrib_credit_score=None if i % 3 else 0.5,
+            contrib_employment_years=None if i % 3 else 0.1, contrib_debt_to_income=None if i % 3 else -0.2,
+            contrib_amount=None if i % 3 else 0.0, reason_codes='INCOME_TOO_LOW' if decision == 'REJECT' else '',
+            model_version='v1'))
+    db.session.add_all(loans)
+    db.session.commit()
+    return loans
+
+
+def as_dict(loan):
+    return {name: getattr(loan, name) for name in archive.LOAN_COLUMNS}
+
+
+def part_dirs(store):
+    return sorted(f"{month}/{part}" for month in os.listdir(store) if os.path.isdir(os.path.join(store, month))
+                  for part in os.listdir(os.path.join(store, month)))
+
+
+def test_archive_round_trip(make_app, tmp_path, monkeypatch):
+    archive_dir = str(tmp_path / 'archive')
+    monkeypatch.setattr(archive, '_dir', archive_dir)
+    rng = random.Random(3)
+    with make_app().app_context():
+        users = [User(name=f'Applicant {i}', email=f'applicant{i}@example.com') for i in range(3)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        old = add_loans(user_ids, 60, (500, 800), rng)
+        recent = add_loans(user_ids, 10, (0, 30), rng)
+        still_open, resolved = old[0], old[1]
+        db.session.add(ReviewCase(loan_id=still_open.id, status='OPEN', reason='Low confidence'))
+        db.session.add(ReviewCase(loan_id=resolved.id, status='RESOLVED', reason='Low confidence',
+                                  resolution='APPROVE', notes='Checked payslips', resolved_at=datetime.utcnow()))
+        resolved.human_override = 'APPROVE'
+        db.session.commit()
+        expected = {loan.id: as_dict(loan) for loan in old[1:]}
+        kept = {still_open.id} | {loan.id for loan in recent}
+        open_id, resolved_id = still_open.id, resolved.id
+
+        # Archiving moves every closed old loan out of the table
+        written = archive.archive_closed(365)
+        assert sum(segment['rows'] for segment in written) == len(expected)
+        remaining = {loan.id for loan in LoanApplication.query.all()}
+        assert remaining == kept
+        assert [case.loan_id for case in ReviewCase.query.all()] == [open_id]
+
+        # A scan returns every archived value unchanged
+        columns = archive.LOAN_COLUMNS + ['review_resolution', 'review_notes']
+        rows = {row['id']: row for batch in archive.records(columns) for row in batch}
+        assert {i: {k: v for k, v in row.items() if k in archive.LOAN_COLUMNS} for i, row in rows.items()} == expected
+        assert (rows[resolved_id]['review_resolution'], rows[resolved_id]['review_notes']) == \
+            ('APPROVE', 'Checked payslips')
+        start, end = datetime.utcnow() - timedelta(days=700), datetime.utcnow() - timedelta(days=600)
+        in_range = {row['id'] for batch in archive.records(['id'], start, end) for row in batch}
+        assert in_range == {i for i, loan in expected.items() if start <= loan['submitted_at'] < end}
+
+        # Per-user reads find the archived loans
+        for user_id in user_ids:
+            mine = sorted((loan for loan in expected.values() if loan['user_id'] == user_id),
+                          key=lambda loan: (loan['submitted_at'], loan['id']), reverse=True)
+            assert [as_dict(loan) for loan in archive.user_loans(user_id, 100)] == mine
+            assert [loan.id for loan in archive.user_loans(user_id, 5, before=(mine[4]['submitted_at'],
+                                                                              mine[4]['id']))] == \
+                [loan['id'] for loan in mine[5:10]]
+        loan = expected[resolved_id]
+        assert as_dict(archive.find_loan(loan['user_id'], loan['id'])) == loan
+        other = next(u for u in user_ids if u != loan['user_id'])
+        assert archive.find_loan(other, loan['id']) is None
+
+        # A failed run removes only the parts it wrote
+        store = archive.store_dir()
+        assert os.path.dirname(store) == archive_dir
+        leftover = os.path.join(store, written[0]['name'].split('/')[0], 'part-0042.tmp')
+        os.makedirs(leftover)  # as if a run had been killed mid-write
+        before = part_dirs(store)
+        more = add_loans(user_ids, 20, (500, 800), rng)
+        insert = archive.insert
+
+        def crash_before_index(table):
+            if table is archive._index:
+                raise RuntimeError("simulated crash")
+            return insert(table)
+
+        monkeypatch.setattr(archive, 'insert', crash_before_index)
+        with pytest.raises(RuntimeError):
+            archive.archive_closed(365)
+        monkeypatch.setattr(archive, 'insert', insert)
+        assert part_dirs(store) == before
+        assert LoanApplication.query.count() == len(remaining) + len(more)
+
+        # The next run archives them and never reuses or deletes the leftover
+        again = archive.archive_closed(365)
+        assert sum(segment['rows'] for segment in again) == len(more)
+        assert os.path.isdir(leftover)
+        assert all(int(segment['name'].split('part-')[1]) > 42 for segment in again
+                   if segment['name'].startswith(written[0]['name'].split('/')[0]))
+        assert archive.archive_closed(365) == []
+        recorded = {segment.name for segment in ArchiveSegment.query.all()}
+        assert set(part_dirs(store)) - recorded == {os.path.relpath(leftover, store)}
+
+    # Another database sharing ARCHIVE_DIR gets its own store
+    with make_app().app_context():
+        assert archive.store_dir() is None
+        assert list(archive.records(['id'])) == []
+        db.session.add(User(name='Applicant', email='applicant@example.com'))
+        db.session.commit()
+        add_loans([1], 5, (500, 800), rng)
+        archive.archive_closed(365)
+        assert archive.store_dir() != store and os.path.dirname(archive.store_dir()) == archive_dir
+        assert sum(len(batch) for batch in archive.records(['id'])) == 5
+    assert os.path.isdir(leftover) and os.path.exists(os.path.join(store, 'manifest.json'))
@@ -0,0 +1,58 @@
+"""Current-user cache: profile, role and password changes show up at once, a deleted user is logged out"""
+import auth
+from app import app
+from models import db, User
+
+
+def update_user(user_id, **changes):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for name, value in changes.items():
+            setattr(user, name, value)
+        db.session.commit()
+
+
+def test_profile_and_role_changes_evict_the_cached_user(make_user, login):
+    user_id, email = make_user()
+    client = login(email)
+    assert b'Test User' in client.get('/profile').data
+    assert auth._user_cache.get(user_id) is not None
+    assert client.get('/governance').status_code == 302
+
+    # Well within USER_CACHE_TTL: the next request must still see the change
+    update_user(user_id, name='Renamed Person')
+    assert auth._user_cache.get(user_id) is None
+    assert b'Renamed Person' in client.get('/profile').data
+    update_user(user_id, is_admin=True)
+    assert client.get('/governance').status_code == 200
+
+
+def test_password_change_evicts_the_cached_user(make_user, login):
+    user_id, email = make_user()
+    client = login(email)
+    client.get('/profile')
+    assert auth._user_cache.get(user_id) is not None
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.set_password('changed456')
+        db.session.commit()
+    assert auth._user_cache.get(user_id) is None
+    assert app.test_client().post('/login', data={'email': email, 'password': 'secret123'}).status_code == 200
+    login(email, 'changed456')
+
+
+def test_deleted_user_is_logged_out(make_user, login):
+    user_id, email = make_user()
+    client = login(email)
+    assert client.get('/dashboard').status_code == 200
+
+    with app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+    assert auth._user_cache.get(user_id) is None
+    response = client.get('/dashboard')
+    assert response.status_code == 302 and response.headers['Location'].endswith('/login')
+    with client.session_transaction() as session:
+        assert 'user_id' not in session
+    assert client.get('/profile').status_code == 302
@@ -0,0 +1,55 @@
+"""Drift statistics against distributions with known PSI and KS, and the reference shipped with the model"""
+import math
+
+import numpy as np
+import pytest
+
+import drift
+from policy import FEATURES
+
+
+def normal_counts(edges, mean, n):
+    """Expected counts of n draws from N(mean, 1) in the bins the interior edges make."""
+    cdf = [0.0] + [0.5 * (1 + math.erf((edge - mean) / math.sqrt(2))) for edge in edges] + [1.0]
+    return [n * (b - a) for a, b in zip(cdf, cdf[1:])]
+
+
+def test_psi_of_known_distributions():
+    # Same shares: no drift, whatever the sample sizes
+    assert drift.psi([500, 300, 200], [5000, 3000, 2000]) == pytest.approx(0, abs=1e-6)
+    # 50/50 against 25/75: (0.5 - 0.25) ln 2 + (0.5 - 0.75) ln(2/3) = ln(3) / 4
+    assert drift.psi([10 ** 6, 10 ** 6], [10 ** 6, 3 * 10 ** 6]) == pytest.approx(math.log(3) / 4, rel=1e-5)
+    # Symmetric in its arguments, and an empty bin stays finite
+    assert drift.psi([3, 7], [6, 4]) == pytest.approx(drift.psi([6, 4], [3, 7]))
+    assert math.isfinite(drift.psi([0, 100], [100, 0]))
+
+
+def test_ks_of_known_distributions():
+    edges = np.linspace(-4, 4, 33)    # includes 0.25, where N(0, 1) and N(0.5, 1) are furthest apart
+    exact = 2 * 0.5 * (1 + math.erf(0.25 / math.sqrt(2))) - 1
+    live, reference = normal_counts(edges, 0.5, 1000), normal_counts(edges, 0.0, 1000)
+    gap, flagged = drift.ks(live, reference)
+    assert gap == pytest.approx(exact, rel=1e-9) and flagged
+    # The same gap is within chance for 50 rows a side (critical value 1.36 * sqrt(2 / 50) = 0.27)
+    assert not drift.ks(normal_counts(edges, 0.5, 50), normal_counts(edges, 0.0, 50))[1]
+    # Coarser bins can only under-estimate the exact statistic
+    assert drift.ks(normal_counts([-1, 1], 0.5, 1000), normal_counts([-1, 1], 0.0, 1000))[0] < exact
+    assert drift.ks(reference, reference) == (0.0, False)
+
+
+def test_reference_bins_match_the_rollups():
+    """histograms() (training reference) and bin_index() (live rollups) must put every value in the same bin."""
+    rng = np.random.default_rng(5)
+    X = np.column_stack([rng.choice(drift.BINS[name] + [0, 1e9], 200) for name in FEATURES])
+    counts = drift.histograms(X)
+    for j, name in enumerate(FEATURES):
+        expected = [0] * (len(drift.BINS[name]) + 1)
+        for value in X[:, j]:
+            expected[drift.bin_index(name, value)] += 1
+        assert counts[name] == expected
+
+
+def test_shipped_model_has_a_reference():
+    reference = drift.load_reference()
+    assert reference is not None and reference['rows'] > 0
+    assert all(sum(reference['counts'][name]) == reference['rows'] for name in FEATURES)
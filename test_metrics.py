@@ -0,0 +1,58 @@
+"""Multi-worker metrics: exited workers' snapshots fold into the retired totals exactly once"""
+import json
+import os
+import subprocess
+import sys
+
+import liveness
+import metrics
+
+
+def dead_pid():
+    """The pid of a process that has already exited."""
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    return child.pid
+
+
+def write_snapshot(directory, name, reason, value):
+    with open(os.path.join(directory, name), 'w') as f:
+        json.dump({'counters': [['model_fallback_total', [['reason', reason]], value]], 'histograms': []}, f)
+    return name
+
+
+def scraped(reason):
+    line = f'model_fallback_total{{reason="{reason}"}} '
+    return [float(l[len(line):]) for l in metrics.render().splitlines() if l.startswith(line)]
+
+
+def test_exited_workers_fold_into_retired_totals(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, '_writer_pid', os.getpid())   # no background writer in the test
+    parent = os.getppid()
+    dead = write_snapshot(tmp_path, f"metrics-{dead_pid()}-deadbeef.json", 'test-folded', 3)
+    # A worker that died, whose pid now belongs to a live process (our parent)
+    reused = write_snapshot(tmp_path, f"metrics-{parent}-deadbeef.json", 'test-folded', 4)
+    live = write_snapshot(tmp_path, f"metrics-{parent}-{liveness.start_time(parent)}.json", 'test-live', 5)
+    legacy = write_snapshot(tmp_path, f"metrics-{dead_pid()}.json", 'test-folded', 1)
+
+    assert scraped('test-folded') == [8] and scraped('test-live') == [5]
+    names = set(os.listdir(tmp_path))
+    assert not names & {dead, reused, legacy} and {live, metrics.RETIRED} <= names
+
+    # Scraping again, and a later worker dying, only ever add
+    assert scraped('test-folded') == [8]
+    write_snapshot(tmp_path, f"metrics-{dead_pid()}-0badf00d.json", 'test-folded', 2)
+    assert scraped('test-folded') == [10]
+
+
+def test_fold_interrupted_before_delete_is_not_counted_twice(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, '_writer_pid', os.getpid())
+    dead = write_snapshot(tmp_path, f"metrics-{dead_pid()}-deadbeef.json", 'test-crash', 6)
+    # The totals were written (recording the name), then the folding worker died
+    with open(tmp_path / metrics.RETIRED, 'w') as f:
+        json.dump({'counters': [['model_fallback_total', [['reason', 'test-crash']], 6]], 'histograms': [],
+                   'folded': [dead]}, f)
+    assert scraped('test-crash') == [6]
+    assert not os.path.exists(tmp_path / dead)
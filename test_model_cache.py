@@ -0,0 +1,60 @@
+"""Model cache: a replaced model_weights.json is picked up, a corrupt one never takes a request down"""
+import json
+import os
+import time
+
+import ml
+from app import app
+from models import LoanApplication
+from scorer import LinearScorer
+from test_pagecache import LOAN
+
+
+def write_weights(path, version, coef):
+    """Write a weights file the way export_weights does: to a temp file, then an atomic rename."""
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump({'coef': coef, 'intercept': 0.0, 'classes': [0, 1], 'features': ml.FEATURES,
+                   'model_version': version}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def test_replaced_weights_are_picked_up(tmp_path):
+    path = str(tmp_path / 'model_weights.json')
+    write_weights(path, 'first', [0.0, 0.01, 0.0, 0.0, 0.0])
+    holder = ml.ModelHolder(path, LinearScorer.from_json, check_interval=0.05)
+    assert holder.get()[1] == 'first'
+
+    write_weights(path, 'second', [0.0, -0.01, 0.0, 0.0, 0.0])
+    # The watcher thread swaps it in without anyone calling refresh()
+    deadline = time.monotonic() + 5
+    while holder.get()[1] != 'second' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    model, version = holder.get()
+    assert version == 'second' and model.coef_[0][1] == -0.01
+
+
+def test_corrupt_weights_keep_the_loaded_model(tmp_path):
+    path = str(tmp_path / 'model_weights.json')
+    write_weights(path, 'good', [0.0, 0.01, 0.0, 0.0, 0.0])
+    holder = ml.ModelHolder(path, LinearScorer.from_json, check_interval=3600)
+    model = holder.get()[0]
+
+    with open(path, 'w') as f:
+        f.write('{"coef": [0.0, ')   # a truncated file, written in place
+    holder.refresh(force=True)
+    assert holder.get() == (model, 'good')
+
+
+def test_corrupt_weights_fall_back_to_the_rules(tmp_path, monkeypatch, make_user, login):
+    path = tmp_path / 'model_weights.json'
+    path.write_text('not json')
+    monkeypatch.setattr(ml, 'MODEL_BACKEND', 'weights')
+    monkeypatch.setattr(ml, '_weights_holder', ml.ModelHolder(str(path), LinearScorer.from_json, 3600))
+    user_id, email = make_user()
+    client = login(email)
+
+    assert client.post('/loan-form', data=LOAN).status_code == 302
+    with app.app_context():
+        loan = LoanApplication.query.filter_by(user_id=user_id).one()
+        # Decided by the rules alone: no model version, no contributions
+        assert loan.model_decision is not None and loan.model_version is None and loan.contrib_income is None
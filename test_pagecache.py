@@ -0,0 +1,44 @@
+"""Page cache and conditional GET: a loan write changes the ETag, an unchanged page is a 304, pages stay per-user"""
+LOAN = {'amount': 12345, 'income': 90000, 'credit_score': 720, 'employment_years': 5, 'debt_to_income': 0.2}
+
+
+def page(client, path='/dashboard', etag=None):
+    """GET a cached page, after one request that consumes any pending flash message (those bypass the cache)."""
+    client.get(path)
+    headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+    return client.get(path, headers=headers)
+
+
+def test_loan_write_changes_etag(make_user, login):
+    _, email = make_user()
+    client = login(email)
+    for path in ('/dashboard', '/loan-history'):
+        first = page(client, path)
+        assert first.status_code == 200 and first.get_etag()[0]
+
+        # Unchanged: the same ETag, and a revalidation with it is answered without a body
+        etag = first.get_etag()[0]
+        again = page(client, path, etag)
+        assert again.status_code == 304 and again.data == b''
+
+    before = {path: page(client, path).get_etag()[0] for path in ('/dashboard', '/loan-history')}
+    assert client.post('/loan-form', data=LOAN).status_code == 302
+    for path, etag in before.items():
+        after = page(client, path, etag)
+        assert after.status_code == 200 and after.get_etag()[0] != etag
+        assert b'12,345' in after.data
+
+
+def test_other_users_page_is_never_served(make_user, login):
+    _, alice_email = make_user()
+    _, bob_email = make_user()
+    alice, bob = login(alice_email), login(bob_email)
+    assert alice.post('/loan-form', data=LOAN).status_code == 302
+
+    for path in ('/dashboard', '/loan-history'):
+        mine = page(alice, path)
+        assert b'12,345' in mine.data
+        # Same route, same query string, a warm cache: bob still gets his own page, even with alice's ETag
+        theirs = page(bob, path, mine.get_etag()[0])
+        assert theirs.status_code == 200 and b'12,345' not in theirs.data
+        assert theirs.get_etag()[0] != mine.get_etag()[0]
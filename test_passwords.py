@@ -0,0 +1,39 @@
+"""Password rehash policy: logins upgrade weaker hashes and never downgrade stronger ones"""
+from werkzeug.security import generate_password_hash
+
+import passwords
+from app import app
+from models import db, User
+
+
+def stored_hash(user_id, password_hash=None):
+    """The user's stored hash, after replacing it with password_hash if given."""
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        if password_hash:
+            user.password_hash = password_hash
+            db.session.commit()
+        return user.password_hash
+
+
+def test_stronger_hash_is_kept(make_user, login, monkeypatch):
+    monkeypatch.setattr(passwords, '_policy', ('scrypt', 2 ** 15))
+    user_id, email = make_user()
+    for method in ('scrypt:65536:8:1', 'scrypt:131072:8:1'):
+        strong = stored_hash(user_id, generate_password_hash('secret123', method=method))
+        assert not passwords.needs_rehash(strong)
+        login(email)
+        assert stored_hash(user_id) == strong
+
+
+def test_weaker_or_other_method_hash_is_upgraded(make_user, login, monkeypatch):
+    monkeypatch.setattr(passwords, '_policy', ('scrypt', 2 ** 15))
+    user_id, email = make_user()
+    # One doubling below the policy is tolerated, so calibrations on neighbouring steps don't flap
+    near = stored_hash(user_id, generate_password_hash('secret123', method='scrypt:16384:8:1'))
+    assert not passwords.needs_rehash(near)
+    for method in ('scrypt:4096:8:1', 'pbkdf2:sha256:600000'):
+        weak = stored_hash(user_id, generate_password_hash('secret123', method=method))
+        assert passwords.needs_rehash(weak)
+        login(email)
+        assert passwords.parse(stored_hash(user_id)) == ('scrypt', 2 ** 15)
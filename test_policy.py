@@ -0,0 +1,124 @@
+"""Check that the policy engine decides exactly like the original loan_form if-chain"""
+import random
+
+import numpy as np
+
+from policy import POLICY
+
+
+def original_decision(amount, income, credit_score, employment_years, debt_to_income, ml=None):
+    """The rules loan_form ran before loan_policy.json existed, kept here as the reference."""
+    decision = 'REJECT'
+    confidence = 0.0
+    rejection_reasons = []
+
+    if credit_score < 300:
+        rejection_reasons.append(f"Credit score too low ({credit_score}). Minimum required: 300")
+    elif credit_score < 500:
+        rejection_reasons.append(f"Credit score is borderline ({credit_score}). Recommended: 500+")
+
+    if debt_to_income >= 0.43:
+        rejection_reasons.append(f"Debt-to-income ratio too high ({debt_to_income*100:.1f}%). Maximum allowed: 43%")
+    elif debt_to_income >= 0.36:
+        rejection_reasons.append(f"Debt-to-income ratio is high ({debt_to_income*100:.1f}%). Recommended: below 36%")
+
+    loan_to_income = amount / income if income > 0 else float('inf')
+    if loan_to_income > 3.0:
+        rejection_reasons.append(f"Loan amount too high relative to income (₹{amount:,.0f} vs ₹{income:,.0f} annual income)")
+
+    if employment_years < 1:
+        rejection_reasons.append(f"Insufficient employment history ({employment_years} years). Minimum: 1 year")
+    elif employment_years < 2:
+        rejection_reasons.append(f"Limited employment history ({employment_years} years). Recommended: 2+ years")
+
+    if income < 25000:
+        rejection_reasons.append(f"Income too low (₹{income:,.0f}). Minimum required: ₹25,000")
+
+    if ml is not None:
+        ml_decision, ml_confidence = ml
+        critical_rules_pass = (credit_score >= 300 and debt_to_income < 0.43 and loan_to_income <= 3.0
+                               and employment_years >= 1 and income >= 25000)
+        if ml_decision == 'APPROVE' and critical_rules_pass:
+            decision = 'APPROVE'
+            confidence = min(ml_confidence, 0.95)
+        else:
+            decision = 'REJECT'
+            confidence = 1.0 - ml_confidence
+            if not critical_rules_pass:
+                rejection_reasons.append("Failed critical eligibility checks")
+
+    if decision == 'REJECT' and not rejection_reasons:
+        if (credit_score >= 650 and debt_to_income < 0.36 and loan_to_income <= 2.5
+                and employment_years >= 2 and income >= 30000):
+            decision = 'APPROVE'
+            confidence = 0.85
+        elif (credit_score >= 700 and debt_to_income < 0.30 and loan_to_income <= 3.0
+                and employment_years >= 1 and income >= 25000):
+            decision = 'APPROVE'
+            confidence = 0.80
+        elif (credit_score >= 300 and debt_to_income < 0.40 and loan_to_income <= 2.0
+                and employment_years >= 1 and income >= 25000):
+            decision = 'APPROVE'
+            confidence = 0.75
+        else:
+            decision = 'REJECT'
+            confidence = 0.70
+            if credit_score < 500:
+                rejection_reasons.append(f"Credit score {credit_score} below minimum threshold (500)")
+            if debt_to_income >= 0.36:
+                rejection_reasons.append(f"Debt-to-income ratio {debt_to_income*100:.1f}% too high (max 36%)")
+            if loan_to_income > 2.5:
+                rejection_reasons.append("Loan amount too high relative to income")
+            if employment_years < 2:
+                rejection_reasons.append(f"Employment history too short ({employment_years} years)")
+            if income < 30000:
+                rejection_reasons.append(f"Income too low (₹{income:,.0f})")
+
+    explanation = None
+    if rejection_reasons and decision == 'REJECT':
+        explanation = "Reasons: " + "; ".join(rejection_reasons[:3])
+    return decision, confidence, explanation
+
+
+def applicants(n, seed=7):
+    """Random applicants, half of them sitting exactly on a rule threshold."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        income = rng.choice([0.0, 24999.0, 25000.0, 30000.0]) if i % 2 else round(rng.uniform(0, 200000), 2)
+        rows.append({
+            'income': income,
+            'credit_score': rng.choice([299, 300, 499, 500, 649, 650, 699, 700]) if i % 2 else rng.randint(200, 850),
+            'employment_years': rng.choice([0.0, 1.0, 1.5, 2.0]) if i % 2 else round(rng.uniform(0, 20), 1),
+            'debt_to_income': rng.choice([0.29, 0.30, 0.36, 0.40, 0.43]) if i % 2 else round(rng.uniform(0, 0.8), 3),
+            'amount': (rng.choice([2.0, 2.5, 3.0, 3.01]) * income or 5000.0) if i % 2 else round(rng.uniform(1000, 400000), 2),
+        })
+    return rows
+
+
+def test_policy_matches_original_rules():
+    rows = applicants(4000)
+    columns = {name: np.array([row[name] for row in rows]) for name in rows[0]}
+    rng = random.Random(11)
+    model_decisions = np.array([rng.choice(['APPROVE', 'REJECT']) for _ in rows])
+    model_confidences = np.array([rng.random() for _ in rows])
+
+    for label, ml in (("rules only (no model)", None), ("model gated by the rules", True)):
+        if ml is None:
+            result = POLICY.evaluate(columns)
+        else:
+            result = POLICY.evaluate(columns, model_decisions, model_confidences)
+        mismatches = []
+        for i, row in enumerate(rows):
+            expected = original_decision(**row, ml=None if ml is None else (model_decisions[i], model_confidences[i]))
+            got = (str(result.decisions[i]), float(result.confidences[i]), result.explanation(i))
+            if got[0] != expected[0] or abs(got[1] - expected[1]) > 1e-12 or got[2] != expected[2]:
+                mismatches.append((row, expected, got))
+        assert not mismatches, f"{label}: {len(mismatches)} of {len(rows)} applicants differ, e.g. {mismatches[0]}"
+
+    # Reason codes stored with each loan line up with its explanation
+    result = POLICY.evaluate(columns, model_decisions, model_confidences)
+    for i in range(len(rows)):
+        codes, reasons = result.reason_codes(i), result.reasons(i)
+        assert len(codes) == len(reasons)
+        assert (result.explanation(i) is not None) == (result.decisions[i] == 'REJECT' and bool(codes))
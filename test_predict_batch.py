@@ -0,0 +1,31 @@
+"""Vectorized scoring: predict_batch agrees with predict_single and with the scikit-learn backend"""
+import numpy as np
+import pytest
+
+from ml import WEIGHTS_PATH, predict_batch, predict_single
+from policy import FEATURES
+from scorer import LinearScorer
+
+
+def test_batch_matches_single(applicant_matrix):
+    scorer = LinearScorer.from_json(WEIGHTS_PATH)
+    X = applicant_matrix[::7]
+    decisions, confidences, probs, contributions = predict_batch(scorer, X)
+    for i, row in enumerate(X):
+        decision, confidence, row_probs, row_contributions = predict_single(scorer, dict(zip(FEATURES, row)))
+        assert decision == decisions[i] and list(row_contributions.values()) == contributions[i].tolist()
+        # BLAS sums a one-row product in a different order than a batch, so scores agree to rounding only
+        assert np.allclose(row_probs, probs[i], rtol=0, atol=1e-12) and confidence == pytest.approx(confidences[i])
+    # Columns by name give the same result as the matrix
+    by_name = predict_batch(scorer, {name: X[:, j] for j, name in enumerate(FEATURES)})
+    assert all(np.array_equal(a, b) for a, b in zip(by_name, (decisions, confidences, probs, contributions)))
+
+
+def test_batch_matches_sklearn_backend(sklearn_model, applicant_matrix):
+    X = applicant_matrix
+    ours = predict_batch(LinearScorer.from_json(WEIGHTS_PATH), X)
+    theirs = predict_batch(sklearn_model, X)
+    # The weights backend decides, scores and explains exactly as the pickle it was exported from
+    assert all(np.array_equal(a, b) for a, b in zip(ours, theirs))
+    assert np.array_equal(ours[0], np.where(sklearn_model.predict(X) == 1, 'APPROVE', 'REJECT'))
+    assert np.array_equal(ours[3], X * sklearn_model.coef_[0])
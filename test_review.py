@@ -0,0 +1,70 @@
+"""Human-review queue: claim order, lease exclusivity, expiry and re-claim"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+import review
+from models import db, User, LoanApplication, ReviewCase
+
+
+def expire_lease(case_id):
+    """The holder walked away: move the lease end into the past."""
+    db.session.execute(update(ReviewCase.__table__).where(ReviewCase.__table__.c.id == case_id)
+                       .values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+
+def test_review_leases(scratch_app):
+    applicant = User(name='Applicant', email='applicant@example.com')
+    alice = User(name='Alice', email='alice@example.com', is_admin=True)
+    bob = User(name='Bob', email='bob@example.com', is_admin=True)
+    db.session.add_all([applicant, alice, bob])
+    db.session.flush()
+    cases = {}
+    for priority in (50, 0, 20):
+        loan = LoanApplication(user_id=applicant.id, amount=10000, income=50000, credit_score=640,
+                               employment_years=3, debt_to_income=0.2, model_decision='REJECT',
+                               model_confidence=0.55)
+        review.enqueue(loan, priority, 'Low confidence')
+        db.session.flush()
+        cases[priority] = loan.review_case.id
+    db.session.commit()
+
+    # Claiming takes the most urgent case nobody holds
+    first = review.claim_next(alice.id)
+    second = review.claim_next(bob.id)
+    assert (first, second) == (cases[0], cases[20])
+
+    # A held case cannot be taken, resolved or released by someone else; its holder can renew it
+    assert not review.claim(first, bob.id)
+    assert not review.resolve(first, bob.id, 'APPROVE')
+    review.release(first, bob.id)
+    assert db.session.get(ReviewCase, first).claimed_by == alice.id
+    assert review.claim(first, alice.id)
+
+    # An expired lease makes the case claimable again
+    expire_lease(first)
+    assert review.claim_next(bob.id) == first
+    db.session.expire_all()
+    assert db.session.get(ReviewCase, first).claimed_by == bob.id
+
+    # The old holder can no longer resolve it; the new one can
+    assert not review.resolve(first, alice.id, 'REJECT')
+    assert review.resolve(first, bob.id, 'APPROVE', 'Verified income')
+    db.session.expire_all()
+    case = db.session.get(ReviewCase, first)
+    assert (case.status, case.resolution, case.loan.human_override) == ('RESOLVED', 'APPROVE', 'APPROVE')
+    assert not review.claim(first, alice.id)
+
+    # An expired lease cannot be used to resolve, even by its holder
+    expire_lease(second)
+    assert not review.resolve(second, bob.id, 'APPROVE')
+    assert review.claim(second, bob.id) and review.resolve(second, bob.id, 'REJECT')
+
+    # Releasing hands the case straight back to the queue
+    third = review.claim_next(alice.id)
+    assert third == cases[50]
+    assert review.claim_next(bob.id) is None
+    review.release(third, alice.id)
+    assert review.claim_next(bob.id) == third
+    assert review.pending_count() == 1
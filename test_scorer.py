@@ -0,0 +1,17 @@
+"""NumPy scorer: LinearScorer built from model_weights.json scores exactly like the scikit-learn model"""
+import numpy as np
+
+from ml import WEIGHTS_PATH
+from scorer import LinearScorer
+
+
+def test_scorer_matches_sklearn(sklearn_model, applicant_matrix):
+    scorer = LinearScorer.from_json(WEIGHTS_PATH)
+    X = applicant_matrix
+    # Scores and classes are bit-for-bit the same
+    assert np.array_equal(scorer.decision_function(X), sklearn_model.decision_function(X))
+    assert np.array_equal(scorer.predict(X), sklearn_model.predict(X))
+    assert np.array_equal(scorer.classes_, sklearn_model.classes_)
+    # Probabilities too, except where NumPy's exp and the C library's (scipy's expit) round apart: 1 ulp
+    ours, theirs = scorer.predict_proba(X), sklearn_model.predict_proba(X)
+    assert np.all(np.abs(ours - theirs) <= np.spacing(theirs))
@@ -0,0 +1,159 @@
+"""Write-behind replay: a crash mid-log must store every acknowledged decision exactly once"""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+import liveness
+import writebehind
+from models import db, User, LoanApplication, ReviewCase, WriteBehindCheckpoint
+
+
+def record(user_id, n, review=False):
+    """One log line as writebehind.append writes it; amount tags the record."""
+    loan = {'user_id': user_id, 'amount': 1000.0 + n, 'income': 50000.0, 'credit_score': 700,
+            'employment_years': 3.0, 'debt_to_income': 0.2, 'model_decision': 'APPROVE',
+            'model_confidence': 0.9, 'submitted_at': datetime.utcnow().isoformat()}
+    if review:
+        loan['_review'] = [55, 'Low confidence']
+    return (json.dumps(loan, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def dead_pid():
+    """The pid of a process that has already exited."""
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    return child.pid
+
+
+def stored_amounts():
+    db.session.expire_all()
+    return sorted(int(a) - 1000 for a in db.session.execute(db.select(LoanApplication.amount)).scalars())
+
+
+def checkpoint(name):
+    db.session.expire_all()
+    row = db.session.get(WriteBehindCheckpoint, name)
+    return row.offset if row else None
+
+
+@pytest.fixture
+def log_dir(scratch_app, tmp_path, monkeypatch):
+    """Write-behind switched on for scratch_app, with its logs under tmp_path and 3-record batches."""
+    path = tmp_path / 'writebehind'
+    path.mkdir()
+    monkeypatch.setattr(writebehind, '_app', scratch_app)
+    monkeypatch.setattr(writebehind, '_log_dir', str(path))
+    monkeypatch.setattr(writebehind, 'ENABLED', True)
+    monkeypatch.setattr(writebehind, 'BATCH_SIZE', 3)
+    return str(path)
+
+
+def write_log(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return os.path.basename(path)
+
+
+def test_replay_after_crash_mid_log(log_dir, monkeypatch):
+    user = User(name='Applicant', email='applicant@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    # A worker died after acknowledging 7 decisions and while writing an 8th
+    lines = [record(user.id, n, review=(n == 4)) for n in range(7)]
+    dead_log = os.path.join(log_dir, f"decisions-{dead_pid()}-deadbeef-000001.log")
+    name = write_log(dead_log, b''.join(lines) + record(user.id, 99)[:40])
+
+    # Replay crashes after the first batch is committed
+    load, calls = writebehind._load, []
+
+    def crash_on_second_batch(batch):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            raise RuntimeError("simulated crash")
+        return load(batch)
+
+    monkeypatch.setattr(writebehind, '_load', crash_on_second_batch)
+    writebehind.drain()
+    monkeypatch.setattr(writebehind, '_load', load)
+    assert stored_amounts() == [0, 1, 2]
+    assert checkpoint(name) == sum(len(line) for line in lines[:3])
+    assert os.path.exists(dead_log)
+
+    # The next drain resumes from the checkpoint, queues the review case once, drops the torn tail
+    writebehind.drain()
+    assert stored_amounts() == list(range(7))
+    assert ReviewCase.query.count() == 1
+    assert not os.path.exists(dead_log) and checkpoint(name) is None
+
+
+def test_crash_between_commit_and_retire(log_dir):
+    user = User(name='Applicant', email='applicant@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    dead_log = os.path.join(log_dir, f"decisions-{dead_pid()}-deadbeef-000002.log")
+    name = write_log(dead_log, record(user.id, 7) + record(user.id, 8))
+    with open(dead_log, 'rb') as f:
+        writebehind._replay(dead_log, f, 0)   # rows and checkpoint committed; the process dies here
+    writebehind.drain()
+    assert stored_amounts() == [7, 8]
+    assert not os.path.exists(dead_log) and checkpoint(name) is None
+
+
+def test_live_log_waits_for_complete_line(log_dir):
+    user = User(name='Applicant', email='applicant@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    parent = os.getppid()
+    live_log = os.path.join(log_dir, f"decisions-{parent}-{liveness.start_time(parent)}-000001.log")
+    line = record(user.id, 9)
+    name = write_log(live_log, line[:25])
+    writebehind.drain()
+    assert stored_amounts() == []
+    with open(live_log, 'ab') as f:
+        f.write(line[25:])
+    writebehind.drain()
+    writebehind.drain()
+    assert stored_amounts() == [9]
+    assert checkpoint(name) == len(line) and os.path.exists(live_log)
+
+
+def test_log_of_dead_worker_with_reused_pid_is_retired(log_dir):
+    user = User(name='Applicant', email='applicant@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    # The worker died and its pid now belongs to a live process (our parent)
+    reused_log = os.path.join(log_dir, f"decisions-{os.getppid()}-deadbeef-000001.log")
+    name = write_log(reused_log, record(user.id, 5))
+    writebehind.drain()
+    assert stored_amounts() == [5]
+    assert not os.path.exists(reused_log) and checkpoint(name) is None
+
+
+def test_flush_through_stores_only_what_is_pending(log_dir):
+    user = User(name='Applicant', email='applicant@example.com')
+    db.session.add(user)
+    db.session.commit()
+
+    parent = os.getppid()
+    other_worker = os.path.join(log_dir, f"decisions-{parent}-{liveness.start_time(parent)}-000001.log")
+    name = write_log(other_worker, record(user.id, 1) + record(user.id, 2))
+    position = (name, os.path.getsize(other_worker))
+    assert writebehind.flush_through(position)
+    assert stored_amounts() == [1, 2] and checkpoint(name) == position[1]
+
+    # Already replayed that far: no drain, even with newer records behind it
+    with open(other_worker, 'ab') as f:
+        f.write(record(user.id, 3))
+    assert writebehind.flush_through(position)
+    assert stored_amounts() == [1, 2]
+
+    # A retired (deleted) log was replayed in full
+    assert writebehind.flush_through(('decisions-1-deadbeef-000009.log', 100))
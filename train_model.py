@@ -0,0 +1,244 @@
+"""
+train_model.py — Out-of-core retraining from loan_application history.
+
+Labelled rows are read back in primary-key ranges of --chunk-size ids, so only
+one chunk is in memory at a time however long the history is. The label is the
+final decision: the human override when a reviewer set one, else the stored
+decision (1 = APPROVE, 0 = REJECT).
+
+Training runs in passes over the chunks:
+  pass 0      StandardScaler.partial_fit accumulates feature means and variances,
+              and drift.histograms the training reference stored with the model
+  pass 1..E   SGDClassifier(loss='log_loss').partial_fit on scaled features;
+              chunks are visited in a seeded random order and shuffled inside,
+              and each chunk is scored before it is learned from (progressive
+              validation), which gives a running log loss and accuracy.
+
+State is checkpointed every --checkpoint-every chunks and at the end of every
+pass. After an interruption, --resume continues from the last checkpoint over the
+same id range. The result is folded into a plain LogisticRegression (the scaling
+absorbed into coef_ and intercept_), so ml.load_model / predict_single and the
+exported model_weights.json work as they do for the current model.
+
+scikit-learn and joblib are only needed here, not by the web workers.
+
+Usage:
+    python train_model.py                              # train and replace the live model files
+    python train_model.py --epochs 3 --output /tmp/candidate.pkl
+    python train_model.py --resume
+"""
+import argparse
+import os
+import time
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import select, func, case
+
+import drift
+from models import db, LoanApplication
+from ml import BASE_DIR, MODEL_PATH, WEIGHTS_PATH, FEATURES, save_model
+
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_EPOCHS = 2
+CHECKPOINT_PATH = os.path.join(BASE_DIR, 'instance', 'training_checkpoint.joblib')
+
+
+def _label():
+    table = LoanApplication.__table__
+    final = func.coalesce(table.c.human_override, table.c.model_decision)
+    return case((final == 'APPROVE', 1), else_=0)
+
+
+def id_range(before=None):
+    """(first id, last id + 1) of the labelled history (ids below `before`), or (0, 0) if there is none."""
+    table = LoanApplication.__table__
+    query = select(func.min(table.c.id), func.max(table.c.id)).where(table.c.model_decision.isnot(None))
+    if before is not None:
+        query = query.where(table.c.id < before)
+    low, high = db.session.execute(query).one()
+    return (low, high + 1) if low is not None else (0, 0)
+
+
+def load_chunk(start, stop, reviewed_only=False):
+    """
+    (X (n, 5) float, y (n,) int) for labelled loans with start <= id < stop.
+    reviewed_only: just the loans a human reviewer overrode
+    """
+    table = LoanApplication.__table__
+    query = (select(*[table.c[name] for name in FEATURES], _label())
+             .where(table.c.id >= start, table.c.id < stop, table.c.model_decision.isnot(None)))
+    if reviewed_only:
+        query = query.where(table.c.human_override.isnot(None))
+    rows = db.session.execute(query).all()
+    width = len(FEATURES) + 1
+    data = np.fromiter(chain.from_iterable(rows), dtype=float, count=len(rows) * width).reshape(-1, width)
+    return data[:, :-1], data[:, -1].astype(int)
+
+
+def fold(scaler, sgd):
+    """A LogisticRegression equal to sgd applied after scaler, with the scaling folded into the weights."""
+    from sklearn.linear_model import LogisticRegression
+    scale = scaler.scale_
+    coef = sgd.coef_[0] / scale
+    model = LogisticRegression()
+    model.coef_ = coef.reshape(1, -1)
+    model.intercept_ = np.array([sgd.intercept_[0] - float(np.dot(coef, scaler.mean_))])
+    model.classes_ = np.array([0, 1])
+    model.n_features_in_ = len(FEATURES)
+    model.n_iter_ = np.array([sgd.t_])
+    return model
+
+
+# Per-pass counters, reset at the start of every pass
+_PASS_TOTALS = {'position': 0, 'rows': 0, 'loss_sum': 0.0, 'correct': 0, 'scored': 0}
+
+
+def _new_state(bounds, chunk_size, epochs, alpha, seed):
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.preprocessing import StandardScaler
+    return {
+        'bounds': bounds, 'chunk_size': chunk_size, 'epochs': epochs, 'seed': seed,
+        'pass': 0, **_PASS_TOTALS,
+        'scaler': StandardScaler(),
+        'sgd': SGDClassifier(loss='log_loss', alpha=alpha, random_state=seed),
+        'history': [],
+        'reference': {},
+    }
+
+
+def _reference_counts(bounds, chunk_size):
+    """Feature histograms of the labelled loans in bounds: one extra read, for checkpoints without them."""
+    counts = {}
+    for start in range(bounds[0], bounds[1], chunk_size):
+        X, _ = load_chunk(start, min(start + chunk_size, bounds[1]))
+        if len(X):
+            drift.add_histograms(counts, drift.histograms(X))
+    return counts
+
+
+def _save_checkpoint(state, path):
+    from joblib import dump
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    dump(state, tmp)
+    os.replace(tmp, path)
+
+
+def _chunk_order(state):
+    start, stop = state['bounds']
+    starts = np.arange(start, stop, state['chunk_size'])
+    if state['pass'] > 0:
+        np.random.default_rng(state['seed'] + state['pass']).shuffle(starts)
+    return starts
+
+
+def _learn(state, X, y):
+    """One SGD step over a chunk; scores it first for the running (progressive) metrics."""
+    sgd = state['sgd']
+    Xs = state['scaler'].transform(X)
+    if hasattr(sgd, 'coef_'):
+        p = np.clip(sgd.predict_proba(Xs)[:, 1], 1e-12, 1 - 1e-12)
+        state['loss_sum'] -= float(np.sum(y * np.log(p) + (1 - y) * np.log(1 - p)))
+        state['correct'] += int(np.sum((p > 0.5) == y))
+        state['scored'] += len(y)
+    order = np.random.default_rng(state['seed'] + state['pass'] * 1_000_003 + state['position']).permutation(len(y))
+    sgd.partial_fit(Xs[order], y[order], classes=np.array([0, 1]))
+
+
+def train(chunk_size=DEFAULT_CHUNK_SIZE, epochs=DEFAULT_EPOCHS, alpha=1e-4, seed=0,
+          checkpoint_path=CHECKPOINT_PATH, checkpoint_every=20, resume=False, progress=None, before=None):
+    """
+    Train on the whole labelled history (or the loans with id < before). Must run inside an app context.
+    progress: optional callable(state, rows_per_sec) after every chunk
+    returns: (LogisticRegression, stats dict)
+    """
+    from joblib import load
+    if resume and os.path.exists(checkpoint_path):
+        state = load(checkpoint_path)
+        print(f"[OK] Resuming pass {state['pass']} at chunk {state['position']} from {checkpoint_path}")
+        if 'reference' not in state:
+            state['reference'] = None  # checkpoint predates the drift reference; rebuilt after training
+    else:
+        state = _new_state(id_range(before), chunk_size, epochs, alpha, seed)
+    if state['bounds'][0] == state['bounds'][1]:
+        raise ValueError("No labelled loan applications to train on")
+
+    started, seen = time.perf_counter(), 0
+    while state['pass'] <= state['epochs']:
+        starts = _chunk_order(state)
+        while state['position'] < len(starts):
+            start = int(starts[state['position']])
+            X, y = load_chunk(start, min(start + state['chunk_size'], state['bounds'][1]))
+            if len(y):
+                if state['pass'] == 0:
+                    state['scaler'].partial_fit(X)
+                    if state['reference'] is not None:
+                        drift.add_histograms(state['reference'], drift.histograms(X))
+                else:
+                    _learn(state, X, y)
+                state['rows'] += len(y)
+                seen += len(y)
+            state['position'] += 1
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress(state, seen / elapsed if elapsed else 0.0)
+            if checkpoint_every and state['position'] % checkpoint_every == 0:
+                _save_checkpoint(state, checkpoint_path)
+        if state['pass'] > 0:
+            scored = max(state['scored'], 1)
+            state['history'].append({'pass': state['pass'], 'rows': state['rows'],
+                                     'log_loss': state['loss_sum'] / scored, 'accuracy': state['correct'] / scored})
+        state.update(_PASS_TOTALS)
+        state['pass'] += 1
+        _save_checkpoint(state, checkpoint_path)
+
+    if state['reference'] is None:
+        state['reference'] = _reference_counts(state['bounds'], state['chunk_size'])
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    seconds = time.perf_counter() - started
+    return fold(state['scaler'], state['sgd']), {
+        'rows': int(state['scaler'].n_samples_seen_),
+        'passes': state['epochs'] + 1,
+        'history': state['history'],
+        'seconds': seconds,
+        'reference': drift.make_reference(state['reference'], f"training, {int(state['scaler'].n_samples_seen_):,} loans"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain the loan model from loan_application history, out of core.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="ids per chunk")
+    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS, help="SGD passes over the history")
+    parser.add_argument('--alpha', type=float, default=1e-4, help="L2 regularisation strength")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--checkpoint-every', type=int, default=20, help="chunks between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="continue from --checkpoint if it exists")
+    parser.add_argument('--output', default=MODEL_PATH, help="model pickle to write (default: the live model)")
+    parser.add_argument('--weights-output', help="exported weights JSON (default: next to --output)")
+    args = parser.parse_args()
+    weights_path = args.weights_output or (WEIGHTS_PATH if args.output == MODEL_PATH
+                                           else os.path.splitext(args.output)[0] + '_weights.json')
+
+    from app import app
+
+    def progress(state, rows_per_sec):
+        if state['position'] % 20 == 0:
+            print(f"  pass {state['pass']}/{state['epochs']}: chunk {state['position']}, "
+                  f"{state['rows']:,} rows ({rows_per_sec:,.0f} rows/s)")
+
+    with app.app_context():
+        model, stats = train(args.chunk_size, args.epochs, args.alpha, args.seed,
+                             args.checkpoint, args.checkpoint_every, args.resume, progress)
+    weights = save_model(model, args.output, weights_path, stats['reference'])
+
+    for h in stats['history']:
+        print(f"  pass {h['pass']}: progressive log loss {h['log_loss']:.4f}, accuracy {h['accuracy']:.1%}")
+    print(f"[OK] Trained on {stats['rows']:,} loans in {stats['seconds']:.1f}s; "
+          f"wrote {args.output} and {weights_path} (version {weights['model_version']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
-from app import app, load_model, predict_single
+from app import app
+from ml import load_model, predict_single
 import os
 
 def verify_low_credit_score():
@@ -0,0 +1,307 @@
+"""
+writebehind.py — Optional write-behind persistence for loan decisions.
+
+With WRITE_BEHIND=1, loan_form does not commit each application itself. The
+decision is appended as one JSON line to a per-process log file under
+WRITE_BEHIND_DIR (default: '<database>-writebehind' beside the SQLite file, so
+the logs share the database's disk), and the request returns immediately. A background thread
+then moves new lines into loan_application in group-committed batches: one
+transaction and one fsync per batch instead of one per applicant.
+
+Durability:
+  * A record is written to the OS before the request is acknowledged, so a
+    worker crash loses nothing.
+  * The log is fsynced at least every WRITE_BEHIND_FSYNC_INTERVAL seconds, which
+    bounds what a power loss can take. Set it to 0 to fsync on every append.
+  * The offset each log has been replayed to is stored in write_behind_checkpoint
+    and committed in the same transaction as the rows it covers. Replay after a
+    crash is therefore exactly-once.
+  * Logs left behind by dead workers are drained by whichever worker gets to
+    them first (flock keeps drainers apart), then deleted. A log is named after
+    its worker's pid and start token (liveness.py), so a new process that
+    reuses the pid does not keep a dead worker's log looking alive.
+
+Read-your-writes: append() returns the position just past its record, which
+loan_form keeps in the user's session. Pages that list the user's loans pass
+it to flush_through(), which drains that one log (on whichever worker wrote
+it) only if it has not been replayed that far yet. Page views without a
+pending decision cost nothing. drain() flushes every log, for the export.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: each worker only drains its own logs
+    fcntl = None
+
+from sqlalchemy import select
+
+import liveness
+import review
+from models import db, data_dir, LoanApplication, WriteBehindCheckpoint
+
+ENABLED = os.environ.get('WRITE_BEHIND', '0') == '1'
+FLUSH_INTERVAL = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', '0.05'))
+FSYNC_INTERVAL = float(os.environ.get('WRITE_BEHIND_FSYNC_INTERVAL', '0.05'))
+BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH', '500'))
+ROTATE_BYTES = int(os.environ.get('WRITE_BEHIND_ROTATE_BYTES', str(4 * 1024 * 1024)))
+
+_app = None
+_log_dir = None
+_lock = threading.Lock()        # guards the append handle and rotation
+_state = None                   # per-process writer state, rebuilt after fork
+
+
+class _Writer:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.token = liveness.token()
+        self.seq = 0
+        self.file = None
+        self.path = None
+        self.dirty = False
+        self.last_fsync = time.monotonic()
+        self.open_next()
+        self.thread = threading.Thread(target=_flush_loop, args=(self,), name='write-behind', daemon=True)
+        self.thread.start()
+
+    def open_next(self):
+        if self.file:
+            self.file.close()
+        self.seq += 1
+        self.path = os.path.join(_log_dir, f"decisions-{self.pid}-{self.token}-{self.seq:06d}.log")
+        self.file = open(self.path, 'ab')
+
+    def fsync(self):
+        if self.dirty:
+            os.fsync(self.file.fileno())
+            self.dirty = False
+        self.last_fsync = time.monotonic()
+
+
+def init_app(app, log_dir=None):
+    """Remember the app (for the flusher's app context) and where logs live."""
+    global _app, _log_dir
+    _app = app
+    _log_dir = log_dir or os.environ.get('WRITE_BEHIND_DIR') or data_dir(app, 'writebehind')
+    legacy = os.path.join(app.instance_path, 'writebehind')
+    if os.path.abspath(legacy) != os.path.abspath(_log_dir) and os.path.isdir(legacy) and os.listdir(legacy):
+        print(f"[WARNING] {legacy} still holds write-behind logs; move them to {_log_dir} so they are replayed")
+    if ENABLED:
+        os.makedirs(_log_dir, exist_ok=True)
+        atexit.register(shutdown)
+
+
+def _writer():
+    """The writer for this process; started lazily so a pre-forking master never owns one."""
+    global _state
+    if _state is None or _state.pid != os.getpid():
+        _state = _Writer()
+    return _state
+
+
+def append(loan, review_priority=None, review_reason=None):
+    """
+    Durably log one decision (LoanApplication column values) for later insertion.
+    review_priority / review_reason: queue the loan for human review once stored
+    returns: (log name, offset just past the record), for flush_through()
+    """
+    record = dict(loan, submitted_at=loan['submitted_at'].isoformat())
+    if review_reason is not None:
+        record['_review'] = [int(review_priority), review_reason]
+    line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+    with _lock:
+        writer = _writer()
+        writer.file.write(line)
+        writer.file.flush()
+        writer.dirty = True
+        if FSYNC_INTERVAL <= 0 or time.monotonic() - writer.last_fsync >= FSYNC_INTERVAL:
+            writer.fsync()
+        return os.path.basename(writer.path), writer.file.tell()
+
+
+def _flush_loop(writer):
+    # A fixed cadence (rather than waking per append) lets records pile up into one commit
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            with _lock:
+                if writer is not _state:
+                    return  # shut down, or inherited across a fork
+                writer.fsync()
+            with _app.app_context():
+                drain(wait=False)
+        except Exception as e:
+            print(f"[WARNING] Write-behind flush failed: {e}")
+            time.sleep(1.0)
+
+
+def _log_files():
+    try:
+        names = sorted(n for n in os.listdir(_log_dir) if n.startswith('decisions-') and n.endswith('.log'))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(_log_dir, n) for n in names]
+
+
+def _is_retired(path):
+    """A log nobody appends to any more: rotated out by this process, or left by a dead one."""
+    _, pid, token, _ = os.path.basename(path).split('-')
+    if int(pid) == os.getpid() and token == liveness.token():
+        return _state is None or path != _state.path
+    return not liveness.alive(int(pid), token)
+
+
+def _load(lines):
+    loans = []
+    for line in lines:
+        record = json.loads(line)
+        queued = record.pop('_review', None)
+        record['submitted_at'] = datetime.fromisoformat(record['submitted_at'])
+        loan = LoanApplication(**record)
+        db.session.add(loan)
+        if queued:
+            review.enqueue(loan, queued[0], queued[1])
+        loans.append(loan)
+    return loans
+
+
+def _replay(path, handle, offset):
+    """Insert complete lines after offset in batches; returns the new offset."""
+    handle.seek(offset)
+    while True:
+        lines, consumed = [], 0
+        for line in handle:
+            if not line.endswith(b'\n'):
+                break  # torn tail from a crash mid-write, or a write still in progress
+            lines.append(line)
+            consumed += len(line)
+            if len(lines) >= BATCH_SIZE:
+                break
+        if not lines:
+            return offset
+        try:
+            _load(lines)
+            name = os.path.basename(path)
+            checkpoint = db.session.get(WriteBehindCheckpoint, name) or WriteBehindCheckpoint(log_name=name)
+            checkpoint.offset = offset + consumed
+            db.session.add(checkpoint)
+            db.session.commit()  # rows and checkpoint together: replay is exactly-once
+        except Exception:
+            db.session.rollback()
+            raise
+        offset += consumed
+        handle.seek(offset)
+
+
+def _retire(path):
+    os.unlink(path)
+    db.session.query(WriteBehindCheckpoint).filter_by(log_name=os.path.basename(path)).delete()
+    db.session.commit()
+
+
+def _drain_log(path, retired, wait):
+    """Replay one log under its flock; returns True if it had new records."""
+    name = os.path.basename(path)
+    try:
+        handle = open(path, 'rb')
+    except FileNotFoundError:
+        return False
+    with handle:
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return False
+        if not os.path.exists(path):
+            return False  # retired by another worker while we waited
+        # Re-read under the lock (not from the identity map): another drainer may have moved it on
+        offset = db.session.execute(
+            select(WriteBehindCheckpoint.offset).where(WriteBehindCheckpoint.log_name == name)).scalar() or 0
+        new_offset = _replay(path, handle, offset)
+        if retired:
+            _retire(path)
+        elif _state is not None and path == _state.path and new_offset >= ROTATE_BYTES:
+            with _lock:
+                _state.fsync()
+                _state.open_next()
+            # Lines appended between the replay and the rotation
+            _replay(path, handle, new_offset)
+            _retire(path)
+        return new_offset > offset
+
+
+def drain(wait=True):
+    """
+    Move every unreplayed record into loan_application. Must run inside an app context.
+    wait: block on logs another worker is draining (read-your-writes) instead of skipping them
+    returns: number of logs that had new records
+    """
+    if not ENABLED:
+        return 0
+    paths = _log_files()
+    if not paths:
+        return 0
+    offsets = dict(db.session.execute(select(WriteBehindCheckpoint.log_name, WriteBehindCheckpoint.offset)).all())
+    drained = 0
+    for path in paths:
+        name = os.path.basename(path)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            continue
+        retired = _is_retired(path)
+        if size <= offsets.get(name, 0) and not retired:
+            continue
+        if fcntl is None and not name.startswith(f"decisions-{os.getpid()}-{liveness.token()}-"):
+            continue
+        try:
+            drained += _drain_log(path, retired, wait)
+        except Exception as e:
+            # The records stay in the log; the flusher retries on its next pass
+            print(f"[WARNING] Write-behind drain of {name} failed: {e}")
+    return drained
+
+
+def flush_through(position):
+    """
+    Make sure the record append() placed at position is in loan_application, draining
+    its log if need be. Must run inside an app context.
+    position: (log name, offset) from append()
+    returns: True once it is stored; False if the drain failed (the flusher retries)
+    """
+    name, offset = position
+    path = os.path.join(_log_dir, name)
+    replayed = db.session.execute(
+        select(WriteBehindCheckpoint.offset).where(WriteBehindCheckpoint.log_name == name)).scalar() or 0
+    if replayed >= offset or not os.path.exists(path):
+        return True  # replayed that far, or replayed in full and retired
+    if fcntl is None and not name.startswith(f"decisions-{os.getpid()}-{liveness.token()}-"):
+        return False  # another worker's log; its own flusher stores it
+    try:
+        _drain_log(path, _is_retired(path), wait=True)
+    except Exception as e:
+        print(f"[WARNING] Write-behind drain of {name} failed: {e}")
+        return False
+    return True
+
+
+def shutdown():
+    """Final flush of this worker's log on clean exit (the next worker recovers it otherwise)."""
+    global _state
+    if _state is None or _state.pid != os.getpid():
+        return
+    try:
+        with _lock:
+            _state.fsync()
+            _state.file.close()
+            _state = None  # every log of this process is now retired
+        with _app.app_context():
+            drain()
+    except Exception as e:
+        print(f"[WARNING] Write-behind shutdown flush failed: {e}")